@@ -1,8 +1,10 @@
 import streamlit as st
-from pulp import LpStatus, listSolvers, getSolver
+import pandas as pd
+from pulp import LpStatus
 
 # Import core logic and data loader
-from core import data_loader, requirements_calculator, optimizer, ai_planner
+from core import (data_loader, requirements_calculator, optimizer, ai_planner, plan_cache, jobs, frontier, highs_backend,
+                  tracing, audit)
 
 # Import the new UI page modules
 from ui_pages import (
@@ -173,23 +175,49 @@ if st.session_state.plan_results:
 else:
     st.sidebar.warning("⚪ Step 3: Plan Not Generated")
     st.sidebar.warning("⚪ Step 4: Plan Not Ready")
+
+load = jobs.get_default_manager().metrics()
+st.sidebar.caption(f"Planner load: {load['running']}/{load['max_concurrent']} solving, {load['queue_depth']} waiting"
+                   + (f", avg. wait {load['mean_wait']:.0f} s" if load['submitted'] else ""))
 st.sidebar.markdown("---")
 
-# Page routing
-if st.session_state.page_selection == "Step 1: Your Profile":
-    profile.display_profile_page(INTAKE_REQS, requirements_calculator)
-elif st.session_state.page_selection == "Step 2: Select Plan Goals":
-    goals.display_select_plan_goals_page()
-elif st.session_state.page_selection == "Step 3: Customize Plan Details":
-    customize.display_customize_plan_details_page(
-        NUTRITION_DATA, PRICES, FOOD_GROUPS_MAP, COFFEE_DATA, 
-        requirements_calculator, optimizer, LpStatus, listSolvers, getSolver
-    )
-elif st.session_state.page_selection == "Step 4: View Plan & Generate Prompts":
-    view_plan.display_plan_and_prompt_page(PRICES, ai_planner)
-elif st.session_state.page_selection == "Add Custom Food":
-    add_food.display_add_food_page(UNIQUE_GROUPS, NUTRITION_DATA, ALL_FOODS)
-elif st.session_state.page_selection == "Update Food Prices":
-    update_prices.display_price_update_page(ALL_FOODS, PRICES)
-elif st.session_state.page_selection == "About / Help":
-    help.display_help_page()
\ No newline at end of file
+last_trace = st.session_state.get('last_trace')
+if last_trace:
+    # Each trace is looked up near the end of the log once it has been written, then kept here.
+    records = last_trace.setdefault('records', {})
+    if 'request' not in records and last_trace['trace_id']:
+        found = tracing.read_traces(trace_id=last_trace['trace_id'], last=1, max_bytes=tracing.RECENT_TRACE_BYTES)
+        if found:
+            records['request'] = found[0]
+    job_progress = jobs.get_default_manager().status(last_trace['job_id']) if last_trace['job_id'] else None
+    if 'job' not in records and job_progress is not None and job_progress['done']:
+        found = tracing.read_traces(job_id=last_trace['job_id'], name='Plan job', last=1, max_bytes=tracing.RECENT_TRACE_BYTES)
+        if found:
+            records['job'] = found[0]
+    with st.sidebar.expander("Last plan request timing"):
+        for record in records.values():
+            st.caption(f"{record['name']}: {record['seconds']:.2f} s")
+            st.dataframe(pd.DataFrame(record['spans'], columns=['name', 'seconds']).round(3), hide_index=True)
+            for solve in record['solves']:
+                st.caption(f"Solve: {solve['rows']} rows x {solve['columns']} columns, {solve['status']}, "
+                           f"{solve['seconds']:.1f} s" + (f", {solve['nodes']} nodes" if solve['nodes'] is not None else ""))
+
+# Page routing (traced; only plan requests keep their trace, see core/tracing.py)
+with tracing.start_trace('Page run', log=False, page=st.session_state.page_selection):
+    if st.session_state.page_selection == "Step 1: Your Profile":
+        profile.display_profile_page(INTAKE_REQS, requirements_calculator)
+    elif st.session_state.page_selection == "Step 2: Select Plan Goals":
+        goals.display_select_plan_goals_page()
+    elif st.session_state.page_selection == "Step 3: Customize Plan Details":
+        customize.display_customize_plan_details_page(
+            NUTRITION_DATA, PRICES, FOOD_GROUPS_MAP, COFFEE_DATA, 
+            requirements_calculator, optimizer, LpStatus, highs_backend.list_solvers, highs_backend.get_solver, plan_cache, jobs, frontier, tracing
+        )
+    elif st.session_state.page_selection == "Step 4: View Plan & Generate Prompts":
+        view_plan.display_plan_and_prompt_page(PRICES, ai_planner, audit)
+    elif st.session_state.page_selection == "Add Custom Food":
+        add_food.display_add_food_page(UNIQUE_GROUPS, NUTRITION_DATA, ALL_FOODS)
+    elif st.session_state.page_selection == "Update Food Prices":
+        update_prices.display_price_update_page(ALL_FOODS, PRICES)
+    elif st.session_state.page_selection == "About / Help":
+        help.display_help_page()
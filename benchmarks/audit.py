@@ -0,0 +1,62 @@
+# benchmarks/audit.py
+"""
+Measures nutrient-audit throughput (core/audit.py): one solved plan is perturbed into
+a batch of heuristic-looking plans, which are audited one by one with
+PlanAuditor.audit and in one call with PlanAuditor.audit_many.
+
+Usage: python -m benchmarks.audit [--batch-sizes 100 1000 10000] [--noise 0.1]
+                                  [--level 3] [--time-limit SECONDS] [--seed 0]
+"""
+import argparse
+import time
+
+import numpy as np
+from pulp import PULP_CBC_CMD
+
+from core import audit, optimizer
+from core.plan import Plan
+from benchmarks.common import load_default_inputs, model_kwargs
+
+
+def perturbed_plans(plan, count, noise, seed):
+    """count copies of plan with every amount scaled by independent log-normal noise, then rounded."""
+    rng = np.random.default_rng(seed)
+    return [Plan(plan.grams * rng.lognormal(0.0, noise, plan.grams.shape), plan.foods, plan.days).rounded()
+            for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--noise', type=float, default=0.1, help="Standard deviation of the log of each amount's multiplier.")
+    parser.add_argument('--level', type=int, default=3, help="Variety level of the solved plan.")
+    parser.add_argument('--time-limit', type=int, default=30, help="Solver time limit for the base plan.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    nutrition_df, prices_series, intake_df, food_group_map = load_default_inputs()
+    prob, food_vars, days = optimizer.create_and_solve_model(
+        **model_kwargs(nutrition_df, prices_series, intake_df, food_group_map, args.level),
+        solver_name=PULP_CBC_CMD(timeLimit=args.time_limit, msg=False), balance_formulation='compact', corpus_dir=None
+    )
+    plan = optimizer.extract_plan(food_vars, days)
+    auditor = audit.PlanAuditor(nutrition_df, intake_df, food_group_map)
+    print(f"Base plan: {len(plan.foods)} foods, {len(auditor.audit(plan.rounded()))} violation(s) after rounding, "
+          f"{len(auditor.check_names)} checks per day\n")
+
+    print(f"{'plans':>7} {'one by one (s)':>14} {'plans/s':>10} {'batch (s)':>10} {'plans/s':>10} {'failing':>8}")
+    for size in args.batch_sizes:
+        plans = perturbed_plans(plan, size, args.noise, args.seed)
+        start = time.perf_counter()
+        counts = [len(auditor.audit(p)) for p in plans]
+        single = time.perf_counter() - start
+        start = time.perf_counter()
+        report = auditor.audit_many(plans)
+        batch = time.perf_counter() - start
+        assert counts == report['violations'].tolist()
+        print(f"{size:>7} {single:>14.3f} {size / single:>10,.0f} {batch:>10.3f} {size / batch:>10,.0f} "
+              f"{(report['violations'] > 0).mean():>8.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/balance_formulation.py
+"""
+Compares the 'bigm' and 'compact' balanced-energy formulations on model size,
+solve time and final gap for every variety level that uses the rule (2-5).
+
+Usage: python -m benchmarks.balance_formulation [--time-limit SECONDS] [--levels 2 3 4 5]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from pulp import PULP_CBC_CMD, LpStatus
+
+from core import optimizer, solver_log
+from benchmarks.common import fmt, load_default_inputs, model_kwargs
+
+
+def solve_and_measure(kwargs, balance_formulation, time_limit):
+    prob, _, _ = optimizer.build_model(**kwargs, balance_formulation=balance_formulation)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = os.path.join(tmp_dir, 'cbc.log')
+        start = time.perf_counter()
+        prob.solve(PULP_CBC_CMD(timeLimit=time_limit, msg=False, logPath=log_path))
+        elapsed = time.perf_counter() - start
+        summary = solver_log.read_cbc_log(log_path)
+    return {
+        'rows': len(prob.constraints), 'cols': len(prob.variables()), 'seconds': elapsed,
+        'status': LpStatus[prob.status], 'result': summary['result'] or '-',
+        'objective': summary['objective'], 'gap': summary['gap'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--time-limit', type=int, default=180, help="Solver time limit per run, as in the app.")
+    parser.add_argument('--levels', type=int, nargs='+', default=[2, 3, 4, 5])
+    args = parser.parse_args()
+
+    inputs = load_default_inputs()
+    print(f"{'level':>5} {'formulation':>11} {'rows':>6} {'cols':>6} {'time (s)':>9} {'objective':>14} {'gap':>7}  result")
+    for level in args.levels:
+        kwargs = model_kwargs(*inputs, variety_level=level)
+        for formulation in optimizer.BALANCE_FORMULATIONS:
+            m = solve_and_measure(kwargs, formulation, args.time_limit)
+            print(f"{level:>5} {formulation:>11} {m['rows']:>6} {m['cols']:>6} {m['seconds']:>9.1f} "
+                  f"{fmt(m['objective'], '14,.0f')} {fmt(m['gap'], '7.2%')}  {m['result']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# benchmarks/catalog_scaling.py
+"""
+Times the planning pipeline on synthetic catalogs of growing size (see
+benchmarks/synthetic_catalog.py): data loading, model build, solve and plan
+extraction for every variety level, and the AI prompts for the resulting week.
+
+Results can be written as JSON (--output) and compared with an earlier run
+(--compare), e.g. one file per commit.
+
+Usage: python -m benchmarks.catalog_scaling [--sizes 72 500 2000 10000] [--levels 1 2 3 4 5]
+                                            [--time-limit SECONDS] [--seed 0]
+                                            [--output FILE] [--compare FILE]
+"""
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+
+from pulp import PULP_CBC_CMD, LpStatus, LpSolutionOptimal, value
+
+from core import ai_planner, data_loader, optimizer, requirements_calculator
+from benchmarks.common import DEFAULT_DIVERSITY_TARGET, DEFAULT_PROFILE, fmt
+from benchmarks.synthetic_catalog import make_catalog, write_data_dir
+
+TIMED_STEPS = ('load', 'build', 'solve', 'extract', 'prompts')
+DEFAULT_PROMPT_PREFS = {'goal': "General Balanced Diet", 'cuisine': "Any", 'cook_time': 30, 'custom_instructions': ""}
+
+
+def load_catalog(data_dir):
+    """Times data_loader.load_and_clean_data on a data directory."""
+    shipped_dir = data_loader.DATA_DIR
+    data_loader.DATA_DIR = data_dir
+    try:
+        start = time.perf_counter()
+        nutrition_df, prices_series, intake_df, food_group_map, _ = data_loader.load_and_clean_data()
+        return time.perf_counter() - start, (nutrition_df, prices_series, intake_df, food_group_map)
+    finally:
+        data_loader.DATA_DIR = shipped_dir
+
+
+def run_level(inputs, level, time_limit):
+    nutrition_df, prices_series, intake_df, food_group_map = inputs
+    kwargs = dict(nutrition_df=nutrition_df, prices_series=prices_series, intake_df=intake_df,
+                  food_group_map=food_group_map, foods_to_exclude=[], foods_to_include=[],
+                  daily_diversity_target=DEFAULT_DIVERSITY_TARGET, days_of_week=7,
+                  nutrient_mode='daily', variety_level=level)
+    result = {'level': level}
+    start = time.perf_counter()
+    prob, food_vars, days = optimizer.build_model(**kwargs, balance_formulation='compact', symmetry_breaking=True)
+    result['build'] = time.perf_counter() - start
+    result['rows'], result['columns'] = len(prob.constraints), len(prob.variables())
+
+    start = time.perf_counter()
+    prob.solve(PULP_CBC_CMD(timeLimit=time_limit, msg=False))
+    result['solve'] = time.perf_counter() - start
+    result['status'] = LpStatus[prob.status]
+    has_plan = result['status'] == 'Optimal' and value(prob.objective) is not None
+    result['proven_optimal'] = has_plan and prob.sol_status == LpSolutionOptimal
+    result['objective'] = value(prob.objective) if has_plan else None
+
+    start = time.perf_counter()
+    plan = optimizer.extract_plan(food_vars, days) if has_plan else {}
+    result['extract'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for day, day_plan in plan.items():
+        ai_planner.create_prompt_for_user({f: round(g) for f, g in day_plan.items()}, day, 3, 2, DEFAULT_PROMPT_PREFS)
+    result['prompts'] = time.perf_counter() - start
+    return result
+
+
+def run_suite(sizes, levels, time_limit, seed):
+    """Yields one result dict per catalog size and variety level, as soon as it is measured."""
+    nutrition_df, prices_series, _, food_group_map, _ = data_loader.load_and_clean_data()
+    for size in sizes:
+        catalog = make_catalog(nutrition_df, prices_series, food_group_map, size, seed=seed)
+        with tempfile.TemporaryDirectory(prefix='catalog_') as data_dir:
+            write_data_dir(data_dir, *catalog)
+            load_seconds, (nutrition, prices, intake, groups) = load_catalog(data_dir)
+        intake = requirements_calculator.calculate_full_nutrient_requirements(intake, **DEFAULT_PROFILE)
+        for level in levels:
+            result = run_level((nutrition, prices, intake, groups), level, time_limit)
+            result.update(size=len(nutrition), load=load_seconds)
+            yield result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results, baseline):
+    """Per size and level: each step's time now / before, and the objective change."""
+    before = {(r['size'], r['level']): r for r in baseline['results']}
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} ({baseline.get('created', '?')}):")
+    print(f"{'size':>6} {'level':>5} " + " ".join(f"{step + ' x':>10}" for step in TIMED_STEPS) + f" {'objective':>10}")
+    for r in results:
+        old = before.get((r['size'], r['level']))
+        if old is None:
+            continue
+        ratios = [r[step] / old[step] if old.get(step) else None for step in TIMED_STEPS]
+        delta = (r['objective'] - old['objective']) / abs(old['objective']) \
+            if r['objective'] is not None and old.get('objective') else None
+        print(f"{r['size']:>6} {r['level']:>5} " + " ".join(fmt(x, '10.2f') for x in ratios) + f" {fmt(delta, '+10.2%')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[72, 500, 2000, 10000], help="Catalog sizes (foods).")
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 3, 4, 5], help="Variety levels.")
+    parser.add_argument('--time-limit', type=int, default=180, help="Solver time limit per solve, as in the app.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic catalogs.")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    parser.add_argument('--compare', help="A JSON file from an earlier run to compare against.")
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'level':>5} {'rows':>7} {'load (s)':>8} {'build (s)':>9} {'solve (s)':>9} "
+          f"{'extract':>7} {'prompts':>7} {'objective':>14}  status")
+    results = []
+    for r in run_suite(args.sizes, args.levels, args.time_limit, args.seed):
+        results.append(r)
+        print(f"{r['size']:>6} {r['level']:>5} {r['rows']:>7} {r['load']:>8.2f} {r['build']:>9.2f} {r['solve']:>9.1f} "
+              f"{r['extract']:>7.3f} {r['prompts']:>7.3f} {fmt(r['objective'], '14,.0f')}  "
+              f"{r['status']}{' (proven)' if r['proven_optimal'] else ''}")
+
+    run = {
+        'commit': _git_commit(), 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(), 'machine': platform.machine(),
+        'settings': {'sizes': args.sizes, 'levels': args.levels, 'time_limit': args.time_limit, 'seed': args.seed},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/column_generation.py
+"""
+Compares the full model with column-generation mode on synthetic catalogs (see
+benchmarks/synthetic_catalog.py): foods actually modelled, rows, solve time and plan cost.
+
+Usage: python -m benchmarks.column_generation [--sizes 500 2000 10000] [--levels 1 3]
+                                              [--time-limit SECONDS] [--skip-full-above N]
+"""
+import argparse
+import time
+
+from pulp import PULP_CBC_CMD, LpStatus, LpSolutionOptimal, value
+
+from core import data_loader, optimizer, requirements_calculator
+from benchmarks.common import DEFAULT_DIVERSITY_TARGET, DEFAULT_PROFILE, fmt
+from benchmarks.synthetic_catalog import make_catalog
+
+
+def solve_and_measure(kwargs, column_generation, time_limit):
+    start = time.perf_counter()
+    prob, food_vars, _ = optimizer.create_and_solve_model(
+        **kwargs, solver_name=PULP_CBC_CMD(timeLimit=time_limit, msg=False),
+        balance_formulation='compact', symmetry_breaking=True, column_generation=column_generation
+    )
+    status = LpStatus[prob.status]
+    report = getattr(prob, 'column_generation_report', None)
+    return {
+        'seconds': time.perf_counter() - start, 'status': status,
+        'objective': value(prob.objective) if status == 'Optimal' else None,
+        'proven': status == 'Optimal' and prob.sol_status == LpSolutionOptimal,
+        'foods': report['foods'] if report else len({f for f, _ in food_vars}),
+        'rounds': len(report['rounds']) if report else 0,
+        'rows': len(prob.constraints),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 2000, 10000], help="Catalog sizes (foods).")
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 3], help="Variety levels.")
+    parser.add_argument('--time-limit', type=int, default=180, help="Solver time limit per plan, as in the app.")
+    parser.add_argument('--skip-full-above', type=int, default=5000, help="Only run column generation on larger catalogs.")
+    args = parser.parse_args()
+
+    nutrition_df, prices_series, intake_df, food_group_map, _ = data_loader.load_and_clean_data()
+    intake = requirements_calculator.calculate_full_nutrient_requirements(intake_df, **DEFAULT_PROFILE)
+    print(f"{'size':>6} {'level':>5} {'mode':>7} {'foods':>6} {'rounds':>6} {'rows':>7} {'time (s)':>9} {'objective':>14}  status")
+    for size in args.sizes:
+        nutrition, prices, groups = make_catalog(nutrition_df, prices_series, food_group_map, size)
+        for level in args.levels:
+            kwargs = dict(nutrition_df=nutrition, prices_series=prices, intake_df=intake, food_group_map=groups,
+                          foods_to_exclude=[], foods_to_include=[], daily_diversity_target=DEFAULT_DIVERSITY_TARGET,
+                          days_of_week=7, nutrient_mode='daily', variety_level=level)
+            modes = ('full', 'colgen') if size <= args.skip_full_above else ('colgen',)
+            for mode in modes:
+                m = solve_and_measure(kwargs, mode == 'colgen', args.time_limit)
+                print(f"{len(nutrition):>6} {level:>5} {mode:>7} {m['foods']:>6} {m['rounds']:>6} {m['rows']:>7} "
+                      f"{m['seconds']:>9.1f} {fmt(m['objective'], '14,.0f')}  {m['status']}{' (proven)' if m['proven'] else ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+# benchmarks/common.py
+from core import data_loader, requirements_calculator
+
+# Mirrors the default values of the Step 1 profile form.
+DEFAULT_PROFILE = {
+    'gender': 'female', 'age': 30, 'weight_kg': 70.0, 'height_m': 1.75, 'activity': 'low_active'
+}
+DEFAULT_DIVERSITY_TARGET = 5 # 3 meals + 2 snacks
+
+
+def load_default_inputs():
+    """Loads the shipped catalog and personalizes the intake table for the default profile."""
+    nutrition_df, prices_series, intake_df, food_group_map, _ = data_loader.load_and_clean_data()
+    personalized_reqs = requirements_calculator.calculate_full_nutrient_requirements(intake_df, **DEFAULT_PROFILE)
+    return nutrition_df, prices_series, personalized_reqs, food_group_map
+
+
+def model_kwargs(nutrition_df, prices_series, intake_df, food_group_map, variety_level):
+    """Keyword arguments for optimizer.build_model/create_and_solve_model as the Step 3 page passes them."""
+    return dict(
+        nutrition_df=nutrition_df, prices_series=prices_series, intake_df=intake_df,
+        food_group_map=food_group_map, foods_to_exclude=[], foods_to_include=[],
+        daily_diversity_target=DEFAULT_DIVERSITY_TARGET, days_of_week=7,
+        nutrient_mode='daily', variety_level=variety_level
+    )
+
+
+def fmt(value, spec):
+    """format(value, spec), or '-' for a missing value (e.g. no objective after a failed solve)."""
+    return format(value, spec) if value is not None else '-'
@@ -0,0 +1,53 @@
+# benchmarks/horizon.py
+"""
+Compares the monolithic model with rolling-horizon solving for plans of several
+lengths: solve time, total cost and cost per week.
+
+Usage: python -m benchmarks.horizon [--time-limit SECONDS] [--days 7 14 28] [--level 1]
+"""
+import argparse
+import time
+
+from pulp import PULP_CBC_CMD, LpStatus, LpSolutionOptimal, value
+
+from core import optimizer
+from benchmarks.common import fmt, load_default_inputs, model_kwargs
+
+
+def solve_and_measure(kwargs, rolling, time_limit):
+    start = time.perf_counter()
+    prob, _, days = optimizer.create_and_solve_model(
+        **kwargs, solver_name=PULP_CBC_CMD(timeLimit=time_limit, msg=False),
+        balance_formulation='compact', rolling=rolling
+    )
+    elapsed = time.perf_counter() - start
+    status = LpStatus[prob.status]
+    objective = value(prob.objective) if status == 'Optimal' else None
+    return {
+        'seconds': elapsed, 'status': status, 'objective': objective,
+        'per_week': objective * len(optimizer.DAYS_OF_WEEK) / len(days) if objective is not None else None,
+        'proven': status == 'Optimal' and prob.sol_status == LpSolutionOptimal,
+        'windows': len(prob.rolling_report['windows']) if hasattr(prob, 'rolling_report') else 1,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--time-limit', type=int, default=180, help="Solver time limit per plan, as in the app.")
+    parser.add_argument('--days', type=int, nargs='+', default=[7, 14, 28])
+    parser.add_argument('--level', type=int, default=1, help="Variety level.")
+    args = parser.parse_args()
+
+    inputs = load_default_inputs()
+    print(f"{'days':>4} {'mode':>10} {'windows':>7} {'time (s)':>9} {'objective':>14} {'per week':>12}  status")
+    for days in args.days:
+        kwargs = dict(model_kwargs(*inputs, variety_level=args.level), days_of_week=days)
+        modes = ('monolithic', 'rolling') if days > optimizer.ROLLING_WINDOW_DAYS else ('monolithic',)
+        for mode in modes:
+            m = solve_and_measure(kwargs, mode == 'rolling', args.time_limit)
+            print(f"{days:>4} {mode:>10} {m['windows']:>7} {m['seconds']:>9.1f} {fmt(m['objective'], '14,.0f')} "
+                  f"{fmt(m['per_week'], '12,.0f')}  {m['status']}{' (proven)' if m['proven'] else ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/household.py
+"""
+Compares planning each household member separately with the coupled household
+model: solve time, binaries and the cost of the combined shopping list when food is
+bought in whole packages. From variety level 2 on, the household model has every member
+eat every food of the balanced groups on a day's menu, which separate plans need not do.
+
+Usage: python -m benchmarks.household [--time-limit SECONDS] [--sizes 1 2 4 8]
+                                      [--level 1] [--package-grams 500]
+"""
+import argparse
+import math
+import time
+
+import pandas as pd
+from pulp import PULP_CBC_CMD, LpStatus, value
+
+from core import data_loader, optimizer, requirements_calculator
+from benchmarks.common import DEFAULT_DIVERSITY_TARGET, fmt
+
+# Cycled through to make households of any size.
+MEMBER_PROFILES = [
+    {'gender': 'female', 'age': 30, 'weight_kg': 70.0, 'height_m': 1.75, 'activity': 'low_active'},
+    {'gender': 'male', 'age': 35, 'weight_kg': 82.0, 'height_m': 1.80, 'activity': 'active'},
+    {'gender': 'female', 'age': 15, 'weight_kg': 52.0, 'height_m': 1.62, 'activity': 'active'},
+    {'gender': 'male', 'age': 62, 'weight_kg': 76.0, 'height_m': 1.72, 'activity': 'sedentary'},
+]
+
+
+def make_members(intake_df, size):
+    return [{
+        'name': f"member_{i + 1}",
+        'intake_df': requirements_calculator.calculate_full_nutrient_requirements(intake_df, **MEMBER_PROFILES[i % len(MEMBER_PROFILES)]),
+        'daily_diversity_target': DEFAULT_DIVERSITY_TARGET,
+    } for i in range(size)]
+
+
+def package_cost(grams_by_food, prices_series, package_sizes):
+    return sum(math.ceil(grams / package_sizes[f] - 1e-6) * package_sizes[f] * prices_series.get(f, optimizer.DEFAULT_PRICE_PER_GRAM)
+               for f, grams in grams_by_food.items() if grams > 0.01)
+
+
+def solve_separately(members, inputs, level, time_limit, package_sizes):
+    nutrition_df, prices_series, food_group_map = inputs
+    start, grams_by_food, statuses = time.perf_counter(), {}, []
+    for member in members:
+        prob, food_vars, days = optimizer.create_and_solve_model(
+            nutrition_df, prices_series, member['intake_df'], food_group_map, [], [],
+            member['daily_diversity_target'], 7, 'daily', level,
+            solver_name=PULP_CBC_CMD(timeLimit=time_limit, msg=False), balance_formulation='compact'
+        )
+        statuses.append(LpStatus[prob.status])
+        for day_plan in optimizer.extract_plan(food_vars, days).values():
+            for f, grams in day_plan.items():
+                grams_by_food[f] = grams_by_food.get(f, 0.0) + grams
+    status = 'Optimal' if all(s == 'Optimal' for s in statuses) else ', '.join(sorted(set(statuses)))
+    return {'seconds': time.perf_counter() - start, 'status': status,
+            'cost': package_cost(grams_by_food, prices_series, package_sizes)}
+
+
+def solve_household(members, inputs, level, time_limit, package_sizes):
+    nutrition_df, prices_series, food_group_map = inputs
+    start = time.perf_counter()
+    prob, _, _ = optimizer.create_and_solve_household_model(
+        members, nutrition_df, prices_series, food_group_map, [], [], 7, 'daily', level,
+        package_sizes=package_sizes, solver_name=PULP_CBC_CMD(timeLimit=time_limit, msg=False)
+    )
+    status = LpStatus[prob.status]
+    return {'seconds': time.perf_counter() - start, 'status': status,
+            'cost': value(prob.objective) if status == 'Optimal' else None,
+            'binaries': sum(1 for v in prob.variables() if v.cat == 'Integer' and v.upBound == 1 and v.lowBound == 0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--time-limit', type=int, default=180, help="Solver time limit per solve, as in the app.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--level', type=int, default=1, help="Variety level.")
+    parser.add_argument('--package-grams', type=float, default=500, help="Package size used for every food.")
+    args = parser.parse_args()
+
+    nutrition_df, prices_series, intake_df, food_group_map, _ = data_loader.load_and_clean_data()
+    inputs = (nutrition_df, prices_series, food_group_map)
+    package_sizes = pd.Series(args.package_grams, index=nutrition_df.index)
+    print(f"{'size':>4} {'separate (s)':>12} {'separate cost':>14} {'household (s)':>13} {'household cost':>15} {'binaries':>8}  status")
+    for size in args.sizes:
+        members = make_members(intake_df, size)
+        separate = solve_separately(members, inputs, args.level, args.time_limit, package_sizes)
+        household = solve_household(members, inputs, args.level, args.time_limit, package_sizes)
+        print(f"{size:>4} {separate['seconds']:>12.1f} {fmt(separate['cost'], '14,.0f')} {household['seconds']:>13.1f} "
+              f"{fmt(household['cost'], '15,.0f')} {household['binaries']:>8}  {separate['status']} / {household['status']}")
+
+
+if __name__ == '__main__':
+    main()
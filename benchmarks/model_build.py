@@ -0,0 +1,70 @@
+# benchmarks/model_build.py
+"""
+Compares model build time of the matrix builder against the original loop builder
+and checks that both produce the same model.
+
+Usage: python -m benchmarks.model_build [--repeat N]
+"""
+import argparse
+import time
+
+from core import optimizer
+from benchmarks.common import load_default_inputs, model_kwargs
+
+COEFF_TOLERANCE = 1e-9
+
+
+def _normalized_terms(expr):
+    return {var.name: coeff for var, coeff in expr.items() if coeff != 0}
+
+
+def models_are_equivalent(prob_a, prob_b):
+    """Returns (True, None) if both problems have the same objective and constraints, else (False, reason)."""
+    def same_terms(a, b):
+        if a.keys() != b.keys():
+            return False
+        return all(abs(a[name] - b[name]) <= COEFF_TOLERANCE * max(1.0, abs(a[name])) for name in a)
+
+    if not same_terms(_normalized_terms(prob_a.objective), _normalized_terms(prob_b.objective)):
+        return False, "objective differs"
+    cons_a, cons_b = prob_a.constraints, prob_b.constraints
+    if cons_a.keys() != cons_b.keys():
+        return False, f"constraint names differ ({len(cons_a)} vs {len(cons_b)})"
+    for name, con_a in cons_a.items():
+        con_b = cons_b[name]
+        if con_a.sense != con_b.sense:
+            return False, f"sense differs in {name}"
+        if abs(con_a.constant - con_b.constant) > COEFF_TOLERANCE * max(1.0, abs(con_a.constant)):
+            return False, f"right-hand side differs in {name}"
+        if not same_terms(_normalized_terms(con_a), _normalized_terms(con_b)):
+            return False, f"coefficients differ in {name}"
+    return True, None
+
+
+def time_build(kwargs, builder, repeat):
+    best, prob = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        prob, _, _ = optimizer.build_model(**kwargs, builder=builder)
+        best = min(best, time.perf_counter() - start)
+    return best, prob
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help="Builds per variety level and builder (best time is reported).")
+    args = parser.parse_args()
+
+    inputs = load_default_inputs()
+    print(f"{'level':>5} {'rows':>7} {'loop (s)':>10} {'matrix (s)':>11} {'speedup':>8}  equivalent")
+    for level in range(1, 6):
+        kwargs = model_kwargs(*inputs, variety_level=level)
+        loop_time, loop_prob = time_build(kwargs, 'loop', args.repeat)
+        matrix_time, matrix_prob = time_build(kwargs, 'matrix', args.repeat)
+        equivalent, reason = models_are_equivalent(loop_prob, matrix_prob)
+        print(f"{level:>5} {len(matrix_prob.constraints):>7} {loop_time:>10.3f} {matrix_time:>11.3f} "
+              f"{loop_time / matrix_time:>7.1f}x  {'yes' if equivalent else 'NO: ' + reason}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/replay.py
+"""
+Re-solves a corpus of saved plan models (see core/corpus.py) and reports time and
+objective deltas against the recorded solves: the regression benchmark for optimizer
+changes.
+
+By default each case is rebuilt from its saved inputs with its recorded options, so
+formulation and builder changes are measured; --balance-formulation and friends
+override them. --from-mps solves the saved model.mps as it is instead, to compare
+backends on exactly the same model.
+
+Usage: python -m benchmarks.replay [--corpus DIR] [--solver NAME] [--time-limit SECONDS]
+                                   [--balance-formulation {bigm,compact}]
+                                   [--symmetry-breaking | --no-symmetry-breaking]
+                                   [--from-mps] [--limit N]
+"""
+import argparse
+import math
+import os
+import time
+
+from pulp import LpProblem, LpStatus, value
+
+from core import corpus, highs_backend, optimizer
+from benchmarks.common import fmt
+
+REGRESSION_TOLERANCE = 1e-3 # relative objective worsening reported as a regression
+
+
+def replay_case(path, args):
+    model_args, case = corpus.load_case(path)
+    recorded_solver = case['solver']
+    solver = highs_backend.get_solver(args.solver or recorded_solver['name'] or 'PULP_CBC_CMD',
+                                      timeLimit=args.time_limit or recorded_solver['time_limit'], msg=False)
+    start = time.perf_counter()
+    if args.from_mps:
+        mps_path = os.path.join(path, corpus.MODEL_FILE_NAME)
+        if not os.path.exists(mps_path):
+            return None
+        _, prob = LpProblem.fromMPS(mps_path)
+        prob.solve(solver)
+    else:
+        options = {k: v for k, v in case['model_options'].items() if k in ('builder', 'balance_formulation',
+                                                                          'symmetry_breaking', 'presolve', 'elastic', 'rolling')}
+        options.update({k: getattr(args, k) for k in ('balance_formulation', 'symmetry_breaking') if getattr(args, k) is not None})
+        prob, _, _ = optimizer.create_and_solve_model(**model_args, **options, solver_name=solver,
+                                                      warm_start_plan=case['warm_start_plan'], corpus_dir=None)
+    seconds = time.perf_counter() - start
+    status = LpStatus[prob.status]
+    return {
+        'case': os.path.basename(path), 'recorded': case['result'],
+        'status': status, 'seconds': seconds,
+        'objective': value(prob.objective) if status == 'Optimal' and prob.objective is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=corpus.CORPUS_DIR, help="Corpus directory (default: DIET_PLANNER_CORPUS_DIR).")
+    parser.add_argument('--solver', help="Solver name, e.g. PULP_CBC_CMD or HIGHS_INMEMORY (default: as recorded).")
+    parser.add_argument('--time-limit', type=int, help="Solver time limit per case (default: as recorded).")
+    parser.add_argument('--balance-formulation', choices=optimizer.BALANCE_FORMULATIONS)
+    parser.add_argument('--symmetry-breaking', action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument('--from-mps', action='store_true', help="Solve the saved model.mps instead of rebuilding it.")
+    parser.add_argument('--limit', type=int, help="Replay only the newest N cases.")
+    args = parser.parse_args()
+
+    cases = corpus.list_cases(args.corpus)
+    if args.limit:
+        cases = cases[-args.limit:]
+    if not cases:
+        parser.error("the corpus is empty (set DIET_PLANNER_CORPUS_DIR while planning, or pass --corpus)")
+
+    print(f"{'case':<26} {'was (s)':>8} {'now (s)':>8} {'time x':>7} {'was objective':>14} {'now objective':>14} "
+          f"{'delta':>8}  status")
+    ratios, regressions = [], 0
+    for path in cases:
+        r = replay_case(path, args)
+        if r is None:
+            print(f"{os.path.basename(path):<26} (no model.mps)")
+            continue
+        was, now = r['recorded'], r
+        ratio = now['seconds'] / was['seconds'] if was['seconds'] else None
+        if ratio:
+            ratios.append(ratio)
+        delta = (now['objective'] - was['objective']) / abs(was['objective']) \
+            if now['objective'] is not None and was['objective'] else None
+        regressed = (delta is not None and delta > REGRESSION_TOLERANCE) or (was['objective'] is not None and now['objective'] is None)
+        regressions += regressed
+        print(f"{r['case']:<26} {fmt(was['seconds'], '8.1f')} {now['seconds']:>8.1f} {fmt(ratio, '7.2f')} "
+              f"{fmt(was['objective'], '14,.0f')} {fmt(now['objective'], '14,.0f')} {fmt(delta, '+8.2%')}  "
+              f"{was['status']} -> {now['status']}{'  REGRESSION' if regressed else ''}")
+    if ratios:
+        print(f"\n{len(cases)} cases, time ratio (geometric mean) {math.exp(sum(map(math.log, ratios)) / len(ratios)):.2f}, "
+              f"{regressions} objective regression(s)")
+
+
+if __name__ == '__main__':
+    main()
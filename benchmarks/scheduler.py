@@ -0,0 +1,71 @@
+# benchmarks/scheduler.py
+"""
+Measures what JobManager coalescing saves when several sessions ask for the same plan
+at once, and checks which finished jobs it shares: a proven-optimal plan or a proof of
+infeasibility is served again, a plan cut short by the time limit is solved again
+(starting from its own plan).
+
+Usage: python -m benchmarks.scheduler [--sessions 4] [--level 1] [--time-limit SECONDS]
+                                      [--short-limit SECONDS] [--short-level 4]
+"""
+import argparse
+import time
+
+from core import jobs
+from benchmarks.common import load_default_inputs, model_kwargs
+
+
+def wait_for(manager, job_id):
+    while not manager.status(job_id)['done']:
+        time.sleep(0.5)
+    return manager.status(job_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=4, help="Sessions submitting the same plan at once.")
+    parser.add_argument('--level', type=int, default=1, help="Variety level of the shared plan.")
+    parser.add_argument('--time-limit', type=int, default=180, help="Solver time limit of the shared plan, as in the app.")
+    parser.add_argument('--short-limit', type=int, default=5, help="Time limit of the plan that is cut short.")
+    parser.add_argument('--short-level', type=int, default=4, help="Variety level of the plan that is cut short.")
+    args = parser.parse_args()
+
+    inputs = load_default_inputs()
+    manager = jobs.JobManager(max_concurrent=1)
+    options = dict(balance_formulation='compact', symmetry_breaking=True)
+
+    kwargs = model_kwargs(*inputs, variety_level=args.level)
+    start = time.perf_counter()
+    job_ids = {manager.submit(**kwargs, time_limit=args.time_limit, **options) for _ in range(args.sessions)}
+    shared = wait_for(manager, next(iter(job_ids)))
+    print(f"{args.sessions} sessions, level {args.level}: {len(job_ids)} solve(s), {time.perf_counter() - start:.1f} s, "
+          f"{shared['state']}{' (proven)' if shared['proven_optimal'] else ''}")
+    assert len(job_ids) == 1
+    again = manager.submit(**kwargs, time_limit=args.time_limit, **options)
+    print(f"  resubmitted after it finished: {'shared' if again in job_ids else 'solved again'}")
+    assert (again in job_ids) == shared['proven_optimal']
+
+    kwargs = model_kwargs(*inputs, variety_level=args.short_level)
+    first = manager.submit(**kwargs, time_limit=args.short_limit, **options)
+    cut_short = wait_for(manager, first)
+    again = manager.submit(**kwargs, time_limit=args.short_limit, warm_start_plan=cut_short['plan'], **options)
+    print(f"Level {args.short_level} in {args.short_limit} s: {cut_short['state']}"
+          f"{' (proven)' if cut_short['proven_optimal'] else ''}; "
+          f"resubmitted: {'shared' if again == first else 'solved again'}")
+    assert (again == first) == cut_short['proven_optimal']
+    manager.cancel(again)
+
+    # Including every food at once breaks the daily limits, so no plan exists.
+    kwargs = dict(model_kwargs(*inputs, variety_level=args.level), foods_to_include=list(inputs[0].index))
+    first = manager.submit(**kwargs, time_limit=args.time_limit, **options)
+    infeasible = wait_for(manager, first)
+    again = manager.submit(**kwargs, time_limit=args.time_limit, **options)
+    print(f"Every food included: {infeasible['state']}; resubmitted: {'shared' if again == first else 'solved again'}")
+    assert infeasible['state'] != 'Infeasible' or again == first
+
+    metrics = manager.metrics()
+    print(f"\nSolves started: {metrics['submitted']}, submissions shared: {metrics['coalesced']}")
+
+
+if __name__ == '__main__':
+    main()
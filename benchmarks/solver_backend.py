@@ -0,0 +1,105 @@
+# benchmarks/solver_backend.py
+"""
+Compares handing the plan model to the solver through files (PuLP's .mps export, as
+its command-line backends do) with the in-memory CSR arrays of core.highs_backend,
+and, when highspy is installed, the full solve with CBC and with in-memory HiGHS.
+HiGHS is checked against CBC: the same status for every plan length and for inputs
+that allow no plan, and the same cost wherever both prove their plan optimal.
+
+Usage: python -m benchmarks.solver_backend [--time-limit SECONDS] [--days 7 14 28] [--level 1]
+                                           [--repeats 5]
+"""
+import argparse
+import math
+import os
+import statistics
+import tempfile
+import time
+
+from pulp import PULP_CBC_CMD, LpSolutionOptimal, LpStatus, value
+
+from core import highs_backend, optimizer
+from benchmarks.common import fmt, load_default_inputs, model_kwargs
+
+
+def time_handoff(prob, repeats):
+    """Median seconds to write the model as MPS and to build its arrays."""
+    fd, path = tempfile.mkstemp(suffix='.mps')
+    os.close(fd)
+    mps, arrays = [], []
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            prob.writeMPS(path)
+            mps.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            highs_backend.model_arrays(prob)
+            arrays.append(time.perf_counter() - start)
+    finally:
+        os.remove(path)
+    return statistics.median(mps), statistics.median(arrays)
+
+
+OBJECTIVE_TOLERANCE = 1e-4 # relative; HiGHS's default MIP gap
+
+
+def time_solve(kwargs, solver):
+    start = time.perf_counter()
+    prob, _, _ = optimizer.create_and_solve_model(**kwargs, solver_name=solver, balance_formulation='compact')
+    status = LpStatus[prob.status]
+    return {'seconds': time.perf_counter() - start, 'status': status,
+            'objective': value(prob.objective) if status == 'Optimal' else None,
+            'proven': status == 'Optimal' and prob.sol_status == LpSolutionOptimal}
+
+
+def check_agreement(cbc, highs):
+    """HiGHS must end in CBC's status, and at CBC's cost when both proved their plan optimal."""
+    assert highs['status'] == cbc['status'], f"status: CBC {cbc['status']}, HiGHS {highs['status']}"
+    if cbc['proven'] and highs['proven']:
+        assert math.isclose(highs['objective'], cbc['objective'], rel_tol=OBJECTIVE_TOLERANCE), \
+            f"proven optimal cost: CBC {cbc['objective']:,.0f}, HiGHS {highs['objective']:,.0f}"
+
+
+def _describe(solve):
+    return f"{solve['status']}{' (proven)' if solve['proven'] else ''}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--time-limit', type=int, default=180, help="Solver time limit per solve, as in the app.")
+    parser.add_argument('--days', type=int, nargs='+', default=[7, 14, 28])
+    parser.add_argument('--level', type=int, default=1, help="Variety level.")
+    parser.add_argument('--repeats', type=int, default=5, help="Repetitions of each handoff timing (median reported).")
+    args = parser.parse_args()
+
+    inputs = load_default_inputs()
+    highs = highs_backend.HighsInMemory(timeLimit=args.time_limit, msg=False)
+    if not highs.available():
+        print("highspy is not installed: timing the model handoff only.")
+    print(f"{'days':>4} {'rows':>6} {'nonzeros':>8} {'mps (ms)':>9} {'arrays (ms)':>11} "
+          f"{'cbc (s)':>8} {'cbc objective':>14} {'highs (s)':>9} {'highs objective':>15}  status (cbc / highs)")
+    cbc = PULP_CBC_CMD(timeLimit=args.time_limit, msg=False)
+    for days in args.days:
+        kwargs = dict(model_kwargs(*inputs, variety_level=args.level), days_of_week=days)
+        prob, _, _ = optimizer.build_model(**kwargs, balance_formulation='compact')
+        arrays = highs_backend.model_arrays(prob)
+        mps_seconds, arrays_seconds = time_handoff(prob, args.repeats)
+        cbc_solve = time_solve(kwargs, cbc)
+        highs_solve = time_solve(kwargs, highs) if highs.available() else {'seconds': None, 'objective': None}
+        print(f"{days:>4} {len(arrays['row_lower']):>6} {len(arrays['value']):>8} {mps_seconds * 1000:>9.1f} "
+              f"{arrays_seconds * 1000:>11.1f} {cbc_solve['seconds']:>8.1f} {fmt(cbc_solve['objective'], '14,.0f')} "
+              f"{fmt(highs_solve['seconds'], '9.1f')} {fmt(highs_solve['objective'], '15,.0f')}  "
+              + (f"{_describe(cbc_solve)} / {_describe(highs_solve)}" if highs.available() else _describe(cbc_solve)))
+        if highs.available():
+            check_agreement(cbc_solve, highs_solve)
+
+    if highs.available():
+        # Including every food at once breaks the daily limits, so no plan exists.
+        kwargs = dict(model_kwargs(*inputs, variety_level=args.level), foods_to_include=list(inputs[0].index))
+        cbc_solve, highs_solve = time_solve(kwargs, cbc), time_solve(kwargs, highs)
+        print(f"\nEvery food included: {_describe(cbc_solve)} / {_describe(highs_solve)}")
+        check_agreement(cbc_solve, highs_solve)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/synthetic_catalog.py
+"""
+Synthetic food catalogs of any size, built from the shipped one.
+
+Every shipped food is kept, so whatever plan the real catalog allows (including the
+food-group calorie shares of FOOD_GROUP_CALORIE_DIST, the staples and the mutually
+exclusive pairs) stays possible. The extra foods are variants of shipped foods, drawn
+group by group in the shipped group proportions, with every nutrient and the price
+scaled by independent log-normal noise. Variants are ordinary non-staple foods named
+<base>_v<n>.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from core import data_loader
+
+DEFAULT_NOISE = 0.15 # standard deviation of the log of each nutrient and price multiplier
+
+
+def make_catalog(nutrition_df, prices_series, food_group_map, size, *, noise=DEFAULT_NOISE, seed=0):
+    """Returns (nutrition_df, prices_series, food_group_map) with `size` foods (at least the shipped ones)."""
+    rng = np.random.default_rng(seed)
+    base_foods = list(nutrition_df.index)
+    extra = max(0, size - len(base_foods))
+    # Cycling through the shipped foods in a shuffled order keeps the group proportions.
+    order = rng.permutation(len(base_foods))
+    picks = [base_foods[order[i % len(base_foods)]] for i in range(extra)]
+    counts = {}
+    names = []
+    for base in picks:
+        counts[base] = counts.get(base, 0) + 1
+        names.append(f"{base}_v{counts[base]}")
+
+    base_values = nutrition_df.loc[picks].to_numpy(dtype=float)
+    variants = pd.DataFrame(base_values * rng.lognormal(0.0, noise, base_values.shape),
+                            index=names, columns=nutrition_df.columns)
+    variant_prices = pd.Series(prices_series.reindex(picks).to_numpy(dtype=float) * rng.lognormal(0.0, noise, extra),
+                               index=names, name=prices_series.name)
+    return (pd.concat([nutrition_df, variants]), pd.concat([prices_series, variant_prices]),
+            {**food_group_map, **{name: food_group_map[base] for name, base in zip(names, picks)}})
+
+
+def write_data_dir(path, nutrition_df, prices_series, food_group_map):
+    """
+    Writes a catalog as a data directory that data_loader.load_and_clean_data reads
+    (the shipped intake table and coffee data are copied alongside).
+    """
+    os.makedirs(path, exist_ok=True)
+    nutrition = nutrition_df.copy()
+    nutrition.insert(0, 'food_group', [food_group_map[f] for f in nutrition.index])
+    nutrition.rename_axis('food_item').reset_index()[['food_group', 'food_item'] + list(nutrition_df.columns)] \
+        .to_csv(os.path.join(path, 'nutritive_value.csv'), index=False)
+    prices_series.rename_axis('food_item').rename('price_per_gram').reset_index() \
+        .to_csv(os.path.join(path, 'prices.csv'), index=False)
+    for name in ('recommended_daily_intake.csv', 'coffee_nutritional_value.csv'):
+        source = os.path.join(data_loader.DATA_DIR, name)
+        if os.path.exists(source):
+            with open(source, 'rb') as src, open(os.path.join(path, name), 'wb') as dst:
+                dst.write(src.read())
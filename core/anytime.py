@@ -0,0 +1,261 @@
+# core/anytime.py
+import multiprocessing
+import os
+import queue
+import signal
+import tempfile
+import threading
+import time
+
+from pulp import LpStatus, LpSolutionOptimal, value
+
+from core import highs_backend, optimizer, solver_log, solver_process, tracing
+
+CBC_SOLVERS = ('PULP_CBC_CMD', 'COIN_CMD') # write a log the search can be followed in
+RESULT_GRACE_SECONDS = 30 # wait past the time limit (or an accept) for the stopped solver's plan
+POLL_SECONDS = 0.2
+LOG_POLL_SECONDS = 1.0
+
+_interrupted = threading.Event() # set by SIGINT in a solve process, see _solve
+
+
+def _solve(model_args, model_kwargs, model, solver_spec, seconds, warm_start_plan, log_path, stream, results):
+    """Solve process: builds, repairs the warm start and solves within `seconds`, then reports the result."""
+    solver_process.own_process_group() # so a stop request also reaches the solver subprocess
+    # SIGINT asks the search to stop with its best plan: CBC handles it itself, HiGHS polls _interrupted.
+    signal.signal(signal.SIGINT, lambda signum, frame: _interrupted.set())
+    start = time.perf_counter()
+    with tracing.start_trace('Anytime solve', log=False, seconds=seconds) as trace:
+        result = _run_solve(model_args, model_kwargs, model, solver_spec, start + seconds,
+                            warm_start_plan, log_path, stream, results, start)
+    result['trace'] = trace.to_dict()
+    results.put(result)
+
+
+def _run_solve(model_args, model_kwargs, model, solver_spec, deadline, warm_start_plan, log_path, stream, results, start):
+    try:
+        solver_name, solver_options = solver_spec
+        solver = highs_backend.get_solver(solver_name, timeLimit=max(1, int(deadline - start)), msg=False, **solver_options)
+        if log_path is not None:
+            solver.optionsDict['logPath'] = log_path
+        if solver_name == highs_backend.SOLVER_NAME:
+            solver.optionsDict['interrupt'] = _interrupted.is_set
+            if stream:
+                solver.optionsDict['progress'] = lambda objective, best_bound, plan: results.put(
+                    {'kind': 'progress', 'objective': objective, 'best_bound': best_bound, 'plan': plan})
+        if model is not None:
+            # This process owns a forked copy of the model, so updating it cannot race with other jobs.
+            _, prices_series, intake_df, _, foods_to_exclude, foods_to_include = model_args[:6]
+            model.update(prices_series=prices_series, intake_df=intake_df,
+                         foods_to_exclude=foods_to_exclude, foods_to_include=foods_to_include)
+            prob, food_vars, days = model.solve(solver_name=solver, warm_start_plan=warm_start_plan, deadline=deadline)
+        else:
+            prob, food_vars, days = optimizer.create_and_solve_model(
+                *model_args, **model_kwargs, solver_name=solver, warm_start_plan=warm_start_plan, deadline=deadline
+            )
+        status = LpStatus[prob.status]
+        has_plan = status == 'Optimal' and prob.objective is not None and value(prob.objective) is not None
+        return {
+            'kind': 'result',
+            'status': status,
+            'proven_optimal': has_plan and prob.sol_status == LpSolutionOptimal,
+            'objective': value(prob.objective) if has_plan else None,
+            # A rolling-horizon log only covers the last window and a column-generation one only
+            # the chosen foods, so neither gives a bound for the plan. In-memory HiGHS reports
+            # its bound directly (prob.best_bound); CBC's comes from its log.
+            'best_bound': None if not stream
+                          else prob.best_bound if hasattr(prob, 'best_bound')
+                          else solver_log.read_cbc_log(log_path)['best_bound'] if log_path is not None else None,
+            'seconds': time.perf_counter() - start,
+            'plan': optimizer.extract_plan(food_vars, days) if has_plan else None,
+        }
+    except Exception as e:
+        return {'kind': 'result', 'status': 'Error', 'error': str(e), 'proven_optimal': False,
+                'objective': None, 'best_bound': None, 'plan': None, 'seconds': time.perf_counter() - start}
+
+
+class AnytimeSolve:
+    """
+    Solves the weekly model in the background and publishes its progress as it goes.
+
+    The whole time budget goes to one solver run in a separate process (model build
+    and warm-start repair included), so the search tree is never thrown away. While it
+    runs, the incumbent and the bound are followed live: from HiGHS callbacks
+    (highs_backend.HighsInMemory), which also hand over each incumbent plan, or from
+    the CBC log as CBC writes it, which only gives the incumbent's cost (the plan then
+    arrives once CBC has stopped). progress() returns a snapshot at any time; accept()
+    asks the solver to stop and keeps the best plan it has found.
+
+    model_args are create_and_solve_model's positional inputs. Passing model (an
+    optimizer.WeeklyPlanModel for the same catalog, diversity target and variety level)
+    skips the build: the solve process updates its own forked copy to model_args and
+    solves it, so the caller's model is never modified and can be shared between solves.
+    """
+
+    def __init__(self, model_args, *, time_limit=180, solver_name='PULP_CBC_CMD', solver_options=None,
+                 warm_start_plan=None, model=None, **model_kwargs):
+        self.model_args = tuple(model_args)
+        self.model_kwargs = model_kwargs
+        self.model = model
+        self.time_limit = time_limit
+        self.solver_spec = (solver_name, dict(solver_options or {}))
+        # Rolling-horizon and column-generation searches run on partial models, whose
+        # incumbents and bounds are not the plan's; those are only reported at the end.
+        self.stream = not (model_kwargs.get('rolling') or model_kwargs.get('column_generation'))
+        self._lock = threading.Lock()
+        self._accepted = threading.Event()
+        self._cancelled = threading.Event()
+        self._process = None
+        self._state = {
+            'status': 'Running', 'done': False, 'accepted': False, 'proven_optimal': False,
+            'elapsed': 0.0, 'objective': None, 'best_bound': None, 'gap': None,
+            'plan': warm_start_plan, 'is_warm_start': warm_start_plan is not None,
+            'history': [], 'solve_trace': None, 'error': None,
+        }
+        self._start = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def progress(self):
+        """
+        Snapshot: status, done, accepted, proven_optimal, elapsed, objective, best_bound, gap,
+        plan (the incumbent: with HiGHS as soon as one is found, with CBC only once the
+        solver has stopped), history and solve_trace (the finished solve's trace, see
+        core/tracing.py).
+        """
+        with self._lock:
+            snapshot = dict(self._state, history=list(self._state['history']))
+        if not snapshot['done'] and self._start is not None:
+            snapshot['elapsed'] = time.perf_counter() - self._start
+        if snapshot['is_warm_start']:
+            snapshot['plan'] = None # the previous plan is only a starting point, not a result for these inputs
+        return snapshot
+
+    def accept(self):
+        """Stops the search and keeps the best plan found so far."""
+        self._accepted.set()
+        self._thread.join(timeout=10)
+
+    def cancel(self):
+        """
+        Drops the search without waiting for it: the background thread terminates the
+        solve process (and its solver) within a poll interval, and no plan is kept.
+        """
+        self._cancelled.set()
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return self.progress()
+
+    def _run(self):
+        log_path = None
+        if self.solver_spec[0] in CBC_SOLVERS:
+            fd, log_path = tempfile.mkstemp(suffix='.log', prefix='anytime_')
+            os.close(fd)
+        results = multiprocessing.Queue()
+        seconds = max(1, int(self.time_limit - (time.perf_counter() - self._start)))
+        self._process = multiprocessing.Process(
+            target=_solve, daemon=True,
+            args=(self.model_args, self.model_kwargs, self.model, self.solver_spec, seconds,
+                  self._state['plan'], log_path, self.stream, results)
+        )
+        self._process.start()
+        try:
+            result = self._follow(results, log_path)
+            if result is not None:
+                self._process.join(timeout=5) # let it finish flushing the queue before any kill
+        finally:
+            solver_process.stop(self._process)
+            if log_path is not None:
+                os.remove(log_path)
+
+        with self._lock:
+            if result is not None:
+                self._record(result)
+            state = self._state
+            if self._cancelled.is_set():
+                final_status = 'Cancelled'
+                state['objective'] = state['gap'] = None
+            elif result is not None and result['status'] in ('Error', 'Infeasible'):
+                final_status = result['status']
+            elif state['plan'] is not None and not state['is_warm_start']:
+                final_status = 'Optimal'
+            else:
+                final_status = 'Not Solved'
+                state['objective'] = state['gap'] = None # a cost seen in the log, but no plan came back
+            state.update(status=final_status, done=True, accepted=self._accepted.is_set(),
+                         elapsed=time.perf_counter() - self._start)
+
+    def _follow(self, results, log_path):
+        """
+        Publishes the running search's progress until the solve process reports its
+        result, which is returned; None if it died, overran the grace period, was
+        cancelled or was accepted before it had any plan.
+        """
+        deadline = self._start + self.time_limit
+        stopping = False
+        next_log_read = time.perf_counter()
+        while time.perf_counter() < deadline + RESULT_GRACE_SECONDS:
+            if self._cancelled.is_set():
+                return None
+            if not stopping and (self._accepted.is_set() or time.perf_counter() >= deadline):
+                if self._accepted.is_set() and self._state['objective'] is None:
+                    return None # no plan to wait for
+                solver_process.signal_group(self._process, signal.SIGINT)
+                stopping = True
+            try:
+                message = results.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    try:
+                        return results.get(timeout=POLL_SECONDS) # it may have just finished
+                    except queue.Empty:
+                        return None
+                if self.stream and log_path is not None and time.perf_counter() >= next_log_read:
+                    with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+                        self._record_progress(solver_log.parse_cbc_progress(f.read()))
+                    next_log_read = time.perf_counter() + LOG_POLL_SECONDS
+                continue
+            if message['kind'] == 'progress':
+                self._record_progress(message)
+            else:
+                return message
+        return None
+
+    def _record_progress(self, progress):
+        """Takes in a better incumbent (its cost, and its plan if reported) or a stronger bound seen during the search."""
+        with self._lock:
+            state = self._state
+            improved = False
+            if progress['objective'] is not None and (state['objective'] is None or progress['objective'] < state['objective']):
+                state['objective'], improved = progress['objective'], True
+            if progress.get('plan') is not None and progress['objective'] == state['objective']:
+                state.update(plan=progress['plan'], is_warm_start=False)
+            if progress['best_bound'] is not None and (state['best_bound'] is None or progress['best_bound'] > state['best_bound']):
+                state['best_bound'], improved = progress['best_bound'], True
+            if improved:
+                self._update_gap()
+
+    def _record(self, result):
+        state = self._state
+        state['solve_trace'] = result.get('trace')
+        if result.get('error'):
+            state['error'] = result['error']
+        if result['best_bound'] is not None:
+            state['best_bound'] = max(result['best_bound'], state['best_bound'] or result['best_bound'])
+        if result['plan'] is not None:
+            state.update(objective=result['objective'], plan=result['plan'], is_warm_start=False)
+        if result['proven_optimal']:
+            state.update(proven_optimal=True, best_bound=result['objective'])
+        self._update_gap()
+
+    def _update_gap(self):
+        state = self._state
+        if state['objective'] is not None and state['best_bound'] is not None:
+            state['gap'] = max(0.0, state['objective'] - state['best_bound']) / max(abs(state['objective']), 1e-9)
+        state['history'].append({'elapsed': time.perf_counter() - self._start,
+                                 'objective': state['objective'], 'best_bound': state['best_bound']})
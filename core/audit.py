@@ -0,0 +1,161 @@
+# core/audit.py
+"""
+Nutrient audit of finished plans.
+
+Checks plans (typically the rounded amounts the user is shown, Plan.rounded) against
+the daily rules of the plan model: the nutrient bounds of the personalized intake
+table, the macro energy shares of MACRO_CALORIE_DIST and the food-group calorie shares
+of FOOD_GROUP_CALORIE_DIST. Every day's nutrient, macro and group energy totals come
+from one matrix product with a per-catalog audit matrix, so PlanAuditor.audit_many
+checks whole batches of cached or heuristic plans at once.
+"""
+import numpy as np
+import pandas as pd
+
+from core import optimizer
+from core.plan import Plan
+
+NUTRIENT_TOLERANCE = 0.01 # share of the bound a day may miss it by, e.g. after rounding
+SHARE_TOLERANCE = 0.01 # calorie share points a day may miss a macro or group share by
+_AT_TOLERANCE = 1.0 + 1e-9 # misses at the tolerance pass however the matrix product summed them
+
+
+class PlanAuditor:
+    """
+    The audit matrix and rule bounds for one catalog, intake table and food-group map.
+
+    Columns of the audit matrix are the bounded nutrients, then calories, then the
+    calories from each macro and from each food group; a day's grams times the matrix
+    gives all its totals. Each check compares one total (or calorie share) with one
+    bound and is named like the model row it mirrors, e.g. 'Daily_Min_protein',
+    'Macro_Max_total_fat' or 'Calorie_Dist_fruits'.
+    """
+
+    def __init__(self, nutrition_df, intake_df, food_group_map, *,
+                 nutrient_tolerance=NUTRIENT_TOLERANCE, share_tolerance=SHARE_TOLERANCE):
+        self.foods = nutrition_df.index
+        self._food_position = {f: i for i, f in enumerate(self.foods.tolist())}
+        nutrients = [n for n in intake_df.index if n in nutrition_df.columns]
+        calories = nutrition_df['calorie'].to_numpy(dtype=float)
+        macros = [m for m in optimizer.MACRO_CALORIE_DIST if m in nutrition_df.columns]
+        food_groups = np.array([food_group_map.get(f) for f in self.foods], dtype=object)
+        groups = [g for g in optimizer.FOOD_GROUP_CALORIE_DIST if (food_groups == g).any()]
+        self.matrix = np.column_stack(
+            [nutrition_df[nutrients].to_numpy(dtype=float), calories]
+            + [optimizer.MACRO_CALORIE_DIST[m]['kcal_per_g'] * nutrition_df[m].to_numpy(dtype=float) for m in macros]
+            + [np.where(food_groups == g, calories, 0.0) for g in groups]
+        )
+        self.nutrients, self.macros, self.groups = nutrients, macros, groups
+        self._calorie_column = len(nutrients)
+
+        # (name, audited column, bound, sense (+1: at least, -1: at most), largest miss tolerated)
+        checks = []
+        for j, nutrient in enumerate(nutrients):
+            lower, upper = pd.to_numeric(intake_df.loc[nutrient, ['lower_bound', 'upper_bound']], errors='coerce')
+            if not pd.isna(lower):
+                checks.append((f"Daily_Min_{nutrient}", j, lower, 1, nutrient_tolerance * max(abs(lower), 1e-9)))
+            if not pd.isna(upper):
+                checks.append((f"Daily_Max_{nutrient}", j, upper, -1, nutrient_tolerance * max(abs(upper), 1e-9)))
+        for column, macro in enumerate(macros, start=len(nutrients) + 1):
+            values = optimizer.MACRO_CALORIE_DIST[macro]
+            checks.append((f"Macro_Min_{macro}", column, values['min'], 1, share_tolerance))
+            checks.append((f"Macro_Max_{macro}", column, values['max'], -1, share_tolerance))
+        for column, group in enumerate(groups, start=len(nutrients) + 1 + len(macros)):
+            share = optimizer.FOOD_GROUP_CALORIE_DIST[group]
+            checks += [(f"Calorie_Dist_{group}", column, share, 1, share_tolerance),
+                       (f"Calorie_Dist_{group}", column, share, -1, share_tolerance)]
+        names, columns, bounds, senses, tolerances = zip(*checks)
+        self.check_names = np.array(names, dtype=object)
+        self._check_columns = np.array(columns, dtype=np.int64)
+        self._bounds = np.array(bounds, dtype=float)
+        self._senses = np.array(senses, dtype=float)
+        self._tolerances = np.array(tolerances, dtype=float)
+        self._share_columns = np.arange(len(nutrients) + 1, self.matrix.shape[1])
+
+    def day_totals(self, plan):
+        """Days x (bounded nutrients, 'calorie', then '<macro>_share' and '<group>_share' of calories) DataFrame."""
+        plan = Plan.from_dict(plan)
+        columns = self.nutrients + ['calorie'] + [f"{name}_share" for name in self.macros + self.groups]
+        return pd.DataFrame(self._values(self._day_rows([plan])), index=list(plan.days), columns=columns)
+
+    def audit(self, plan):
+        """
+        Lists the checks a plan misses by more than the tolerance, largest miss first.
+
+        Each entry has 'constraint' (the check name with its day), 'rule', 'day', 'value'
+        (the day's total, or its calorie share), 'bound' and 'amount' (how far the value
+        is on the wrong side of the bound, in the value's units) and 'share' (amount /
+        tolerance, so 1.0 is a miss just at the tolerance).
+        """
+        plan = Plan.from_dict(plan)
+        values = self._values(self._day_rows([plan]))
+        misses = self._misses(values)
+        days, checks = np.nonzero(misses / self._tolerances > _AT_TOLERANCE)
+        violations = []
+        for d, c in zip(days.tolist(), checks.tolist()):
+            day, rule = plan.days[d], self.check_names[c]
+            violations.append({'constraint': f"{rule}_{day}", 'rule': rule, 'day': day,
+                               'value': float(values[d, self._check_columns[c]]), 'bound': float(self._bounds[c]),
+                               'amount': float(misses[d, c]), 'share': float(misses[d, c] / self._tolerances[c])})
+        return sorted(violations, key=lambda v: -v['share'])
+
+    def audit_many(self, plans):
+        """
+        Audits a batch of plans in one matrix product.
+
+        Returns a DataFrame with one row per plan (in the given order): 'violations'
+        (checks missed over all days), 'days_failed' and 'worst_rule' / 'worst_miss'
+        (the largest miss relative to its tolerance, 1.0 = just at the tolerance).
+        """
+        plans = [Plan.from_dict(p) for p in plans]
+        day_counts = np.array([len(p.days) for p in plans], dtype=np.int64)
+        relative = self._misses(self._values(self._day_rows(plans))) / self._tolerances
+        failed = relative > _AT_TOLERANCE
+        starts = np.concatenate([[0], np.cumsum(day_counts)[:-1]])
+        has_days = day_counts > 0
+        violations = np.zeros(len(plans), dtype=np.int64)
+        days_failed = np.zeros(len(plans), dtype=np.int64)
+        worst = np.zeros(len(plans))
+        worst_check = np.full(len(plans), -1, dtype=np.int64)
+        if relative.size:
+            violations[has_days] = np.add.reduceat(failed.sum(axis=1), starts[has_days])
+            days_failed[has_days] = np.add.reduceat(failed.any(axis=1).astype(np.int64), starts[has_days])
+            day_worst = relative.max(axis=1)
+            worst[has_days] = np.maximum.reduceat(day_worst, starts[has_days])
+            # The first day of each plan that reaches the plan's worst miss, and its worst check.
+            plan_of_row = np.repeat(np.arange(len(plans)), day_counts)
+            reaches_worst = np.flatnonzero(day_worst == worst[plan_of_row])
+            with_days, first = np.unique(plan_of_row[reaches_worst], return_index=True)
+            worst_check[with_days] = relative[reaches_worst[first]].argmax(axis=1)
+        return pd.DataFrame({
+            'violations': violations, 'days_failed': days_failed,
+            'worst_rule': [self.check_names[c] if c >= 0 and w > _AT_TOLERANCE else None for c, w in zip(worst_check, worst)],
+            'worst_miss': worst,
+        })
+
+    def _day_rows(self, plans):
+        """Stacks the plans' days as rows of grams over the auditor's food index."""
+        rows = np.zeros((sum(len(p.days) for p in plans), len(self.foods)))
+        positions_by_index = {} # plans that share a food index (see Plan.reindex) look it up once
+        start = 0
+        for plan in plans:
+            positions = positions_by_index.get(id(plan.foods))
+            if positions is None:
+                positions = np.array([self._food_position.get(f, -1) for f in plan.foods.tolist()], dtype=np.int64)
+                positions_by_index[id(plan.foods)] = positions
+            known = positions >= 0 # foods outside the catalog cannot be audited and are left out
+            rows[start:start + len(plan.days), positions[known]] = plan.grams[known].T
+            start += len(plan.days)
+        return rows
+
+    def _values(self, rows):
+        """Totals per row, with the macro and group calories turned into shares of the day's calories."""
+        values = rows @ self.matrix
+        calories = values[:, self._calorie_column:self._calorie_column + 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values[:, self._share_columns] = np.where(calories > 0, values[:, self._share_columns] / calories, 0.0)
+        return values
+
+    def _misses(self, values):
+        """How far each row is on the wrong side of each check's bound (0 where it is met)."""
+        return np.maximum(0.0, (self._bounds - values[:, self._check_columns]) * self._senses)
@@ -0,0 +1,224 @@
+# core/batch.py
+"""
+Batch planning: solves weekly plans for many client profiles across a process pool.
+
+Usage: python -m core.batch PROFILES OUTPUT [--workers N] [--time-limit SECONDS] [--days N] [--restart]
+
+PROFILES is a .csv or .jsonl file with one client per row. Recognised fields:
+id, gender, age, weight_kg, height_m (or height_cm), activity, is_pregnant, trimester,
+is_lactating, postpartum_period, goal, boosted_nutrients, variety_level, num_meals,
+num_snacks, include, exclude. In CSV files, list fields are separated by ';'.
+
+OUTPUT is a .jsonl file that receives one line per finished client as soon as it is
+solved. Plans longer than two weeks (--days) are solved in rolling-horizon mode.
+Re-running with the same OUTPUT resumes: clients already in it are skipped
+(failed ones are retried). An OUTPUT ending in .parquet is written at the end from a
+'<OUTPUT>.jsonl' journal, which is what resuming reads; this needs pyarrow.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from pulp import LpStatus, PULP_CBC_CMD, value
+
+from core import data_loader, requirements_calculator, optimizer
+
+DEFAULT_TIME_LIMIT = 180 # seconds per client, as in the app
+DEFAULT_DAYS = len(optimizer.DAYS_OF_WEEK)
+PROFILE_DEFAULTS = {
+    'gender': 'female', 'age': 30, 'weight_kg': 70.0, 'height_m': 1.75, 'activity': 'low_active',
+    'is_pregnant': False, 'trimester': 0, 'is_lactating': False, 'postpartum_period': 0,
+    'goal': "General Balanced Diet", 'boosted_nutrients': [], 'variety_level': 3,
+    'num_meals': 3, 'num_snacks': 2, 'include': [], 'exclude': [],
+}
+LIST_FIELDS = ('boosted_nutrients', 'include', 'exclude')
+SUCCESS_STATUSES = ('Optimal', 'Not Solved')
+
+_BASE_DATA = None # (nutrition_df, prices_series, intake_df, food_group_map), set per worker process
+
+
+def _to_bool(raw):
+    return str(raw).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def normalize_profile(raw, row_number):
+    """Fills defaults and converts one raw CSV/JSONL row into typed profile fields."""
+    raw = {k.strip(): v for k, v in raw.items() if k and v is not None and v != ''}
+    profile = dict(PROFILE_DEFAULTS)
+    profile.update(raw)
+    profile['id'] = str(raw.get('id', row_number))
+
+    if 'height_cm' in raw and 'height_m' not in raw:
+        profile['height_m'] = float(raw['height_cm']) / 100.0
+    profile.pop('height_cm', None)
+    for field in LIST_FIELDS:
+        value_ = profile[field]
+        if isinstance(value_, str):
+            value_ = [item for item in (part.strip() for part in value_.split(';')) if item]
+        profile[field] = list(value_)
+    profile['include'] = [f.replace(' ', '_').lower() for f in profile['include']]
+    profile['exclude'] = [f.replace(' ', '_').lower() for f in profile['exclude']]
+
+    profile['gender'] = str(profile['gender']).strip().lower()
+    profile['activity'] = str(profile['activity']).strip().replace(' ', '_').lower()
+    for field in ('age', 'trimester', 'postpartum_period', 'variety_level', 'num_meals', 'num_snacks'):
+        profile[field] = int(float(profile[field]))
+    for field in ('weight_kg', 'height_m'):
+        profile[field] = float(profile[field])
+    for field in ('is_pregnant', 'is_lactating'):
+        profile[field] = _to_bool(profile[field])
+    return profile
+
+
+def read_profiles(path):
+    """Reads client profiles from a .csv or .jsonl file."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.jsonl'):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    return [normalize_profile(row, i + 1) for i, row in enumerate(rows)]
+
+
+def build_intake_requirements(profile, base_intake_df):
+    """Runs the Step 1 and Step 2 requirement calculations for one profile."""
+    personalized_reqs = requirements_calculator.calculate_full_nutrient_requirements(
+        base_intake_df=base_intake_df, gender=profile['gender'], age=profile['age'],
+        weight_kg=profile['weight_kg'], height_m=profile['height_m'], activity=profile['activity'],
+        is_pregnant=profile['is_pregnant'], trimester=profile['trimester'],
+        is_lactating=profile['is_lactating'], postpartum_period=profile['postpartum_period']
+    )
+    return requirements_calculator.apply_dietary_goal_adjustments(
+        personalized_reqs, profile['goal'], weight_kg=profile['weight_kg'],
+        boosted_nutrients=profile['boosted_nutrients']
+    )
+
+
+def _init_worker(base_data):
+    global _BASE_DATA
+    _BASE_DATA = base_data
+
+
+def solve_profile(profile, time_limit=DEFAULT_TIME_LIMIT, base_data=None, days=DEFAULT_DAYS, **solve_kwargs):
+    """Plans one client and returns a JSON-serializable result record (never raises)."""
+    nutrition_df, prices_series, intake_df, food_group_map = base_data or _BASE_DATA
+    start = time.perf_counter()
+    record = {'id': profile['id'], 'status': None, 'objective': None, 'plan': None, 'error': None}
+    try:
+        reqs = build_intake_requirements(profile, intake_df)
+        prob, food_vars, days = optimizer.create_and_solve_model(
+            nutrition_df=nutrition_df, prices_series=prices_series, intake_df=reqs, food_group_map=food_group_map,
+            foods_to_exclude=optimizer.apply_goal_exclusions(profile['exclude'], profile['goal']),
+            foods_to_include=profile['include'],
+            daily_diversity_target=profile['num_meals'] + profile['num_snacks'],
+            days_of_week=days, nutrient_mode='daily', variety_level=profile['variety_level'],
+            solver_name=PULP_CBC_CMD(timeLimit=time_limit, msg=False), rolling=days > optimizer.ROLLING_WINDOW_DAYS,
+            **solve_kwargs
+        )
+        record['status'] = LpStatus[prob.status]
+        if record['status'] in SUCCESS_STATUSES and prob.objective is not None and value(prob.objective) is not None:
+            record['objective'] = value(prob.objective)
+            record['plan'] = optimizer.extract_plan(food_vars, days).to_dict()
+    except Exception as e:
+        record['status'], record['error'] = 'Error', f"{type(e).__name__}: {e}"
+    record['seconds'] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def read_finished_ids(journal_path):
+    """Ids already recorded in a results journal, excluding failed ones so they are retried."""
+    finished = set()
+    if not os.path.exists(journal_path):
+        return finished
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue # a line cut short by an interruption
+            if record.get('status') != 'Error':
+                finished.add(record['id'])
+    return finished
+
+
+def run_batch(profiles, output_path, workers=None, time_limit=DEFAULT_TIME_LIMIT, restart=False,
+              progress=None, **solve_kwargs):
+    """
+    Solves every profile not yet in the output journal and streams results to it.
+
+    Returns a summary dict with counts per status. `progress`, if given, is called
+    with each finished record.
+    """
+    journal_path = output_path + '.jsonl' if output_path.lower().endswith('.parquet') else output_path
+    if restart and os.path.exists(journal_path):
+        os.remove(journal_path)
+    finished_ids = read_finished_ids(journal_path)
+    pending = [p for p in profiles if p['id'] not in finished_ids]
+
+    nutrition_df, prices_series, intake_df, food_group_map, _ = data_loader.load_and_clean_data()
+    base_data = (nutrition_df, prices_series, intake_df, food_group_map)
+
+    summary = {'skipped': len(profiles) - len(pending), 'solved': 0}
+    os.makedirs(os.path.dirname(os.path.abspath(journal_path)), exist_ok=True)
+    with open(journal_path, 'a', encoding='utf-8') as journal, \
+         ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(base_data,)) as pool:
+        futures = [pool.submit(solve_profile, profile, time_limit, **solve_kwargs) for profile in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            journal.write(json.dumps(record) + "\n")
+            journal.flush()
+            summary['solved'] += 1
+            summary[record['status']] = summary.get(record['status'], 0) + 1
+            if progress:
+                progress(record)
+
+    if journal_path != output_path:
+        write_parquet(journal_path, output_path)
+    return summary
+
+
+def write_parquet(journal_path, parquet_path):
+    """Converts a results journal to Parquet, keeping the latest record per id (plans as JSON text)."""
+    records = {}
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record['id']] = record
+    df = pd.DataFrame(list(records.values()))
+    if 'plan' in df.columns:
+        df['plan'] = df['plan'].map(json.dumps)
+    df.to_parquet(parquet_path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('profiles', help="Input .csv or .jsonl file of client profiles.")
+    parser.add_argument('output', help="Output .jsonl (streamed) or .parquet file.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per core).")
+    parser.add_argument('--time-limit', type=int, default=DEFAULT_TIME_LIMIT, help="Solver time limit per client in seconds.")
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS, help="Plan length in days (default: one week).")
+    parser.add_argument('--restart', action='store_true', help="Discard earlier results instead of resuming.")
+    args = parser.parse_args(argv)
+
+    profiles = read_profiles(args.profiles)
+    total = len(profiles)
+    done = [0]
+    def report(record):
+        done[0] += 1
+        print(f"[{done[0]}] {record['id']}: {record['status']} ({record['seconds']:.1f} s)", flush=True)
+
+    summary = run_batch(profiles, args.output, workers=args.workers, time_limit=args.time_limit,
+                        restart=args.restart, progress=report, days=args.days)
+    print(f"Finished {summary['solved']} of {total} profiles ({summary['skipped']} already done): "
+          + ", ".join(f"{k}={v}" for k, v in summary.items() if k not in ('skipped', 'solved')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# core/corpus.py
+"""
+A local corpus of solved plan models, for reproducing and benchmarking optimizer changes.
+
+Each case is a directory holding everything needed to solve the same problem again:
+
+    case.json        scalar inputs, food lists and groups, model options, the solver
+                     used and the outcome (status, objective, seconds)
+    nutrition.csv    the catalog as passed to the optimizer
+    prices.csv       price per gram
+    intake.csv       the personalized requirement table
+    model.mps        the built model exactly as the solver saw it (not for rolling plans)
+    solver.log       the solver's own log, when the backend writes one (CBC)
+
+optimizer.create_and_solve_model saves a case after every solve when given corpus_dir
+or when DIET_PLANNER_CORPUS_DIR is set; benchmarks/replay.py re-solves a corpus with
+any backend or formulation and reports the time and objective deltas.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+from pulp import LpStatus
+
+# Off unless configured: every solve adds a case, so this is for capturing regressions.
+CORPUS_DIR = os.environ.get('DIET_PLANNER_CORPUS_DIR')
+CASE_FILE_NAME = 'case.json'
+MODEL_FILE_NAME = 'model.mps'
+LOG_FILE_NAME = 'solver.log'
+
+
+def save_case(corpus_dir, prob, model_args, model_options, *, solver=None, seconds=None,
+              warm_start_plan=None, log_path=None, write_mps=True):
+    """
+    Writes one solved model to a new case directory under corpus_dir and returns its path.
+
+    model_args are create_and_solve_model's ten positional inputs (as a dict by name),
+    model_options its keyword options. The case name starts with the save time, so a
+    directory listing is in solve order.
+    """
+    (nutrition_df, prices_series, intake_df, food_group_map, foods_to_exclude, foods_to_include,
+     daily_diversity_target, days_of_week, nutrient_mode, variety_level) = model_args.values()
+    status = LpStatus[prob.status]
+    objective = prob.objective.value() if status == 'Optimal' and prob.objective is not None else None
+    case = {
+        'saved': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'inputs': {
+            'food_group_map': dict(food_group_map), 'foods_to_exclude': list(foods_to_exclude),
+            'foods_to_include': list(foods_to_include), 'daily_diversity_target': daily_diversity_target,
+            'days_of_week': int(days_of_week), 'nutrient_mode': nutrient_mode, 'variety_level': variety_level,
+        },
+        'model_options': model_options,
+        'warm_start_plan': dict(warm_start_plan) if warm_start_plan else None,
+        'solver': {'name': getattr(solver, 'name', None), 'time_limit': getattr(solver, 'timeLimit', None),
+                   'options': {k: v for k, v in getattr(solver, 'optionsDict', {}).items()
+                               if k not in ('logPath', 'progress', 'interrupt')}},
+        'result': {'status': status, 'objective': objective, 'seconds': seconds,
+                   'sol_status': getattr(prob, 'sol_status', None)},
+    }
+    payload = json.dumps(case, sort_keys=True, default=str)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}_{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:10]}"
+    path = os.path.join(corpus_dir, name)
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, CASE_FILE_NAME), 'w', encoding='utf-8') as f:
+        f.write(json.dumps(case, sort_keys=True, indent=2, default=str))
+    nutrition_df.to_csv(os.path.join(path, 'nutrition.csv'))
+    prices_series.rename('price').to_csv(os.path.join(path, 'prices.csv'))
+    intake_df.to_csv(os.path.join(path, 'intake.csv'))
+    if write_mps:
+        prob.writeMPS(os.path.join(path, MODEL_FILE_NAME))
+    if log_path and os.path.exists(log_path):
+        shutil.copyfile(log_path, os.path.join(path, LOG_FILE_NAME))
+    return path
+
+
+def load_case(path):
+    """
+    Reads a case directory back. Returns (model_args, case): model_args as a dict of
+    create_and_solve_model's positional inputs, case the parsed case.json.
+    """
+    with open(os.path.join(path, CASE_FILE_NAME), 'r', encoding='utf-8') as f:
+        case = json.load(f)
+    inputs = case['inputs']
+    model_args = {
+        'nutrition_df': pd.read_csv(os.path.join(path, 'nutrition.csv'), index_col=0),
+        'prices_series': pd.read_csv(os.path.join(path, 'prices.csv'), index_col=0)['price'],
+        'intake_df': pd.read_csv(os.path.join(path, 'intake.csv'), index_col=0),
+        'food_group_map': inputs['food_group_map'],
+        'foods_to_exclude': inputs['foods_to_exclude'],
+        'foods_to_include': inputs['foods_to_include'],
+        'daily_diversity_target': inputs['daily_diversity_target'],
+        'days_of_week': inputs['days_of_week'],
+        'nutrient_mode': inputs['nutrient_mode'],
+        'variety_level': inputs['variety_level'],
+    }
+    return model_args, case
+
+
+def list_cases(corpus_dir=None):
+    """Case directories under corpus_dir (default CORPUS_DIR), oldest first."""
+    corpus_dir = corpus_dir or CORPUS_DIR
+    if not corpus_dir or not os.path.isdir(corpus_dir):
+        return []
+    return [os.path.join(corpus_dir, name) for name in sorted(os.listdir(corpus_dir))
+            if os.path.isfile(os.path.join(corpus_dir, name, CASE_FILE_NAME))]
+
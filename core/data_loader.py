@@ -2,6 +2,8 @@
 import pandas as pd
 import os
 
+from core import tracing
+
 # Define the path to the data directory relative to this file's location
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
 
@@ -17,6 +19,7 @@ def load_coffee_data():
     coffee_df = coffee_df.set_index('coffee_type')
     return coffee_df
 
+@tracing.traced('load_data')
 def load_and_clean_data():
     """
     Loads all required data from CSV files, cleans it, and aligns it.
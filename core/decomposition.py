@@ -0,0 +1,283 @@
+# core/decomposition.py
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pulp import LpProblem, LpMinimize, LpVariable, LpStatus, PULP_CBC_CMD, lpSum, value
+
+from core import optimizer, solver_log
+
+# =============================================================================
+# --- DAY-MENU DECOMPOSITION ---
+# =============================================================================
+#
+# The weekly model is seven copies of one day model tied together only by weekly
+# rules (repetition caps, forced inclusions, mutually exclusive groups). This
+# module solves it by column generation over day menus:
+#
+#   * master:  choose how many times each known day menu is used so that the
+#              week has DAYS menus and respects every weekly rule;
+#   * pricing: the single-day MILP with the master's duals on the selection
+#              binaries, which proposes the menu with the most negative reduced cost.
+#
+# The LP master gives a Lagrangian lower bound (z_LP + DAYS * min reduced cost);
+# the integer master over the collected menus gives a feasible week (upper bound).
+# Because the days are identical, each round prices one exact subproblem plus
+# "tabu" variants that forbid the most-used foods, all solved concurrently in a
+# process pool, so every core contributes new menus.
+
+MAX_ITERATIONS = 200
+INCUMBENT_EVERY = 10 # iterations between integer-master solves for the gap check
+PRICING_TIME_LIMIT = 20 # seconds per pricing MILP
+GAP_TOLERANCE = 0.01
+REDUCED_COST_TOLERANCE = 1e-6
+ARTIFICIAL_COST_FACTOR = 100 # master slack cost relative to the priciest menu
+MIN_PRICING_VARIANTS = 3 # pricing problems per round, even on machines with fewer cores
+FINAL_MASTER_SHARE = 0.15 # share of the time limit kept for the final integer master
+
+_PRICING_MODEL = None # built once per worker process by _init_pricing_worker
+
+
+def _init_pricing_worker(model_args, model_kwargs):
+    global _PRICING_MODEL
+    _PRICING_MODEL = optimizer.build_day_model(*model_args, **model_kwargs)
+
+
+def _solve_pricing(penalties, tabu_foods, time_limit):
+    """
+    Solves the day model with `penalties` added to the selection binaries' costs and
+    the foods in `tabu_foods` forbidden. Runs inside a worker process.
+    """
+    prob, food_vars, food_is_selected, matrices = _PRICING_MODEL
+    keys = list(food_vars)
+    objective = optimizer._affine([food_vars[key] for key in keys], matrices.prices)
+    for key in keys:
+        if penalties.get(key[0]):
+            objective[food_is_selected[key]] = penalties[key[0]]
+    prob.setObjective(objective)
+
+    tabu_keys = [key for key in keys if key[0] in tabu_foods]
+    for key in tabu_keys:
+        food_is_selected[key].upBound = 0
+        food_vars[key].upBound = 0
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_path = os.path.join(tmp_dir, 'pricing.log')
+            prob.solve(PULP_CBC_CMD(timeLimit=time_limit, msg=False, logPath=log_path))
+            summary = solver_log.read_cbc_log(log_path)
+    finally:
+        for key in tabu_keys:
+            food_is_selected[key].upBound = 1
+            food_vars[key].upBound = None
+
+    status = LpStatus[prob.status]
+    if status != 'Optimal' or food_vars[keys[0]].varValue is None:
+        return {'status': status, 'menu': None, 'objective': None, 'bound': None}
+
+    grams = {key[0]: food_vars[key].varValue for key in keys if food_vars[key].varValue > 0.01}
+    selected = frozenset(key[0] for key in keys if food_is_selected[key].varValue > 0.5)
+    cost = sum(price * grams.get(f, 0) for f, price in zip(matrices.foods, matrices.prices.tolist()))
+    objective_value = value(prob.objective)
+    bound = summary['best_bound'] if summary['best_bound'] is not None else objective_value
+    return {'status': status, 'menu': {'cost': cost, 'selected': selected, 'grams': grams},
+            'objective': objective_value, 'bound': min(bound, objective_value)}
+
+
+def _solve_master(menus, days, capped_foods, weekly_max_occurrences, foods_to_include, exclusive_groups,
+                  integer, time_limit=None):
+    """
+    Builds and solves the menu-selection master. The LP version carries penalized
+    slacks so it is always feasible and its duals are defined; the integer version
+    is hard-constrained and yields a feasible week when one exists among the menus.
+    """
+    prob = LpProblem("Weekly_Menu_Master", LpMinimize)
+    counts = [LpVariable(f"MenuCount_{i}", lowBound=0, upBound=len(days), cat='Integer' if integer else 'Continuous')
+              for i in range(len(menus))]
+    penalty = ARTIFICIAL_COST_FACTOR * max(menu['cost'] for menu in menus)
+    used_foods = set().union(*(menu['selected'] for menu in menus))
+
+    def usage(food):
+        return lpSum(n for n, menu in zip(counts, menus) if food in menu['selected'])
+
+    slacks = []
+    def slack(name):
+        if integer:
+            return 0
+        var = LpVariable(f"Slack_{name}", lowBound=0)
+        slacks.append(var)
+        return var
+
+    prob += lpSum(counts) == len(days), "Convexity"
+    for food in capped_foods:
+        if food in used_foods:
+            prob += usage(food) - slack(f"Cap_{food}") <= weekly_max_occurrences, f"Cap_{food}"
+    for food in foods_to_include:
+        prob += usage(food) + slack(f"Include_{food}") >= 1, f"Include_{food}"
+    for group in exclusive_groups:
+        food_is_used = {f: LpVariable(f"WeeklyFoodUsed_{f}", lowBound=0, upBound=1, cat='Integer' if integer else 'Continuous')
+                        for f in group}
+        for f in group:
+            if f in used_foods:
+                prob += usage(f) - len(days) * food_is_used[f] <= 0, f"Exclusive_Link_{f}"
+        prob += lpSum(food_is_used.values()) <= 1, f"Exclusive_Group_{'_'.join(group)}"
+    # Set last so that the slacks created while building the rows are priced in.
+    prob.setObjective(lpSum(menu['cost'] * n for n, menu in zip(counts, menus)) + penalty * lpSum(slacks))
+
+    prob.solve(PULP_CBC_CMD(timeLimit=time_limit, msg=False))
+    return prob, counts
+
+
+def _master_duals(prob, foods):
+    """Per-food dual prices of the rows the selection binaries appear in, plus the convexity dual."""
+    duals = {}
+    for food in foods:
+        pi = 0.0
+        for prefix in ("Cap_", "Include_", "Exclusive_Link_"):
+            constraint = prob.constraints.get(f"{prefix}{food}")
+            if constraint is not None and constraint.pi is not None:
+                pi += constraint.pi
+        if pi:
+            duals[food] = pi
+    return duals, prob.constraints["Convexity"].pi or 0.0
+
+
+def solve_decomposed(nutrition_df, prices_series, intake_df, food_group_map,
+                     foods_to_exclude, foods_to_include, daily_diversity_target,
+                     days_of_week, nutrient_mode, variety_level, *, max_workers=None,
+                     time_limit=180, max_iterations=MAX_ITERATIONS, gap_tolerance=GAP_TOLERANCE,
+                     pricing_time_limit=PRICING_TIME_LIMIT, balance_formulation='compact'):
+    """
+    Solves the weekly plan by day-menu column generation with pricing in a process pool.
+
+    Takes the same inputs as optimizer.create_and_solve_model and returns
+    (prob, food_vars, days, report): prob is the integer menu master (its status and
+    objective are the week's), food_vars maps (food, day) to variables carrying the
+    chosen grams, and report holds 'lower_bound', 'upper_bound', 'gap', 'iterations',
+    'menus' and 'seconds'.
+    """
+    start = time.perf_counter()
+    (_, weekly_max_occurrences, _, apply_repetition_cap_to_staples) = optimizer._get_variety_settings(variety_level)
+
+    days = optimizer.horizon_days(days_of_week)
+    if len(days) > len(optimizer.DAYS_OF_WEEK):
+        raise ValueError("Column generation plans at most one week; use rolling mode for longer plans.")
+    foods = [f for f in nutrition_df.index.tolist() if f not in foods_to_exclude]
+    foods_to_include = [f for f in foods_to_include if f in foods]
+    capped_foods = foods if apply_repetition_cap_to_staples else [f for f in foods if f not in optimizer.STAPLE_FOODS]
+    exclusive_groups = [[f for f in group if f in foods] for group in optimizer.MUTUALLY_EXCLUSIVE_GROUPS]
+    exclusive_groups = [group for group in exclusive_groups if group]
+
+    max_workers = max_workers or os.cpu_count() or 1
+    model_args = (nutrition_df, prices_series, intake_df, food_group_map, foods,
+                  daily_diversity_target, nutrient_mode, variety_level)
+    model_kwargs = {'balance_formulation': balance_formulation}
+
+    menus, seen = [], set()
+    def add_menu(menu):
+        key = (menu['selected'], round(menu['cost'], 2))
+        if key not in seen:
+            seen.add(key)
+            menus.append(menu)
+            return True
+        return False
+
+    lower_bound, iterations = float('-inf'), 0
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_pricing_worker,
+                             initargs=(model_args, model_kwargs)) as pool:
+        duals, usage_rank = {}, []
+        master_value = convexity_dual = None
+        while iterations < max_iterations:
+            iterations += 1
+            remaining = time_limit * (1 - FINAL_MASTER_SHARE) - (time.perf_counter() - start)
+            if remaining <= 1:
+                break
+            penalties = {f: -pi for f, pi in duals.items()}
+            tasks = [pool.submit(_solve_pricing, penalties, (), min(pricing_time_limit, remaining))]
+            for food in usage_rank[:max(max_workers, MIN_PRICING_VARIANTS) - 1]:
+                tasks.append(pool.submit(_solve_pricing, penalties, (food,), min(pricing_time_limit, remaining)))
+            results = [task.result() for task in tasks]
+
+            exact = results[0]
+            if exact['menu'] is None and not menus:
+                break # the day model itself is infeasible
+            if master_value is not None and exact['bound'] is not None:
+                # Lagrangian bound of the master whose duals priced this round.
+                min_reduced_cost = exact['bound'] - convexity_dual
+                lower_bound = max(lower_bound, master_value + len(days) * min(0.0, min_reduced_cost))
+                if min_reduced_cost >= -REDUCED_COST_TOLERANCE * max(1.0, abs(master_value)):
+                    break
+
+            if not sum(add_menu(r['menu']) for r in results if r['menu'] is not None):
+                break
+            master, counts = _solve_master(menus, days, capped_foods, weekly_max_occurrences,
+                                           foods_to_include, exclusive_groups, integer=False)
+            duals, convexity_dual = _master_duals(master, foods)
+            master_value = value(master.objective)
+
+            if iterations % INCUMBENT_EVERY == 0 and lower_bound > float('-inf'):
+                incumbent, _ = _solve_master(menus, days, capped_foods, weekly_max_occurrences,
+                                             foods_to_include, exclusive_groups, integer=True,
+                                             time_limit=max(1, pricing_time_limit))
+                if LpStatus[incumbent.status] == 'Optimal':
+                    incumbent_value = value(incumbent.objective)
+                    if (incumbent_value - lower_bound) / max(abs(incumbent_value), 1e-9) <= gap_tolerance:
+                        break
+
+            usage = {}
+            for n, menu in zip(counts, menus):
+                for f in menu['selected']:
+                    if f not in optimizer.STAPLE_FOODS:
+                        usage[f] = usage.get(f, 0) + (n.varValue or 0)
+            usage_rank = sorted(usage, key=usage.get, reverse=True)
+
+    result_prob, food_vars, upper_bound = _build_week(menus, days, capped_foods, weekly_max_occurrences,
+                                                      foods_to_include, exclusive_groups, foods,
+                                                      max(1, time_limit - (time.perf_counter() - start)))
+    if upper_bound is None and menus:
+        # The collected menus cannot be combined into a valid week: fall back to the
+        # full weekly model restricted to the foods that appear in any menu.
+        menu_foods = set().union(*(menu['selected'] for menu in menus)) | set(foods_to_include)
+        result_prob, food_vars, days = optimizer.create_and_solve_model(
+            nutrition_df, prices_series, intake_df, food_group_map,
+            [f for f in nutrition_df.index if f not in menu_foods], foods_to_include, daily_diversity_target,
+            days_of_week, nutrient_mode, variety_level,
+            solver_name=PULP_CBC_CMD(timeLimit=max(1, time_limit - (time.perf_counter() - start)), msg=False),
+            balance_formulation=balance_formulation, symmetry_breaking=True
+        )
+        if LpStatus[result_prob.status] == 'Optimal' and result_prob.objective is not None:
+            upper_bound = value(result_prob.objective)
+    gap = None
+    if upper_bound is not None and lower_bound > float('-inf'):
+        gap = max(0.0, (upper_bound - lower_bound) / max(abs(upper_bound), 1e-9))
+    report = {
+        'lower_bound': lower_bound if lower_bound > float('-inf') else None,
+        'upper_bound': upper_bound, 'gap': gap, 'iterations': iterations,
+        'menus': len(menus), 'seconds': time.perf_counter() - start,
+    }
+    return result_prob, food_vars, days, report
+
+
+def _build_week(menus, days, capped_foods, weekly_max_occurrences, foods_to_include, exclusive_groups, foods, time_limit):
+    """Solves the integer master over the collected menus and lays the chosen menus out over the days."""
+    food_vars = LpVariable.dicts("FoodGrams", [(f, d) for f in foods for d in days], lowBound=0, cat='Continuous')
+    if not menus:
+        prob = LpProblem("Weekly_Menu_Master", LpMinimize)
+        prob.status = -1 # Infeasible: no feasible day menu exists
+        return prob, food_vars, None
+
+    prob, counts = _solve_master(menus, days, capped_foods, weekly_max_occurrences,
+                                 foods_to_include, exclusive_groups, integer=True, time_limit=time_limit)
+    if LpStatus[prob.status] != 'Optimal':
+        return prob, food_vars, None
+
+    chosen = []
+    for n, menu in zip(counts, menus):
+        chosen.extend([menu] * int(round(n.varValue or 0)))
+    chosen.sort(key=lambda menu: menu['cost'])
+    for (f, d), var in food_vars.items():
+        var.varValue = 0.0
+    for d, menu in zip(days, chosen):
+        for f, grams in menu['grams'].items():
+            food_vars[(f, d)].varValue = grams
+    return prob, food_vars, value(prob.objective)
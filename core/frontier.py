@@ -0,0 +1,195 @@
+# core/frontier.py
+"""
+Cost-versus-variety frontier: plans for every variety level of one profile.
+
+The levels are nested: every rule of a level is at least as strict at the next one
+(more items per group, fewer repeats, the balanced-energy rule from level 2 on), so
+a plan for a higher level is also a valid plan for any lower one. compute_frontier
+uses that twice: levels are solved from the highest down, each warm-started from
+the best plan already found for a higher level, and a level whose own solve came back
+worse (or not at all within its time limit) falls back to that plan. The solves are
+ordinary jobs of core/jobs.py, so they share its concurrency cap and queue.
+"""
+import threading
+import time
+
+from core import jobs, plan_cache
+
+VARIETY_LEVELS = (1, 2, 3, 4, 5)
+DEFAULT_TIME_LIMIT = 180 # seconds per level, as in the app
+POLL_SECONDS = 0.5
+
+
+def _best_higher_plan(records, level):
+    """The cheapest plan found for any level above `level` (valid for `level` too), as a record."""
+    candidates = [r for l, r in records.items() if l > level and r['plan'] is not None]
+    return min(candidates, key=lambda r: r['objective'], default=None)
+
+
+def compute_frontier(nutrition_df, prices_series, intake_df, food_group_map,
+                     foods_to_exclude, foods_to_include, daily_diversity_target,
+                     days_of_week, nutrient_mode, *, levels=VARIETY_LEVELS, time_limit=DEFAULT_TIME_LIMIT,
+                     solver_name='PULP_CBC_CMD', manager=None, cache=None, progress=None, on_submit=None,
+                     **model_options):
+    """
+    Plans the given inputs at every variety level and returns the cost/variety trade-off.
+
+    Levels proven in the plan cache are taken from it; the rest are submitted as jobs
+    to the JobManager (default: the process-wide one), so they queue behind, and are
+    capped with, every other plan request. Levels are submitted highest first, at most
+    max_concurrent of them at a time, each warm-started from the best plan of a higher
+    level finished so far (or from the level's own unproven cached plan). A full queue
+    raises jobs.SchedulerBusy. Every result is written back under the same key the
+    Step 3 page uses (plan_cache.key_options of model_options), so picking another level
+    afterwards is a cache hit.
+
+    Returns one dict per level, lowest first: 'level', 'status', 'objective',
+    'unique_foods', 'plan', 'proven_optimal', 'cached', 'source_level' (the level whose
+    solve produced the plan) and 'seconds'. `progress`, if given, is called with each
+    level's dict as soon as it is known, and on_submit with (level, job_id) as each
+    level's job is submitted.
+    """
+    manager = manager or jobs.get_default_manager()
+    cache = cache or plan_cache.get_default_cache()
+    base_inputs = dict(
+        nutrition_df=nutrition_df, prices_series=prices_series, intake_df=intake_df, food_group_map=food_group_map,
+        foods_to_exclude=foods_to_exclude, foods_to_include=foods_to_include,
+        daily_diversity_target=daily_diversity_target, days_of_week=days_of_week, nutrient_mode=nutrient_mode,
+    )
+    options = plan_cache.key_options(model_options)
+    keys = {level: plan_cache.make_cache_key(**base_inputs, variety_level=level, **options) for level in levels}
+
+    records, unproven = {}, {}
+    for level in levels:
+        cached = cache.get(keys[level], proven_only=True)
+        if cached is not None:
+            records[level] = {'level': level, 'status': cached['status'], 'objective': cached['objective'],
+                              'plan': cached['plan'] or None, 'proven_optimal': True, 'error': None,
+                              'source_level': level, 'seconds': 0.0, 'cached': True}
+            if progress:
+                progress(_summarize(records[level]))
+        else:
+            plan = cache.unproven_plan(keys[level])
+            if plan is not None:
+                unproven[level] = plan
+
+    pending = sorted((level for level in levels if level not in records), reverse=True)
+    running = {}
+    try:
+        while pending or running:
+            while pending and len(running) < manager.max_concurrent:
+                level = pending.pop(0)
+                if any(r['status'] == 'Infeasible' for l, r in records.items() if l < level):
+                    # A looser level has no plan, so this one cannot have one either.
+                    records[level] = _record_without_solve(level, 'Infeasible')
+                    continue
+                higher = _best_higher_plan(records, level)
+                job_id = manager.submit(**base_inputs, variety_level=level, time_limit=time_limit, solver_name=solver_name,
+                                        warm_start_plan=higher['plan'] if higher else unproven.get(level), **model_options)
+                running[job_id] = level
+                if on_submit:
+                    on_submit(level, job_id)
+            if not running:
+                break
+            time.sleep(POLL_SECONDS)
+            for job_id, level in list(running.items()):
+                status = manager.status(job_id)
+                if status is None or status['done']:
+                    del running[job_id]
+                    records[level] = _job_record(level, status)
+                    if progress:
+                        progress(_summarize(records[level]))
+    finally:
+        for job_id in running: # only reached on an error; the levels still solving are not wanted any more
+            manager.cancel(job_id)
+
+    frontier = []
+    for level in sorted(records):
+        record = records[level]
+        higher = _best_higher_plan(records, level)
+        if higher is not None and (record['plan'] is None or higher['objective'] < record['objective']) \
+                and record['status'] != 'Infeasible':
+            record = dict(record, status='Optimal', objective=higher['objective'], plan=higher['plan'],
+                          proven_optimal=False, source_level=higher['source_level'])
+            records[level] = record
+        if not record['cached'] and record['status'] in plan_cache.CACHEABLE_STATUSES:
+            cache.put(keys[level], record['status'], record['objective'], record['plan'] or {},
+                      proven=record['status'] == 'Infeasible' or record['proven_optimal'])
+        frontier.append(_summarize(record))
+    return frontier
+
+
+def _record_without_solve(level, status):
+    return {'level': level, 'status': status, 'objective': None, 'plan': None, 'proven_optimal': False,
+            'error': None, 'source_level': level, 'seconds': 0.0, 'cached': False}
+
+
+def _job_record(level, progress):
+    """A finished job's outcome (see jobs.JobManager.status) as a level record."""
+    if progress is None: # expired from the manager before it was read
+        return _record_without_solve(level, 'Error')
+    has_plan = progress['state'] == 'Optimal' and progress['plan'] is not None
+    return {'level': level, 'status': progress['state'], 'objective': progress['objective'] if has_plan else None,
+            'plan': progress['plan'] if has_plan else None, 'proven_optimal': has_plan and progress['proven_optimal'],
+            'error': progress.get('error'), 'source_level': level, 'seconds': progress['elapsed'], 'cached': False}
+
+
+def _summarize(record):
+    plan = record['plan']
+    unique_foods = len({f for day_plan in plan.values() for f in day_plan}) if plan else None
+    return dict(record, unique_foods=unique_foods)
+
+
+class FrontierRun:
+    """
+    A compute_frontier call running in a background thread. Its solves wait in the
+    JobManager queue like any other plan request; progress() lists the levels finished
+    so far and waiting() where the unfinished ones stand.
+    """
+
+    def __init__(self, *args, manager=None, **kwargs):
+        self.manager = manager or jobs.get_default_manager()
+        self.levels = {}
+        self.jobs = {}
+        self.frontier = None
+        self.error = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, args=(args, kwargs), daemon=True)
+        self._thread.start()
+
+    def _run(self, args, kwargs):
+        def record(level):
+            with self._lock:
+                self.levels[level['level']] = level
+
+        def submitted(level, job_id):
+            with self._lock:
+                self.jobs[level] = job_id
+        try:
+            self.frontier = compute_frontier(*args, manager=self.manager, progress=record, on_submit=submitted, **kwargs)
+            with self._lock:
+                self.levels = {level['level']: level for level in self.frontier}
+        except Exception as e:
+            self.error = str(e)
+
+    def progress(self):
+        """The summaries of the levels known so far, lowest level first."""
+        with self._lock:
+            return [self.levels[level] for level in sorted(self.levels)]
+
+    def waiting(self):
+        """
+        The submitted levels not finished yet, highest first: 'level', 'state' and
+        'queue_position' (see jobs.JobManager.status; None once the level is solving).
+        """
+        with self._lock:
+            unfinished = {level: job_id for level, job_id in self.jobs.items() if level not in self.levels}
+        waiting = []
+        for level in sorted(unfinished, reverse=True):
+            status = self.manager.status(unfinished[level])
+            if status is not None and not status['done']:
+                waiting.append({'level': level, 'state': status['state'], 'queue_position': status['queue_position']})
+        return waiting
+
+    def done(self):
+        return not self._thread.is_alive()
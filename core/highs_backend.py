@@ -0,0 +1,212 @@
+# core/highs_backend.py
+"""
+In-memory HiGHS backend: a PuLP solver that hands the model to HiGHS as arrays.
+
+PuLP's command-line backends write every model to an .mps/.lp temp file, run the
+solver as a subprocess and parse a solution file back. HighsInMemory instead turns the
+LpProblem into column bounds, costs and a row-wise (CSR) constraint matrix with
+model_arrays and passes them to highspy in one call, so there is no file I/O, no
+subprocess and nothing left in the temp directory. It is an ordinary PuLP solver:
+create_and_solve_model (and everything built on it) takes it as solver_name, and the
+problem comes back with the usual status, sol_status and variable values.
+
+highspy is optional (see requirements.txt). Without it available() is False and
+list_solvers leaves the backend out. With it, the backend is listed after PuLP's own
+solvers, so the app keeps defaulting to CBC; the solver portfolio races it and it can be
+passed by name. benchmarks/solver_backend.py checks its status and cost against CBC.
+"""
+import numpy as np
+from pulp import (LpSolver, LpInteger, LpMaximize, LpStatusInfeasible, LpStatusNotSolved, LpStatusOptimal,
+                  LpStatusUnbounded, LpSolutionInfeasible, LpSolutionIntegerFeasible, LpSolutionNoSolutionFound,
+                  LpSolutionOptimal, LpSolutionUnbounded, PulpSolverError, getSolver, listSolvers)
+
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+SOLVER_NAME = 'HIGHS_INMEMORY'
+
+
+def model_arrays(prob):
+    """
+    Returns prob as arrays: 'variables' (the LpVariables, in column order), 'cost',
+    'offset', 'col_lower', 'col_upper', 'integer' (bool per column), 'row_names',
+    'row_lower', 'row_upper' and the CSR matrix 'start', 'index', 'value'.
+
+    Missing bounds are +/-inf. The objective is always to be minimized (a maximization's
+    costs and offset are negated); rows keep their own sense through their bounds.
+    """
+    variables = prob.variables()
+    position = {var.name: i for i, var in enumerate(variables)}
+    sign = -1.0 if prob.sense == LpMaximize else 1.0
+
+    cost = np.zeros(len(variables))
+    for var, coeff in (prob.objective or {}).items():
+        cost[position[var.name]] = sign * coeff
+    offset = sign * (prob.objective.constant if prob.objective is not None else 0.0)
+
+    col_lower = np.array([-np.inf if v.lowBound is None else v.lowBound for v in variables], dtype=float)
+    col_upper = np.array([np.inf if v.upBound is None else v.upBound for v in variables], dtype=float)
+    integer = np.array([v.cat == LpInteger for v in variables], dtype=bool)
+
+    constraints = list(prob.constraints.items())
+    start = np.zeros(len(constraints) + 1, dtype=np.int64)
+    index, coeffs = [], []
+    row_lower, row_upper = np.empty(len(constraints)), np.empty(len(constraints))
+    for r, (_, constraint) in enumerate(constraints):
+        for var, coeff in constraint.items():
+            if coeff != 0:
+                index.append(position[var.name])
+                coeffs.append(coeff)
+        start[r + 1] = len(index)
+        low, up = constraint.getLb(), constraint.getUb()
+        row_lower[r] = -np.inf if low is None else low
+        row_upper[r] = np.inf if up is None else up
+
+    return {
+        'variables': variables, 'cost': cost, 'offset': offset,
+        'col_lower': col_lower, 'col_upper': col_upper, 'integer': integer,
+        'row_names': [name for name, _ in constraints], 'row_lower': row_lower, 'row_upper': row_upper,
+        'start': start, 'index': np.array(index, dtype=np.int64), 'value': np.array(coeffs, dtype=float),
+    }
+
+
+class HighsInMemory(LpSolver):
+    """
+    PuLP solver running HiGHS in-process on model_arrays (see the module docstring).
+
+    Takes PuLP's usual timeLimit, msg, threads, gapRel and warmStart options; any other
+    keyword is passed to HiGHS as an option of that name. With warmStart, the variables'
+    current values are handed to HiGHS as a starting solution. After a MIP solve the
+    best bound HiGHS proved is kept as prob.best_bound.
+
+    Two options follow a MIP search while it runs, through HiGHS callbacks: progress is
+    called as progress(objective, best_bound, values) whenever HiGHS finds a better plan
+    or logs its search (objective is None until there is a plan; values is the new plan
+    as {variable name: value}, None for log events), and interrupt is polled during the
+    search; once it returns True, HiGHS stops and keeps the best plan found.
+    """
+
+    name = SOLVER_NAME
+
+    def __init__(self, mip=True, msg=True, timeLimit=None, threads=None, gapRel=None, warmStart=False, **solverParams):
+        super().__init__(mip=mip, msg=msg, timeLimit=timeLimit, threads=threads, gapRel=gapRel,
+                         warmStart=warmStart, **solverParams)
+
+    def available(self):
+        return highspy is not None
+
+    def actualSolve(self, lp):
+        if highspy is None:
+            raise PulpSolverError(f"{SOLVER_NAME}: highspy is not installed")
+        arrays = model_arrays(lp)
+        h = highspy.Highs()
+        self._configure(h)
+        h.passModel(self._highs_lp(arrays))
+        if arrays['integer'].any() and self.mip:
+            self._watch_search(h, arrays['variables'], arrays['offset'], -1.0 if lp.sense == LpMaximize else 1.0)
+        if self.optionsDict.get('warmStart') and all(v.varValue is not None for v in arrays['variables']):
+            start = highspy.HighsSolution()
+            start.col_value = [v.varValue for v in arrays['variables']]
+            h.setSolution(start)
+        h.run()
+
+        status, sol_status = self._read_status(h)
+        has_solution = h.getInfo().primal_solution_status == highspy.SolutionStatus.kSolutionStatusFeasible
+        values = h.getSolution().col_value if has_solution else [None] * len(arrays['variables'])
+        for var, val in zip(arrays['variables'], values):
+            var.varValue = val
+            var.modified = False
+        if arrays['integer'].any() and self.mip:
+            sign = -1.0 if lp.sense == LpMaximize else 1.0
+            lp.best_bound = sign * (h.getInfo().mip_dual_bound + arrays['offset'])
+        lp.assignStatus(status, sol_status)
+        return status
+
+    def _configure(self, h):
+        h.setOptionValue('output_flag', bool(self.msg))
+        if self.timeLimit is not None:
+            h.setOptionValue('time_limit', float(self.timeLimit))
+        for option, highs_option in (('threads', 'threads'), ('gapRel', 'mip_rel_gap')):
+            if self.optionsDict.get(option) is not None:
+                h.setOptionValue(highs_option, self.optionsDict[option])
+        for key, val in self.optionsDict.items():
+            if key not in ('threads', 'gapRel', 'warmStart', 'logPath', 'progress', 'interrupt'):
+                h.setOptionValue(key, val)
+
+    def _watch_search(self, h, variables, offset, sign):
+        """Connects the progress and interrupt options to the MIP callbacks of h."""
+        progress, interrupt = self.optionsDict.get('progress'), self.optionsDict.get('interrupt')
+        if progress is None and interrupt is None:
+            return
+        kinds = highspy.cb.HighsCallbackType
+        names = [var.name for var in variables]
+
+        def callback(kind, message, data_out, data_in, user_data):
+            if kind == kinds.kCallbackMipInterrupt:
+                data_in.user_interrupt = bool(interrupt())
+                return
+            objective, bound = data_out.mip_primal_bound, data_out.mip_dual_bound
+            values = None
+            if kind == kinds.kCallbackMipImprovingSolution:
+                values = dict(zip(names, data_out.mip_solution.tolist()))
+            progress(sign * (objective + offset) if np.isfinite(objective) else None,
+                     sign * (bound + offset) if np.isfinite(bound) else None, values)
+
+        h.setCallback(callback, None)
+        if progress is not None:
+            h.startCallback(kinds.kCallbackMipImprovingSolution)
+            h.startCallback(kinds.kCallbackMipLogging)
+        if interrupt is not None:
+            h.startCallback(kinds.kCallbackMipInterrupt)
+
+    def _highs_lp(self, arrays):
+        model = highspy.HighsLp()
+        model.num_col_ = len(arrays['cost'])
+        model.num_row_ = len(arrays['row_lower'])
+        model.col_cost_ = arrays['cost']
+        model.offset_ = arrays['offset']
+        model.col_lower_ = arrays['col_lower']
+        model.col_upper_ = arrays['col_upper']
+        model.row_lower_ = arrays['row_lower']
+        model.row_upper_ = arrays['row_upper']
+        model.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        model.a_matrix_.start_ = arrays['start']
+        model.a_matrix_.index_ = arrays['index']
+        model.a_matrix_.value_ = arrays['value']
+        if self.mip and arrays['integer'].any():
+            model.integrality_ = [highspy.HighsVarType.kInteger if is_int else highspy.HighsVarType.kContinuous
+                                  for is_int in arrays['integer']]
+        return model
+
+    @staticmethod
+    def _read_status(h):
+        """Maps the HiGHS model status to PuLP's (status, sol_status), as PuLP's CBC backend reports them."""
+        model_status = h.getModelStatus()
+        statuses = highspy.HighsModelStatus
+        if model_status == statuses.kOptimal:
+            return LpStatusOptimal, LpSolutionOptimal
+        if model_status in (statuses.kInfeasible, statuses.kUnboundedOrInfeasible):
+            return LpStatusInfeasible, LpSolutionInfeasible
+        if model_status == statuses.kUnbounded:
+            return LpStatusUnbounded, LpSolutionUnbounded
+        if h.getInfo().primal_solution_status == highspy.SolutionStatus.kSolutionStatusFeasible:
+            # Stopped early (time limit, interrupt, ...) with a plan in hand.
+            return LpStatusOptimal, LpSolutionIntegerFeasible
+        return LpStatusNotSolved, LpSolutionNoSolutionFound
+
+
+def list_solvers(onlyAvailable=False):
+    """pulp.listSolvers with the in-memory HiGHS backend last (when available, or when listing all)."""
+    solvers = listSolvers(onlyAvailable=onlyAvailable)
+    if not onlyAvailable or highspy is not None:
+        solvers = solvers + [SOLVER_NAME]
+    return solvers
+
+
+def get_solver(solver, *args, **kwargs):
+    """pulp.getSolver that also knows SOLVER_NAME."""
+    if solver == SOLVER_NAME:
+        return HighsInMemory(*args, **kwargs)
+    return getSolver(solver, *args, **kwargs)
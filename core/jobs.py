@@ -0,0 +1,296 @@
+# core/jobs.py
+import collections
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from core import anytime, optimizer, plan_cache, tracing
+
+DEFAULT_MAX_CONCURRENT_JOBS = int(os.environ.get('DIET_PLANNER_MAX_SOLVES', os.cpu_count() or 1))
+DEFAULT_MAX_QUEUED_JOBS = int(os.environ.get('DIET_PLANNER_MAX_QUEUED_SOLVES', 50))
+DEFAULT_SOLVER_THREADS = int(os.environ.get('DIET_PLANNER_SOLVER_THREADS', 1)) # per job, so jobs x threads <= cores
+SINGLE_THREADED_SOLVERS = ('GLPK_CMD',) # take no 'threads' option
+METRICS_WINDOW = 200 # recent jobs kept for the wait and run time statistics
+JOB_RETENTION_SECONDS = 3600 # finished jobs stay fetchable this long (and, if proven, coalescible)
+MAX_CACHED_MODELS = 8
+ACTIVE_STATES = ('Queued', 'Running')
+
+
+class SchedulerBusy(RuntimeError):
+    """Raised by JobManager.submit when the queue is full."""
+
+
+class Job:
+    """One planning request: its inputs, the AnytimeSolve doing the work and who is waiting for it."""
+
+    def __init__(self, job_id, key, model_args, time_limit, solver_name, model_options, warm_start_plan):
+        self.job_id = job_id
+        self.key = key
+        self.model_args = model_args
+        self.time_limit = time_limit
+        self.solver_name = solver_name
+        self.model_options = model_options
+        self.warm_start_plan = warm_start_plan
+        self.subscribers = 1
+        self.cancelled = False
+        self.solve = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def state(self):
+        if self.cancelled:
+            return 'Cancelled'
+        if self.error is not None:
+            return 'Error'
+        if self.solve is None:
+            return 'Queued'
+        return self.solve.progress()['status']
+
+
+class JobManager:
+    """
+    Process-wide solve scheduler: runs planning jobs outside any Streamlit script run,
+    at most max_concurrent at a time, in submission (FIFO) order.
+
+    Callers keep only the job id (e.g. in st.session_state), so reruns and page changes
+    do not lose the work; status() polls, accept() ends a running job early with its
+    best plan, cancel() drops it and result() fetches the outcome. Submitting inputs
+    identical to a queued or running job (same plan_cache key and model options), or to
+    a recently finished one that proved its plan optimal or the inputs infeasible, returns
+    that job's id instead of starting another solve; a plan cut short by the time limit
+    or an accept is solved again. A shared job is only stopped once every submitter has
+    cancelled it.
+
+    Admission control: once max_queued jobs are waiting, submit() raises SchedulerBusy
+    instead of queueing more work than the box can finish. Each job's solver gets
+    solver_threads threads, so the cap and the budget together bound CPU use;
+    metrics() reports queue depth and wait times.
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT_JOBS, max_queued=DEFAULT_MAX_QUEUED_JOBS,
+                 solver_threads=DEFAULT_SOLVER_THREADS):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max_queued
+        self.solver_threads = solver_threads
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._queue = collections.deque() # job ids waiting for a worker, oldest first
+        self._jobs = {}
+        self._by_key = {}
+        self._models = {}
+        self._running = 0
+        self._counts = collections.Counter()
+        self._waits = collections.deque(maxlen=METRICS_WINDOW)
+        self._run_times = collections.deque(maxlen=METRICS_WINDOW)
+        for i in range(self.max_concurrent):
+            threading.Thread(target=self._worker, name=f'plan-job-{i}', daemon=True).start()
+
+    def submit(self, nutrition_df, prices_series, intake_df, food_group_map,
+               foods_to_exclude, foods_to_include, daily_diversity_target,
+               days_of_week, nutrient_mode, variety_level, *, time_limit=180,
+               solver_name='PULP_CBC_CMD', warm_start_plan=None, **model_options):
+        """Queues a create_and_solve_model run (solved anytime-style) and returns its job id."""
+        model_args = (nutrition_df, prices_series, intake_df, food_group_map,
+                      foods_to_exclude, foods_to_include, daily_diversity_target,
+                      days_of_week, nutrient_mode, variety_level)
+        key = plan_cache.make_cache_key(nutrition_df, prices_series, intake_df, food_group_map,
+                                        foods_to_exclude, foods_to_include, daily_diversity_target,
+                                        nutrient_mode, variety_level, days_of_week=days_of_week, time_limit=time_limit,
+                                        solver_name=solver_name, **model_options)
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(self._by_key.get(key))
+            if job is not None and self._reusable(job):
+                job.subscribers += 1
+                self._counts['coalesced'] += 1
+                return job.job_id
+            if len(self._queue) >= self.max_queued:
+                self._counts['rejected'] += 1
+                raise SchedulerBusy(f"The planner is busy ({len(self._queue)} plans waiting). Please try again in a few minutes.")
+            job = Job(uuid.uuid4().hex, key, model_args, time_limit, solver_name, model_options, warm_start_plan)
+            self._jobs[job.job_id] = job
+            self._by_key[key] = job.job_id
+            self._queue.append(job.job_id)
+            self._counts['submitted'] += 1
+            self._wakeup.notify()
+        return job.job_id
+
+    def status(self, job_id):
+        """
+        Returns the job's progress (see AnytimeSolve.progress) with 'job_id', 'state' and
+        'queue_position' (1 = next to start, None once started), or None if unknown.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            position = self._queue.index(job_id) + 1 if job_id in self._queue else None
+        progress = job.solve.progress() if job.solve is not None else {
+            'status': 'Queued', 'done': False, 'accepted': False, 'proven_optimal': False, 'elapsed': 0.0,
+            'objective': None, 'best_bound': None, 'gap': None, 'plan': None, 'history': [], 'error': job.error,
+        }
+        progress.update(job_id=job_id, state=job.state, time_limit=job.time_limit, queue_position=position,
+                        done=progress['done'] or job.cancelled or job.error is not None, subscribers=job.subscribers)
+        return progress
+
+    def result(self, job_id):
+        """Returns (status, plan, objective) of a finished job, or None while it is still queued or running."""
+        progress = self.status(job_id)
+        if progress is None or not progress['done']:
+            return None
+        return progress['state'], progress['plan'], progress['objective']
+
+    def accept(self, job_id):
+        """Ends a running job now, keeping its best plan so far (for every subscriber)."""
+        job = self._jobs.get(job_id)
+        if job is not None and job.solve is not None:
+            job.solve.accept()
+
+    def cancel(self, job_id):
+        """Withdraws one submitter; the job is stopped when nobody else is waiting for it."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state not in ACTIVE_STATES:
+                return
+            job.subscribers -= 1
+            if job.subscribers > 0:
+                return
+            job.cancelled = True
+            job.finished = time.time()
+            if job_id in self._queue:
+                self._queue.remove(job_id)
+            self._counts['cancelled'] += 1
+            solve = job.solve
+        if solve is not None:
+            solve.cancel() # returns at once; the job's worker thread waits for the solve to stop
+
+    def metrics(self):
+        """Scheduler counters and recent wait/run times (seconds), e.g. for a monitoring panel."""
+        with self._lock:
+            waits, run_times = sorted(self._waits), sorted(self._run_times)
+            queued = [self._jobs[job_id] for job_id in self._queue]
+            return {
+                'queue_depth': len(queued), 'running': self._running, 'max_concurrent': self.max_concurrent,
+                'max_queued': self.max_queued, 'solver_threads': self.solver_threads,
+                'oldest_wait': time.time() - queued[0].submitted if queued else 0.0,
+                'mean_wait': sum(waits) / len(waits) if waits else 0.0,
+                'p95_wait': waits[round(0.95 * (len(waits) - 1))] if waits else 0.0,
+                'mean_run': sum(run_times) / len(run_times) if run_times else 0.0,
+                **{name: self._counts[name] for name in ('submitted', 'coalesced', 'rejected', 'cancelled', 'completed')},
+            }
+
+    @staticmethod
+    def _reusable(job):
+        """
+        Queued and running jobs can serve a new submitter, and so can finished ones another
+        solve could not improve on: a proven-optimal plan or a proof that none exists.
+        """
+        state = job.state
+        if state in ACTIVE_STATES or state == 'Infeasible':
+            return True
+        return state == 'Optimal' and job.solve.progress()['proven_optimal']
+
+    def _worker(self):
+        while True:
+            with self._wakeup:
+                while not self._queue:
+                    self._wakeup.wait()
+                job = self._jobs[self._queue.popleft()]
+                job.started = time.time()
+                self._waits.append(job.started - job.submitted)
+                self._running += 1
+            try:
+                self._run(job)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._counts['completed'] += 1
+                    self._run_times.append(time.time() - job.started)
+
+    def _run(self, job):
+        if job.cancelled:
+            return
+        with tracing.start_trace('Plan job', job_id=job.job_id, key=job.key[:16], solver=job.solver_name,
+                                 time_limit=job.time_limit) as trace:
+            trace.add_span('queue_wait', job.started - job.submitted)
+            try:
+                # WeeklyPlanModel only plans a single week over the whole catalog.
+                whole_week = job.model_args[7] == len(optimizer.DAYS_OF_WEEK) and not job.model_options.get('column_generation')
+                with tracing.span('get_model'):
+                    model = self._get_model(job) if whole_week else None
+                solve = anytime.AnytimeSolve(job.model_args, time_limit=job.time_limit, solver_name=job.solver_name,
+                                             solver_options=self._solver_options(job.solver_name),
+                                             warm_start_plan=job.warm_start_plan, model=model, **job.model_options)
+                with self._lock:
+                    if job.cancelled:
+                        return
+                    job.solve = solve.start()
+                with tracing.span('anytime_solve'):
+                    solve.wait()
+                _add_solve(trace, solve.progress())
+            except Exception as e:
+                job.error = str(e)
+            finally:
+                job.finished = job.finished or time.time()
+                trace.attrs['state'] = job.state
+
+    def _solver_options(self, solver_name):
+        return {} if solver_name in SINGLE_THREADED_SOLVERS else {'threads': self.solver_threads}
+
+    def _get_model(self, job):
+        """Returns a WeeklyPlanModel for the job's catalog and rules, built once and then only read."""
+        (nutrition_df, prices_series, intake_df, food_group_map, _, _,
+         daily_diversity_target, _, nutrient_mode, variety_level) = job.model_args
+        key = (
+            tuple(nutrition_df.index), tuple(nutrition_df.columns),
+            int(pd.util.hash_pandas_object(nutrition_df, index=True).sum()),
+            tuple(sorted(food_group_map.items())), daily_diversity_target, nutrient_mode, variety_level,
+            tuple(sorted(job.model_options.items())),
+        )
+        with self._lock:
+            model = self._models.get(key)
+        if model is None:
+            build_options = {k: v for k, v in job.model_options.items() if k in ('balance_formulation', 'symmetry_breaking')}
+            model = optimizer.WeeklyPlanModel(nutrition_df, prices_series, intake_df, food_group_map,
+                                              daily_diversity_target, nutrient_mode, variety_level, **build_options)
+            with self._lock:
+                self._models[key] = model
+                while len(self._models) > MAX_CACHED_MODELS:
+                    del self._models[next(iter(self._models))]
+        return model
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and job.finished < cutoff:
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) == job_id:
+                    del self._by_key[job.key]
+
+
+def _add_solve(trace, progress):
+    """Copies the solve process's spans and solver statistics into the job's trace."""
+    if progress['solve_trace']:
+        trace.spans.extend(progress['solve_trace']['spans'])
+        trace.solves.extend(progress['solve_trace']['solves'])
+    trace.attrs.update(objective=progress['objective'], proven_optimal=progress['proven_optimal'],
+                       accepted=progress['accepted'])
+
+
+_default_manager = None
+_default_manager_lock = threading.Lock()
+
+
+def get_default_manager():
+    """Returns the process-wide job manager shared by all Streamlit sessions."""
+    global _default_manager
+    with _default_manager_lock:
+        if _default_manager is None:
+            _default_manager = JobManager()
+        return _default_manager
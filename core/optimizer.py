@@ -1,7 +1,19 @@
 # core/optimizer.py
+import copy
 import itertools
+import logging
+import os
+import re
+import tempfile
+import time
+import numpy as np
 import pandas as pd
-from pulp import LpProblem, LpMinimize, LpMaximize, LpVariable, lpSum, LpStatus, getSolver
+from pulp import (LpProblem, LpMinimize, LpMaximize, LpVariable, lpSum, LpStatus, getSolver,
+                  LpAffineExpression, LpConstraint, LpConstraintEQ, LpConstraintGE, LpConstraintLE, LpSolverDefault,
+                  LpSolutionIntegerFeasible, LpSolutionOptimal, value)
+
+from core import corpus, tracing
+from core.plan import Plan
 
 # =============================================================================
 # --- GLOBAL CONSTRAINT PARAMETERS ---
@@ -31,11 +43,40 @@ MACRO_CALORIE_DIST = {
 }
 BIG_M_GRAMS = 4000
 BIG_M_CALORIES = 10000
+BALANCE_FORMULATIONS = ('bigm', 'compact')
+WARM_START_REPAIR_TIME_LIMIT = 10 # seconds
+SEARCH_PROGRESS_OPTIONS = ('logPath', 'progress') # solver options that report a running search (see core/anytime.py)
+ELASTIC_PENALTY = 1e10 # cost of relaxing a rule by 100% of its scale; far above any weekly food cost
+ELASTIC_TIME_LIMIT = 30 # seconds
+ELASTIC_RULES = ('Daily_Min_', 'Daily_Max_', 'Calorie_Dist_', 'Macro_Min_', 'Macro_Max_', 'Min_Variety_', 'LinkNumItemsToK_', 'Force_Include_')
+PREVIEW_TIME_LIMIT = 5 # seconds, a safety net; the relaxation normally solves in well under one
+
+# Dietary goals that rule out foods entirely (the oils left besides olive oil for heart health).
+GOAL_EXCLUSIONS = {
+    "Heart Health (Low Cholesterol)": ['canolla_oil', 'corn_oil', 'sunseed_oil'],
+}
+
+DAYS_OF_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+DAY_SUFFIX = re.compile(r"_(?:(?:" + "|".join(DAYS_OF_WEEK) + r")(?:_W\d+)?|W\d+)$") # the day or week part of a row name
+ROLLING_WINDOW_DAYS = 14 # days solved at once in rolling-horizon mode
+ROLLING_STEP_DAYS = 7 # days kept from each window; the rest only looks ahead
+STAPLE_FOODS = ['bread', 'whole_bread', 'potato', 'rice', 'spaghetti', 'canolla_oil', 'corn_oil', 'sunseed_oil', 'olive_oil', 'butter', 'low_fat_milk', 'high_fat_milk', 'yogurt', 'onion']
+DEFAULT_PRICE_PER_GRAM = 999
+PRESOLVE_TOLERANCE = 1e-9 # relative tolerance for per-calorie coefficient comparisons
+COLUMN_GENERATION_MIN_FOODS = 300 # smaller catalogs are modelled whole even in column-generation mode
+COLUMN_GENERATION_FOODS_PER_GROUP = 8 # initial candidates per food group (more if the variety rules need them)
+COLUMN_GENERATION_FOODS_PER_NUTRIENT = 2 # best value sources of each lower-bounded nutrient, also initial candidates
+COLUMN_GENERATION_FOODS_PER_ROUND = 20
+COLUMN_GENERATION_MAX_ROUNDS = 25
+COLUMN_GENERATION_PRICING_SHARE = 0.3 # share of the time limit the relaxation rounds may use
+COLUMN_GENERATION_REDUCED_COST_TOLERANCE = 1e-9 # relative to the highest price per gram
+
+logger = logging.getLogger(__name__)
 
 def _add_common_constraints(prob, food_vars, food_is_selected, nutrition_df, intake_df, food_group_map,
                            foods, foods_to_include, daily_diversity_target, days, nutrient_mode,
                            min_daily_group_variety, weekly_max_occurrences, balance_energy_rule_active,
-                           apply_repetition_cap_to_staples):
+                           apply_repetition_cap_to_staples, horizon=None, history=None):
     """Helper function to add constraints common to the model."""
     food_groups = sorted(list(set(food_group_map.values())))
     var_keys = [(f, d) for f in foods for d in days]
@@ -86,10 +127,6 @@ def _add_common_constraints(prob, food_vars, food_is_selected, nutrition_df, int
                             prob += food_calories - (1 - BALANCED_ENERGY_TOLERANCE) * avg_calories >= -BIG_M_CALORIES * (2 - food_is_selected[(f, d)] - num_items_in_group_is_k[k]), f"Balance_Lower_{f}_{k}_{d}"
 
 
-    for food in foods_to_include:
-        if food in foods:
-            prob += lpSum(food_is_selected[(food, d)] for d in days) >= 1, f"Force_Include_{food}_Weekly"
-
     nutrients_to_constrain = [n for n in intake_df.index if n in nutrition_df.columns]
     if nutrient_mode == 'daily':
         for nutrient in nutrients_to_constrain:
@@ -99,17 +136,13 @@ def _add_common_constraints(prob, food_vars, food_is_selected, nutrition_df, int
                 if not pd.isna(lower_bound): prob += total_nutrient_daily >= lower_bound, f"Daily_Min_{nutrient}_{d}"
                 if not pd.isna(upper_bound): prob += total_nutrient_daily <= upper_bound, f"Daily_Max_{nutrient}_{d}"
     
-    if len(days) > 1:
-        staple_foods = ['bread', 'whole_bread', 'potato', 'rice', 'spaghetti', 'canolla_oil', 'corn_oil', 'sunseed_oil', 'olive_oil', 'butter', 'low_fat_milk', 'high_fat_milk', 'yogurt', 'onion']
-        
-        foods_for_repetition_cap = []
-        if apply_repetition_cap_to_staples:
-            foods_for_repetition_cap = foods
-        else:
-            foods_for_repetition_cap = [f for f in foods if f not in staple_foods]
-        
-        for food in foods_for_repetition_cap:
-            prob += lpSum(food_is_selected[(food, d)] for d in days) <= weekly_max_occurrences, f"Weekly_Max_Occurrences_{food}"
+    foods_for_repetition_cap = []
+    if apply_repetition_cap_to_staples:
+        foods_for_repetition_cap = foods
+    else:
+        foods_for_repetition_cap = [f for f in foods if f not in STAPLE_FOODS]
+    _add_horizon_rows(prob, food_is_selected, [f for f in foods_to_include if f in foods], foods_for_repetition_cap,
+                      weekly_max_occurrences, days, horizon, history)
 
     weekly_food_is_used = LpVariable.dicts("WeeklyFoodUsed", foods, cat='Binary')
     for f in foods:
@@ -122,11 +155,389 @@ def _add_common_constraints(prob, food_vars, food_is_selected, nutrition_df, int
             prob += lpSum(weekly_food_is_used[f] for f in foods_in_group) <= 1, f"Exclusive_Group_{'_'.join(foods_in_group)}"
 
 
-def create_and_solve_model(nutrition_df, prices_series, intake_df, food_group_map,
-                           foods_to_exclude, foods_to_include, daily_diversity_target,
-                           days_of_week, nutrient_mode, variety_level, *, solver_name=None):
-    """Builds and solves the weekly MILP model with cost minimization, adjusted by a variety level."""
-    
+# =============================================================================
+# --- MATRIX-FORM MODEL BUILDER ---
+# =============================================================================
+
+class ModelMatrices:
+    """Dense NumPy view of the model inputs, computed once per build."""
+
+    def __init__(self, foods, calories, prices, macro_coeffs, nutrients, nutrient_matrix,
+                 lower_bounds, upper_bounds, group_index):
+        self.foods = foods                      # row order of every array below
+        self.calories = calories                # (n_foods,) kcal per gram
+        self.prices = prices                    # (n_foods,) price per gram
+        self.macro_coeffs = macro_coeffs        # macro -> (n_foods,) kcal per gram from that macro
+        self.nutrients = nutrients              # constrained nutrients, column order of nutrient_matrix
+        self.nutrient_matrix = nutrient_matrix  # (n_foods, n_nutrients) amount per gram
+        self.lower_bounds = lower_bounds        # (n_nutrients,) NaN where unbounded
+        self.upper_bounds = upper_bounds        # (n_nutrients,) NaN where unbounded
+        self.group_index = group_index          # food group -> array of row indices
+
+
+def build_model_matrices(nutrition_df, prices_series, intake_df, food_group_map, foods):
+    """Converts nutrition, price and intake tables into the dense arrays used by the bulk builder."""
+    nutrition = nutrition_df.loc[foods]
+    calories = nutrition['calorie'].to_numpy(dtype=float)
+    prices = prices_series.reindex(foods).fillna(DEFAULT_PRICE_PER_GRAM).to_numpy(dtype=float)
+
+    macro_coeffs = {
+        macro: values['kcal_per_g'] * nutrition[macro].to_numpy(dtype=float)
+        for macro, values in MACRO_CALORIE_DIST.items() if macro in nutrition.columns
+    }
+
+    nutrients = [n for n in intake_df.index if n in nutrition.columns]
+    nutrient_matrix = nutrition[nutrients].to_numpy(dtype=float)
+    lower_bounds = pd.to_numeric(intake_df.loc[nutrients, 'lower_bound'], errors='coerce').to_numpy(dtype=float)
+    upper_bounds = pd.to_numeric(intake_df.loc[nutrients, 'upper_bound'], errors='coerce').to_numpy(dtype=float)
+
+    groups = np.array([food_group_map.get(f) for f in foods], dtype=object)
+    group_index = {group: np.flatnonzero(groups == group) for group in sorted(set(food_group_map.values()))}
+
+    return ModelMatrices(foods, calories, prices, macro_coeffs, nutrients, nutrient_matrix,
+                         lower_bounds, upper_bounds, group_index)
+
+
+def _affine(variables, coeffs, constant=0.0):
+    """Builds a linear expression directly from parallel variable/coefficient sequences, skipping zeros."""
+    return LpAffineExpression([(v, c) for v, c in zip(variables, np.asarray(coeffs, dtype=float).tolist()) if c != 0], constant=constant)
+
+
+def _add_compact_balance_rows(add, x_group, s_group, group_calories, num_items_in_group_is_k, group_foods, group, d):
+    """
+    Compact form of the balanced-energy rule for one group and day.
+
+    A continuous average A is tied to the group calories through the disaggregated
+    products w_k = A * [k items chosen] (sum_k w_k = A, w_k <= M * z_k and
+    sum_k k * w_k = group calories), which is exact because exactly one z_k is 1.
+    Each food then needs only two rows instead of two per k, and only the lower
+    side needs a big-M because an unselected food has zero calories.
+    """
+    ks = list(num_items_in_group_is_k)
+    average = LpVariable(f"GroupAvgCalories_{group}_{d}", lowBound=0, upBound=BIG_M_CALORIES)
+    avg_if_k = LpVariable.dicts(f"GroupAvgIfK_{group}_{d}", ks, lowBound=0)
+
+    add(LpAffineExpression([(avg_if_k[k], 1) for k in ks] + [(average, -1)]), LpConstraintEQ, f"Balance_AvgSplit_{group}_{d}")
+    for k in ks:
+        add(LpAffineExpression([(avg_if_k[k], 1), (num_items_in_group_is_k[k], -BIG_M_CALORIES)]), LpConstraintLE, f"Balance_AvgIfK_{group}_{k}_{d}")
+    add(_affine(x_group + [avg_if_k[k] for k in ks], np.concatenate([group_calories, -np.array(ks, dtype=float)])),
+        LpConstraintEQ, f"Balance_AvgDef_{group}_{d}")
+
+    lower_big_m = (1 - BALANCED_ENERGY_TOLERANCE) * BIG_M_CALORIES
+    for f, x_f, s_f, cal in zip(group_foods, x_group, s_group, group_calories.tolist()):
+        add(LpAffineExpression([(x_f, cal), (average, -(1 + BALANCED_ENERGY_TOLERANCE))]), LpConstraintLE, f"Balance_Upper_{f}_{d}")
+        add(LpAffineExpression([(x_f, cal), (average, -(1 - BALANCED_ENERGY_TOLERANCE)), (s_f, -lower_big_m)], constant=lower_big_m),
+            LpConstraintGE, f"Balance_Lower_{f}_{d}")
+
+
+def _add_common_constraints_matrix(prob, food_vars, food_is_selected, matrices,
+                                   foods_to_include, daily_diversity_target, days, nutrient_mode,
+                                   min_daily_group_variety, weekly_max_occurrences, balance_energy_rule_active,
+                                   apply_repetition_cap_to_staples, balance_formulation='bigm', horizon=None, history=None):
+    """
+    Same constraints as _add_common_constraints, emitted from precomputed coefficient arrays.
+    With balance_formulation='compact' the balanced-energy rule uses _add_compact_balance_rows.
+    """
+    foods = matrices.foods
+    n_foods = len(foods)
+    calories = matrices.calories
+    ones = np.ones(n_foods)
+
+    def add(expr, sense, name, rhs=0.0):
+        prob.addConstraint(LpConstraint(expr, sense, name, rhs))
+
+    # Per-row coefficient vectors do not depend on the day, so compute them once.
+    group_dist_coeffs = {}
+    for group, percentage in FOOD_GROUP_CALORIE_DIST.items():
+        idx = matrices.group_index.get(group, [])
+        if len(idx):
+            in_group = np.zeros(n_foods)
+            in_group[idx] = 1.0
+            group_dist_coeffs[group] = calories * in_group - percentage * calories
+    macro_rows = {
+        macro: (coeffs - MACRO_CALORIE_DIST[macro]['min'] * calories,
+                coeffs - MACRO_CALORIE_DIST[macro]['max'] * calories)
+        for macro, coeffs in matrices.macro_coeffs.items()
+    }
+    balance_groups = []
+    if balance_energy_rule_active:
+        balance_groups = [(group, min_items, matrices.group_index[group])
+                          for group, min_items in min_daily_group_variety.items()
+                          if min_items > 1 and len(matrices.group_index.get(group, []))]
+
+    day_x = {d: [food_vars[(f, d)] for f in foods] for d in days}
+    day_s = {d: [food_is_selected[(f, d)] for f in foods] for d in days}
+
+    for d in days:
+        x, s = day_x[d], day_s[d]
+
+        add(_affine(s, ones), LpConstraintGE, f"DailyDiversity_{d}", daily_diversity_target)
+
+        for group, coeffs in group_dist_coeffs.items():
+            add(_affine(x, coeffs), LpConstraintEQ, f"Calorie_Dist_{group}_{d}")
+
+        for macro, (min_coeffs, max_coeffs) in macro_rows.items():
+            add(_affine(x, min_coeffs), LpConstraintGE, f"Macro_Min_{macro}_{d}")
+            add(_affine(x, max_coeffs), LpConstraintLE, f"Macro_Max_{macro}_{d}")
+
+        for f, x_f, s_f in zip(foods, x, s):
+            add(LpAffineExpression([(x_f, 1), (s_f, -BIG_M_GRAMS)]), LpConstraintLE, f"Link_{f}_{d}")
+
+        for group, min_items in min_daily_group_variety.items():
+            idx = matrices.group_index.get(group, [])
+            if len(idx):
+                add(_affine([s[i] for i in idx], np.ones(len(idx))), LpConstraintGE, f"Min_Variety_{group}_{d}", min_items)
+
+        for group, min_items, idx in balance_groups:
+            ks = range(min_items, MAX_ITEMS_PER_GROUP_FOR_BALANCE + 1)
+            x_group = [x[i] for i in idx]
+            s_group = [s[i] for i in idx]
+            group_calories = calories[idx]
+
+            num_items_in_group_is_k = LpVariable.dicts(f"NumItemsInGroupIsK_{group}_{d}", ks, cat='Binary')
+            z = [num_items_in_group_is_k[k] for k in ks]
+            add(_affine(z, np.ones(len(z))), LpConstraintEQ, f"ExactlyOneKIsChosen_{group}_{d}", 1)
+            add(_affine(z + s_group, np.concatenate([np.array(ks, dtype=float), -np.ones(len(idx))])),
+                LpConstraintEQ, f"LinkNumItemsToK_{group}_{d}")
+
+            if balance_formulation == 'compact':
+                _add_compact_balance_rows(add, x_group, s_group, group_calories,
+                                          num_items_in_group_is_k, [foods[i] for i in idx], group, d)
+                continue
+
+            upper_base = {k: -(1 + BALANCED_ENERGY_TOLERANCE) / k * group_calories for k in ks}
+            lower_base = {k: -(1 - BALANCED_ENERGY_TOLERANCE) / k * group_calories for k in ks}
+            for j, i in enumerate(idx):
+                f = foods[i]
+                for k in ks:
+                    upper = upper_base[k].copy()
+                    upper[j] += calories[i]
+                    lower = lower_base[k].copy()
+                    lower[j] += calories[i]
+                    upper_expr = _affine(x_group, upper, constant=-2 * BIG_M_CALORIES)
+                    upper_expr[s[i]] = BIG_M_CALORIES
+                    upper_expr[num_items_in_group_is_k[k]] = BIG_M_CALORIES
+                    add(upper_expr, LpConstraintLE, f"Balance_Upper_{f}_{k}_{d}")
+                    lower_expr = _affine(x_group, lower, constant=2 * BIG_M_CALORIES)
+                    lower_expr[s[i]] = -BIG_M_CALORIES
+                    lower_expr[num_items_in_group_is_k[k]] = -BIG_M_CALORIES
+                    add(lower_expr, LpConstraintGE, f"Balance_Lower_{f}_{k}_{d}")
+
+    food_position = {f: i for i, f in enumerate(foods)}
+    if nutrient_mode == 'daily':
+        for j, nutrient in enumerate(matrices.nutrients):
+            coeffs = matrices.nutrient_matrix[:, j]
+            lower_bound, upper_bound = matrices.lower_bounds[j], matrices.upper_bounds[j]
+            for d in days:
+                if not np.isnan(lower_bound): add(_affine(day_x[d], coeffs), LpConstraintGE, f"Daily_Min_{nutrient}_{d}", float(lower_bound))
+                if not np.isnan(upper_bound): add(_affine(day_x[d], coeffs), LpConstraintLE, f"Daily_Max_{nutrient}_{d}", float(upper_bound))
+
+    foods_for_repetition_cap = foods if apply_repetition_cap_to_staples else [f for f in foods if f not in STAPLE_FOODS]
+    _add_horizon_rows(prob, food_is_selected, [f for f in foods_to_include if f in food_position], foods_for_repetition_cap,
+                      weekly_max_occurrences, days, horizon, history)
+
+    weekly_food_is_used = LpVariable.dicts("WeeklyFoodUsed", foods, cat='Binary')
+    for f in foods:
+        for d in days:
+            add(LpAffineExpression([(weekly_food_is_used[f], 1), (food_is_selected[(f, d)], -1)]), LpConstraintGE, f"Link_Weekly_Daily_{f}_{d}")
+
+    for group in MUTUALLY_EXCLUSIVE_GROUPS:
+        foods_in_group = [f for f in group if f in food_position]
+        if foods_in_group:
+            add(_affine([weekly_food_is_used[f] for f in foods_in_group], np.ones(len(foods_in_group))), LpConstraintLE, f"Exclusive_Group_{'_'.join(foods_in_group)}", 1)
+
+
+def horizon_days(days_of_week):
+    """Day labels for a plan of days_of_week days: weekday names, with a _W<week> suffix beyond one week."""
+    n_days = int(days_of_week)
+    if n_days <= len(DAYS_OF_WEEK):
+        return DAYS_OF_WEEK[:n_days]
+    return [f"{DAYS_OF_WEEK[i % len(DAYS_OF_WEEK)]}_W{i // len(DAYS_OF_WEEK) + 1}" for i in range(n_days)]
+
+
+def _add_horizon_rows(prob, food_is_selected, foods_to_include, capped_foods, weekly_max_occurrences,
+                      days, horizon=None, history=None):
+    """
+    Adds the rules that span days: forced inclusions and repetition caps.
+
+    For plans of up to a week these are the weekly rows: each forced food at least once
+    (Force_Include_<food>_Weekly) and each capped food on at most weekly_max_occurrences
+    days (Weekly_Max_Occurrences_<food>). Longer horizons force foods once per calendar
+    week (Force_Include_<food>_W<week>) and cap every 7 consecutive days
+    (Weekly_Max_Occurrences_<food>_<first day>), so repeats cannot bunch up across a week boundary.
+
+    horizon is the full list of day labels when the model only covers a window of it
+    (days); history holds the {day: {food: grams}} already planned for horizon days
+    outside the window, whose selections count towards the rows they share.
+    """
+    horizon = horizon or days
+    history = history or {}
+    in_model = set(days)
+    week = len(DAYS_OF_WEEK)
+    if len(horizon) <= week:
+        include_blocks = [(horizon, "Weekly")]
+        cap_windows = [(horizon, "")] if len(horizon) > 1 else []
+    else:
+        include_blocks = [(horizon[i:i + week], f"W{i // week + 1}") for i in range(0, len(horizon), week)]
+        cap_windows = [(horizon[i:i + week], f"_{horizon[i]}") for i in range(len(horizon) - week + 1)]
+
+    def add(food, block, sense, name, rhs):
+        selected = [food_is_selected[(food, d)] for d in block if d in in_model]
+        if selected:
+            prob.addConstraint(LpConstraint(_affine(selected, np.ones(len(selected))), sense, name, rhs))
+
+    for food in foods_to_include:
+        for block, suffix in include_blocks:
+            # Skip weeks already covered by history, and weeks a later window will finish.
+            if any(history.get(d, {}).get(food, 0) > 0 for d in block) or any(d not in in_model and d not in history for d in block):
+                continue
+            add(food, block, LpConstraintGE, f"Force_Include_{food}_{suffix}", 1)
+    for food in capped_foods:
+        for block, suffix in cap_windows:
+            used = sum(1 for d in block if history.get(d, {}).get(food, 0) > 0)
+            add(food, block, LpConstraintLE, f"Weekly_Max_Occurrences_{food}{suffix}", weekly_max_occurrences - used)
+
+
+def _add_day_order_rows(prob, food_vars, foods, prices_series, days):
+    """
+    Breaks the day symmetry: every day is the same sub-model and all weekly rules
+    treat the days alike, so any week can be permuted into non-decreasing daily cost.
+    """
+    prices = prices_series.reindex(foods).fillna(DEFAULT_PRICE_PER_GRAM).to_numpy(dtype=float)
+    for d_prev, d_next in zip(days, days[1:]):
+        day_cost_diff = _affine([food_vars[(f, d_prev)] for f in foods] + [food_vars[(f, d_next)] for f in foods],
+                                np.concatenate([prices, -prices]))
+        prob.addConstraint(LpConstraint(day_cost_diff, LpConstraintLE, f"Symmetry_DayCost_{d_prev}_{d_next}", 0))
+
+
+@tracing.traced('extract_plan')
+def extract_plan(food_vars, days, min_grams=0.01, values=None):
+    """
+    Reads the solved grams into a plan.Plan (which reads like {day: {food: grams}}),
+    over the foods eaten on at least one day. values ({variable name: value}, e.g. an
+    incumbent reported during the search) is read instead of the variables' values.
+
+    Days are interchangeable in the model, so a plan solved with symmetry breaking
+    (days sorted by cost) is just as valid in calendar order; no remapping is needed.
+    """
+    foods = pd.Index(dict.fromkeys(f for f, _ in food_vars))
+    day_position = {d: j for j, d in enumerate(days)}
+    grams = np.zeros((len(foods), len(day_position)))
+    rows = foods.get_indexer([f for f, _ in food_vars])
+    columns = np.fromiter((day_position[d] for _, d in food_vars), dtype=np.int64, count=len(food_vars))
+    amounts = ((var.varValue for var in food_vars.values()) if values is None
+               else (values.get(var.name) for var in food_vars.values()))
+    grams[rows, columns] = np.fromiter((amount if amount is not None else 0.0 for amount in amounts),
+                                       dtype=float, count=len(food_vars))
+    grams[grams <= min_grams] = 0.0
+    eaten = grams.any(axis=1)
+    return Plan(grams[eaten], foods[eaten], days)
+
+
+# =============================================================================
+# --- CATALOG PRESOLVE ---
+# =============================================================================
+
+
+def _per_calorie_rows(matrices, nutrient_mode):
+    """
+    Stacks every per-food coefficient the weekly model uses, divided by the food's calories,
+    as (rows, sense) where sense is -1 (lower is better), 0 (must match) or +1 (higher is better).
+    """
+    rows, senses = [matrices.prices], [-1]
+    for coeffs in matrices.macro_coeffs.values():
+        rows.append(coeffs)
+        senses.append(0) # bounded from both sides relative to total calories
+    if nutrient_mode == 'daily':
+        for j in range(len(matrices.nutrients)):
+            has_lower, has_upper = not np.isnan(matrices.lower_bounds[j]), not np.isnan(matrices.upper_bounds[j])
+            if has_lower or has_upper:
+                rows.append(matrices.nutrient_matrix[:, j])
+                senses.append(0 if has_lower and has_upper else (1 if has_lower else -1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_calorie = np.vstack(rows) / matrices.calories
+    return per_calorie, np.array(senses)
+
+
+def _dominates(per_calorie, senses, i, j):
+    """True if, calorie for calorie, food i is at least as good as food j in every model row."""
+    a, b = per_calorie[:, i], per_calorie[:, j]
+    tol = PRESOLVE_TOLERANCE * np.maximum(1.0, np.maximum(np.abs(a), np.abs(b)))
+    diff = a - b
+    return bool(np.all(np.where(senses == 0, np.abs(diff) <= tol, senses * diff >= -tol)))
+
+
+def presolve_catalog(nutrition_df, prices_series, intake_df, food_group_map, foods,
+                     foods_to_include, nutrient_mode, variety_level, days=DAYS_OF_WEEK):
+    """
+    Drops foods that can be removed without changing the optimal weekly cost.
+
+    Two exact reductions are applied:
+    - 'excluded by <food>': members of a MUTUALLY_EXCLUSIVE_GROUPS set whose
+      partner is forced in through foods_to_include can never be used.
+    - 'dominated by <food>': within a mutually exclusive set (so at most one of the
+      foods is used all week), a food from the same food group with at least as many
+      calories per gram, the same macro split and, per calorie, no higher price and
+      no worse constrained nutrients can take over the other food's days gram for
+      calorie without breaking any variety, balance or repetition rule.
+    Dominance is not applied across foods that may be used side by side, since the
+    daily variety rules count distinct foods.
+
+    Returns (kept_foods, report) where report has 'removed' ({food: reason}) and
+    'variables_removed' (grams and selection variables per day plus the weekly flag).
+    """
+    foods = list(foods)
+    included = [f for f in foods_to_include if f in foods]
+    apply_repetition_cap_to_staples = _get_variety_settings(variety_level)[3]
+    removed = {}
+
+    for group in MUTUALLY_EXCLUSIVE_GROUPS:
+        forced = [f for f in group if f in included]
+        if len(forced) == 1: # two forced members are infeasible; leave that for the solver to report
+            for f in group:
+                if f in foods and f != forced[0]:
+                    removed[f] = f"excluded by {forced[0]}"
+
+    matrices = build_model_matrices(nutrition_df, prices_series, intake_df, food_group_map, foods)
+    per_calorie, senses = _per_calorie_rows(matrices, nutrient_mode)
+    position = {f: k for k, f in enumerate(foods)}
+
+    def is_capped(f):
+        return apply_repetition_cap_to_staples or f not in STAPLE_FOODS
+
+    for group in MUTUALLY_EXCLUSIVE_GROUPS:
+        members = [f for f in group if f in position and f not in removed and matrices.calories[position[f]] > 0]
+        for j_food in members:
+            if j_food in included or j_food in removed:
+                continue
+            j = position[j_food]
+            for i_food in members:
+                i = position[i_food]
+                if (i_food == j_food or i_food in removed
+                        or food_group_map.get(i_food) != food_group_map.get(j_food)
+                        or matrices.calories[i] < matrices.calories[j]
+                        or (is_capped(i_food) and not is_capped(j_food))):
+                    continue
+                if _dominates(per_calorie, senses, i, j):
+                    removed[j_food] = f"dominated by {i_food}"
+                    break
+
+    kept_foods = [f for f in foods if f not in removed]
+    report = {'removed': removed, 'variables_removed': len(removed) * (2 * len(days) + 1)}
+    return kept_foods, report
+
+
+def apply_goal_exclusions(foods_to_exclude, goal):
+    """Returns a copy of the exclusion list extended with the foods the dietary goal rules out."""
+    effective_exclude_list = list(foods_to_exclude)
+    for food in GOAL_EXCLUSIONS.get(goal, []):
+        if food not in effective_exclude_list:
+            effective_exclude_list.append(food)
+    return effective_exclude_list
+
+
+def _get_variety_settings(variety_level):
+    """Returns the daily variety and repetition rules that belong to a variety level."""
     if variety_level == 1:
         min_daily_group_variety = {'fruits': 1, 'vegetables': 1, 'animal_source_foods': 1, 'starchy_staples': 1, 'legumes_nuts_and_seeds': 1}
         weekly_max_occurrences = 4
@@ -153,19 +564,1012 @@ def create_and_solve_model(nutrition_df, prices_series, intake_df, food_group_ma
         balance_energy_rule_active = True
         apply_repetition_cap_to_staples = False 
 
-    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    foods = [f for f in nutrition_df.index.tolist() if f not in foods_to_exclude]
+    return min_daily_group_variety, weekly_max_occurrences, balance_energy_rule_active, apply_repetition_cap_to_staples
+
+
+def _build_model(nutrition_df, prices_series, intake_df, food_group_map,
+                 foods_to_exclude, foods_to_include, daily_diversity_target,
+                 days_of_week, nutrient_mode, variety_level, *, builder='matrix',
+                 balance_formulation='bigm', symmetry_breaking=False, presolve=True,
+                 window=None, history=None):
+    """
+    Builds (but does not solve) the MILP model for a plan of days_of_week days (see horizon_days).
+
+    The 'matrix' builder converts the input tables to NumPy arrays once and emits
+    every constraint in bulk; the 'loop' builder is the original per-term builder
+    and is kept as the reference implementation for benchmarks.
+
+    balance_formulation selects how the balanced-energy rule (variety levels 2-5)
+    is written: 'bigm' (two big-M rows per food and item count) or 'compact'
+    (an explicit group average with two rows per food, matrix builder only).
+
+    With symmetry_breaking the seven interchangeable days are ordered by cost, so
+    the solver does not explore permutations of the same week (see extract_plan).
+    Days are only interchangeable within a single week, so longer horizons and windows ignore it.
+
+    With presolve, foods that presolve_catalog proves unnecessary are left out of the model.
+
+    window (start, end) limits the model to those horizon days, with history the plan
+    already fixed for earlier days (see solve_rolling_horizon): repetition caps and forced
+    inclusions count its selections, and a food it used rules out the rest of its
+    mutually exclusive set.
+    """
+    if balance_formulation not in BALANCE_FORMULATIONS:
+        raise ValueError(f"Unknown balance formulation: {balance_formulation}")
+    if builder == 'loop' and balance_formulation != 'bigm':
+        raise ValueError("The loop builder only supports the 'bigm' balance formulation.")
+
+    (min_daily_group_variety, weekly_max_occurrences,
+     balance_energy_rule_active, apply_repetition_cap_to_staples) = _get_variety_settings(variety_level)
+
+    horizon = horizon_days(days_of_week)
+    days = horizon[slice(*window)] if window else list(horizon)
+    history = {d: foods_ for d, foods_ in (history or {}).items() if d in horizon and d not in days}
+    used_before = {f for foods_ in history.values() for f, grams in foods_.items() if grams > 0}
+    exclusive_partners = {f for group in MUTUALLY_EXCLUSIVE_GROUPS if used_before & set(group) for f in group} - used_before
+    foods = [f for f in nutrition_df.index.tolist() if f not in foods_to_exclude and f not in exclusive_partners]
+    if presolve:
+        foods, report = presolve_catalog(nutrition_df, prices_series, intake_df, food_group_map, foods,
+                                         foods_to_include, nutrient_mode, variety_level, days)
+        if report['removed']:
+            logger.info("Presolve removed %d foods (%d variables): %s", len(report['removed']),
+                        report['variables_removed'], ", ".join(f"{f} ({why})" for f, why in report['removed'].items()))
     prob = LpProblem("Unified_Diet_Optimization", LpMinimize)
     var_keys = [(f, d) for f in foods for d in days]
     food_vars = LpVariable.dicts("FoodGrams", var_keys, lowBound=0, cat='Continuous')
     food_is_selected = LpVariable.dicts("FoodSelected", var_keys, cat='Binary')
 
-    prob += lpSum([prices_series.get(f, 999) * food_vars[(f, d)] for f, d in var_keys]), "Total_Weekly_Cost"
+    if builder == 'matrix':
+        matrices = build_model_matrices(nutrition_df, prices_series, intake_df, food_group_map, foods)
+        prob += _affine([food_vars[key] for key in var_keys], np.repeat(matrices.prices, len(days))), "Total_Weekly_Cost"
+        _add_common_constraints_matrix(prob, food_vars, food_is_selected, matrices,
+                                       foods_to_include, daily_diversity_target, days, nutrient_mode,
+                                       min_daily_group_variety, weekly_max_occurrences, balance_energy_rule_active,
+                                       apply_repetition_cap_to_staples, balance_formulation, horizon, history)
+    elif builder == 'loop':
+        prob += lpSum([prices_series.get(f, DEFAULT_PRICE_PER_GRAM) * food_vars[(f, d)] for f, d in var_keys]), "Total_Weekly_Cost"
+        _add_common_constraints(prob, food_vars, food_is_selected, nutrition_df, intake_df, food_group_map,
+                               foods, foods_to_include, daily_diversity_target, days, nutrient_mode,
+                               min_daily_group_variety, weekly_max_occurrences, balance_energy_rule_active,
+                               apply_repetition_cap_to_staples, horizon, history)
+    else:
+        raise ValueError(f"Unknown model builder: {builder}")
 
-    _add_common_constraints(prob, food_vars, food_is_selected, nutrition_df, intake_df, food_group_map,
-                           foods, foods_to_include, daily_diversity_target, days, nutrient_mode,
-                           min_daily_group_variety, weekly_max_occurrences, balance_energy_rule_active,
-                           apply_repetition_cap_to_staples)
-    
+    if symmetry_breaking and len(horizon) <= len(DAYS_OF_WEEK) and not history:
+        _add_day_order_rows(prob, food_vars, foods, prices_series, days)
+
+    return prob, food_vars, food_is_selected, days
+
+
+def build_model(nutrition_df, prices_series, intake_df, food_group_map,
+                foods_to_exclude, foods_to_include, daily_diversity_target,
+                days_of_week, nutrient_mode, variety_level, *, builder='matrix',
+                balance_formulation='bigm', symmetry_breaking=False, presolve=True):
+    """Builds (but does not solve) the weekly MILP model; see _build_model for the options."""
+    prob, food_vars, _, days = _build_model(
+        nutrition_df, prices_series, intake_df, food_group_map,
+        foods_to_exclude, foods_to_include, daily_diversity_target,
+        days_of_week, nutrient_mode, variety_level, builder=builder,
+        balance_formulation=balance_formulation, symmetry_breaking=symmetry_breaking, presolve=presolve
+    )
+    return prob, food_vars, days
+
+
+def build_day_model(nutrition_df, prices_series, intake_df, food_group_map, foods,
+                    daily_diversity_target, nutrient_mode, variety_level, *,
+                    balance_formulation='bigm', day='Day'):
+    """
+    Builds the single-day sub-model: every daily rule of the weekly model and none of
+    the weekly ones (repetition caps, forced inclusions). Used by decomposition solvers,
+    which replace the objective between solves.
+
+    Returns (prob, food_vars, food_is_selected, matrices), keyed by (food, day).
+    """
+    (min_daily_group_variety, weekly_max_occurrences,
+     balance_energy_rule_active, apply_repetition_cap_to_staples) = _get_variety_settings(variety_level)
+
+    prob = LpProblem("Day_Diet_Optimization", LpMinimize)
+    var_keys = [(f, day) for f in foods]
+    food_vars = LpVariable.dicts("FoodGrams", var_keys, lowBound=0, cat='Continuous')
+    food_is_selected = LpVariable.dicts("FoodSelected", var_keys, cat='Binary')
+
+    matrices = build_model_matrices(nutrition_df, prices_series, intake_df, food_group_map, foods)
+    prob += _affine([food_vars[key] for key in var_keys], matrices.prices), "Total_Day_Cost"
+    _add_common_constraints_matrix(prob, food_vars, food_is_selected, matrices,
+                                   [], daily_diversity_target, [day], nutrient_mode,
+                                   min_daily_group_variety, weekly_max_occurrences, balance_energy_rule_active,
+                                   apply_repetition_cap_to_staples, balance_formulation)
+    return prob, food_vars, food_is_selected, matrices
+
+
+def _add_elastic_slack(prob, intake_df):
+    """
+    Makes the ELASTIC_RULES rows of a built model soft: each gets a penalized slack
+    (two for equalities) named Elastic_<row>_up / Elastic_<row>_down.
+
+    Slack is priced per unit of the row's scale, so relaxing any rule by the same share
+    costs the same: nutrient bounds are scaled by their bound, calorie and macro shares
+    by the daily calorie target, and item counts by one item.
+    Returns {slack variable name: (constraint name, scale)}.
+    """
+    calorie_scale = 2000.0
+    if 'calorie' in intake_df.index and not pd.isna(intake_df.loc['calorie', 'lower_bound']):
+        calorie_scale = max(float(intake_df.loc['calorie', 'lower_bound']), 1.0)
+
+    slacks, penalty_terms = {}, []
+    for name, constraint in list(prob.constraints.items()):
+        if not name.startswith(ELASTIC_RULES):
+            continue
+        if name.startswith(('Daily_Min_', 'Daily_Max_')):
+            scale = max(abs(constraint.constant), 1.0)
+        elif name.startswith(('Calorie_Dist_', 'Macro_')):
+            scale = calorie_scale
+        else:
+            scale = 1.0
+        directions = {LpConstraintGE: ('up',), LpConstraintLE: ('down',), LpConstraintEQ: ('up', 'down')}[constraint.sense]
+        for direction in directions:
+            slack = LpVariable(f"Elastic_{name}_{direction}", lowBound=0)
+            constraint.expr[slack] = 1 if direction == 'up' else -1
+            slacks[slack.name] = (name, scale)
+            penalty_terms.append((slack, ELASTIC_PENALTY / scale))
+    prob.setObjective(prob.objective + LpAffineExpression(penalty_terms))
+    return slacks
+
+
+def read_relaxations(prob, min_share=1e-6):
+    """
+    Lists the rules an elastic solve had to relax, largest share first.
+
+    Each entry has 'constraint' (the row name), 'rule' (the row name without its day),
+    'direction' ('up' raises the left-hand side's allowance, 'down' lowers it),
+    'amount' (in the row's own units, e.g. mg or kcal or items) and 'share' (amount / scale).
+    """
+    scales = getattr(prob, 'elastic_slacks', {})
+    relaxations = []
+    for var in prob.variables():
+        if var.name not in scales or not var.varValue:
+            continue
+        name, scale = scales[var.name]
+        if var.varValue / scale < min_share:
+            continue
+        rule = DAY_SUFFIX.sub("", name)
+        relaxations.append({'constraint': name, 'rule': rule, 'direction': var.name.rsplit('_', 1)[1],
+                            'amount': var.varValue, 'share': var.varValue / scale})
+    return sorted(relaxations, key=lambda r: -r['share'])
+
+
+def _solver_variant(solver, time_limit=None, **options):
+    """Returns a copy of `solver` (or the PuLP default) with a new time limit and extra options."""
+    base = solver if solver is not None else LpSolverDefault
+    variant = copy.copy(base)
+    variant.optionsDict = {**base.optionsDict, **options}
+    if time_limit is not None:
+        variant.timeLimit = time_limit
+    return variant
+
+
+def _within_deadline(solver, deadline):
+    """
+    Returns `solver` with its time limit cut to the whole seconds (at least one) left
+    before deadline, a time.perf_counter() value; without a deadline, `solver` itself.
+    """
+    if deadline is None:
+        return solver
+    left = max(1, int(deadline - time.perf_counter()))
+    limit = (solver or LpSolverDefault).timeLimit
+    return _solver_variant(solver, time_limit=min(limit, left) if limit else left)
+
+
+def _reporting_plans(solver, food_vars, days):
+    """
+    Returns `solver` with its 'progress' option (see highs_backend.HighsInMemory) passing
+    each incumbent on as a Plan instead of variable values: progress(objective, best_bound, plan).
+    """
+    progress = solver.optionsDict.get('progress') if solver is not None else None
+    if progress is None:
+        return solver
+
+    def report(objective, best_bound, values):
+        progress(objective, best_bound, extract_plan(food_vars, days, values=values) if values is not None else None)
+    return _solver_variant(solver, progress=report)
+
+
+def _order_days_by_cost(prob, food_vars, days, plan):
+    """
+    The plan's day plans moved onto the model's days in non-decreasing cost at the
+    model's current prices (its objective), the order _add_day_order_rows requires;
+    after a price edit the old order usually breaks it.
+    """
+    prices = {f: prob.objective.get(var, 0.0) for (f, d), var in food_vars.items() if d == days[0]}
+    day_plans = sorted((plan.get(d, {}) for d in days),
+                       key=lambda day_plan: sum(prices.get(f, 0.0) * grams for f, grams in day_plan.items()))
+    return dict(zip(days, day_plans))
+
+
+def _repair_warm_start(prob, food_vars, food_is_selected, days, previous_plan, foods_to_include, solver, deadline=None):
+    """
+    Turns a previous {day: {food: grams}} plan into a feasible start for the edited model.
+
+    The old selection pattern is kept (dropping foods that no longer exist and placing
+    newly forced foods on the day with the fewest items), the binaries are fixed to it
+    and the remaining small problem re-optimizes the grams. On success every variable
+    keeps its repaired value as the initial solution; otherwise all values are cleared.
+    With a deadline, each repair solve gets at most a quarter of the time left.
+    """
+    if len(days) > 1 and f"Symmetry_DayCost_{days[0]}_{days[1]}" in prob.constraints:
+        previous_plan = _order_days_by_cost(prob, food_vars, days, previous_plan)
+    original_bounds = {key: (var.lowBound, var.upBound) for key, var in food_is_selected.items()}
+    # Foods fixed out of the model (upBound 0, see WeeklyPlanModel.exclude) cannot be kept.
+    pattern = {(f, d): 1 if previous_plan.get(d, {}).get(f, 0) > 0 and original_bounds[(f, d)][1] != 0 else 0
+               for (f, d) in food_is_selected}
+    day_counts = {d: 0 for d in days}
+    for (f, d), selected in pattern.items():
+        day_counts[d] += selected
+    for food in foods_to_include:
+        if (food, days[0]) in food_is_selected and not any(pattern[(food, d)] for d in days):
+            day = min(days, key=day_counts.get)
+            pattern[(food, day)] = 1
+            day_counts[day] += 1
+
+    # First keep the pattern exactly; if the edit broke it (e.g. an excluded food leaves
+    # a group short), keep every old selection but let the solver add foods.
+    for exact in (True, False):
+        time_limit = WARM_START_REPAIR_TIME_LIMIT
+        if deadline is not None:
+            time_limit = max(1, min(time_limit, int((deadline - time.perf_counter()) / 4)))
+        repair_solver = _solver_variant(solver, time_limit=time_limit, warmStart=False)
+        for option in SEARCH_PROGRESS_OPTIONS:
+            # The restricted repair model's incumbents and bounds are not the model's.
+            repair_solver.optionsDict.pop(option, None)
+        for key, selected in pattern.items():
+            low, up = original_bounds[key]
+            food_is_selected[key].lowBound = max(low or 0, selected)
+            food_is_selected[key].upBound = selected if exact else up
+        try:
+            prob.solve(repair_solver)
+        finally:
+            for key, (low, up) in original_bounds.items():
+                food_is_selected[key].lowBound, food_is_selected[key].upBound = low, up
+        if LpStatus[prob.status] == 'Optimal' and all(var.varValue is not None for var in food_vars.values()):
+            return True
+
+    for var in prob.variables():
+        var.varValue = None
+    return False
+
+
+def create_and_solve_model(nutrition_df, prices_series, intake_df, food_group_map,
+                           foods_to_exclude, foods_to_include, daily_diversity_target,
+                           days_of_week, nutrient_mode, variety_level, *, solver_name=None,
+                           builder='matrix', balance_formulation='bigm', symmetry_breaking=False,
+                           presolve=True, warm_start_plan=None, elastic=False,
+                           rolling=False, window=None, history=None, column_generation=False, corpus_dir=None,
+                           deadline=None):
+    """
+    Builds and solves the MILP plan model with cost minimization, adjusted by a variety level.
+
+    solver_name is a PuLP solver object (None for PuLP's default); highs_backend.HighsInMemory
+    solves in-process from arrays instead of through temp files.
+
+    days_of_week is the plan length in days (see horizon_days). With rolling, plans
+    longer than ROLLING_WINDOW_DAYS are solved window by window (solve_rolling_horizon,
+    whose report is kept as prob.rolling_report); window and history are the
+    single-window inputs that uses (see _build_model).
+
+    With column_generation, catalogs of more than COLUMN_GENERATION_MIN_FOODS foods are
+    planned from a priced-in subset of foods (solve_column_generation, whose report is
+    kept as prob.column_generation_report); food_vars then only covers that subset.
+
+    warm_start_plan is an earlier {day: {food: grams}} result (e.g. st.session_state.plan_results);
+    it is repaired against the current inputs and handed to the solver as a MIP start.
+
+    With elastic, the nutrient, calorie-share, macro, variety and forced-inclusion rules
+    become soft (see _add_elastic_slack) so the model always has a plan; read_relaxations
+    then tells which rules that plan had to bend and by how much.
+
+    With corpus_dir (default corpus.CORPUS_DIR, i.e. DIET_PLANNER_CORPUS_DIR), the
+    inputs, the built model and the solver log are saved there as a replayable case
+    (see core/corpus.py). Rolling windows are not saved on their own, only the whole plan.
+
+    deadline (a time.perf_counter() value) bounds the whole call: the time the build and
+    the warm-start repair take comes off the solver's time limit.
+    """
+    model_args = dict(nutrition_df=nutrition_df, prices_series=prices_series, intake_df=intake_df,
+                      food_group_map=food_group_map, foods_to_exclude=foods_to_exclude,
+                      foods_to_include=foods_to_include, daily_diversity_target=daily_diversity_target,
+                      days_of_week=days_of_week, nutrient_mode=nutrient_mode, variety_level=variety_level)
+    model_options = dict(builder=builder, balance_formulation=balance_formulation, symmetry_breaking=symmetry_breaking,
+                         presolve=presolve, elastic=elastic, rolling=rolling, column_generation=column_generation)
+    corpus_dir = corpus_dir or (corpus.CORPUS_DIR if window is None else None)
+    use_column_generation = column_generation and len(nutrition_df.index.difference(foods_to_exclude)) > COLUMN_GENERATION_MIN_FOODS
+    if use_column_generation or (rolling and int(days_of_week) > ROLLING_WINDOW_DAYS):
+        solver_name = _within_deadline(solver_name, deadline) # both split the time limit themselves
+    if use_column_generation:
+        if elastic or window is not None or (rolling and int(days_of_week) > ROLLING_WINDOW_DAYS):
+            raise ValueError("Column generation is not supported for elastic or rolling-horizon solves.")
+        start = time.perf_counter()
+        prob, food_vars, days, report = solve_column_generation(
+            nutrition_df, prices_series, intake_df, food_group_map,
+            foods_to_exclude, foods_to_include, daily_diversity_target,
+            days_of_week, nutrient_mode, variety_level, solver_name=solver_name, warm_start_plan=warm_start_plan,
+            builder=builder, balance_formulation=balance_formulation, symmetry_breaking=symmetry_breaking, presolve=presolve
+        )
+        prob.column_generation_report = report
+        if corpus_dir:
+            _save_to_corpus(corpus_dir, prob, model_args, model_options, solver_name, time.perf_counter() - start,
+                            warm_start_plan, None, write_mps=False)
+        return prob, food_vars, days
+
+    if rolling and int(days_of_week) > ROLLING_WINDOW_DAYS:
+        if elastic:
+            raise ValueError("Elastic solves are not supported in rolling-horizon mode.")
+        prob, food_vars, days, prob_report = solve_rolling_horizon(
+            nutrition_df, prices_series, intake_df, food_group_map,
+            foods_to_exclude, foods_to_include, daily_diversity_target,
+            days_of_week, nutrient_mode, variety_level, solver_name=solver_name,
+            warm_start_plan=warm_start_plan, builder=builder, balance_formulation=balance_formulation,
+            presolve=presolve
+        )
+        prob.rolling_report = prob_report
+        if corpus_dir:
+            _save_to_corpus(corpus_dir, prob, model_args, model_options, solver_name, prob_report['seconds'],
+                            warm_start_plan, None, write_mps=False)
+        return prob, food_vars, days
+
+    with tracing.span('build_model'):
+        prob, food_vars, food_is_selected, days = _build_model(
+            nutrition_df, prices_series, intake_df, food_group_map,
+            foods_to_exclude, foods_to_include, daily_diversity_target,
+            days_of_week, nutrient_mode, variety_level, builder=builder,
+            balance_formulation=balance_formulation, symmetry_breaking=symmetry_breaking, presolve=presolve,
+            window=window, history=history
+        )
+        if elastic:
+            prob.elastic_slacks = _add_elastic_slack(prob, intake_df)
+    if warm_start_plan:
+        with tracing.span('warm_start'):
+            if _repair_warm_start(prob, food_vars, food_is_selected, days,
+                                  warm_start_plan, foods_to_include, solver_name, deadline):
+                solver_name = _solver_variant(solver_name, warmStart=True)
+    solver_name = _reporting_plans(_within_deadline(solver_name, deadline), food_vars, days)
+    solver_name, log_path, own_log = _with_cbc_log(solver_name, bool(corpus_dir) or tracing.current_trace() is not None)
+    start = time.perf_counter()
+    try:
+        with tracing.span('solve'):
+            prob.solve(solver_name)
+        seconds = time.perf_counter() - start
+        tracing.record_solver_stats(prob, seconds, log_path, window=window)
+        if corpus_dir:
+            _save_to_corpus(corpus_dir, prob, model_args, model_options, solver_name,
+                            seconds, warm_start_plan, log_path)
+    finally:
+        if own_log:
+            os.remove(log_path)
+    return prob, food_vars, days
+
+
+def _with_cbc_log(solver, wanted):
+    """
+    Returns (solver, log_path, own_log): a CBC solver that writes its log, when wanted,
+    to a temporary file (own_log, to be removed by the caller) unless it already has a
+    logPath of its own. Other solvers are returned unchanged with no log.
+    """
+    options = (solver or LpSolverDefault).optionsDict
+    if 'logPath' in options:
+        return solver, options['logPath'], False
+    if not wanted or (solver or LpSolverDefault).name not in ('PULP_CBC_CMD', 'COIN_CMD'):
+        return solver, None, False
+    fd, log_path = tempfile.mkstemp(suffix='.log', prefix='solve_')
+    os.close(fd)
+    return _solver_variant(solver, logPath=log_path), log_path, True
+
+
+def _save_to_corpus(corpus_dir, prob, model_args, model_options, solver, seconds, warm_start_plan, log_path, write_mps=True):
+    """Saves a solve to the corpus; a failure there is logged, never raised into the solve."""
+    try:
+        path = corpus.save_case(corpus_dir, prob, model_args, model_options, solver=solver or LpSolverDefault,
+                                seconds=seconds, warm_start_plan=warm_start_plan, log_path=log_path, write_mps=write_mps)
+        logger.info("Saved the solve to the corpus: %s", path)
+    except OSError as e:
+        logger.warning("Could not save the solve to the corpus: %s", e)
+
+
+# =============================================================================
+# --- ROLLING HORIZON ---
+# =============================================================================
+
+
+def solve_rolling_horizon(nutrition_df, prices_series, intake_df, food_group_map,
+                          foods_to_exclude, foods_to_include, daily_diversity_target,
+                          days_of_week, nutrient_mode, variety_level, *, solver_name=None,
+                          window_days=ROLLING_WINDOW_DAYS, step_days=ROLLING_STEP_DAYS,
+                          warm_start_plan=None, **model_options):
+    """
+    Plans a long horizon as a sequence of overlapping windows.
+
+    Each window of window_days is solved with every earlier day fixed as history, so the
+    7-day repetition caps, per-week inclusions and mutually exclusive foods carry over;
+    only its first step_days are kept and the rest just keeps those days from painting
+    the next window into a corner. The overlap seeds the next window's warm start.
+    Solve time grows linearly with the horizon; the plan is not guaranteed optimal
+    over the whole horizon, only within each window. A time limit on solver_name is
+    the budget for the whole horizon, shared out over the windows still to solve.
+
+    Returns (prob, food_vars, days, report) like decomposition.solve_decomposed: prob
+    carries the overall status and the horizon's total cost as its objective, food_vars
+    maps (food, day) to variables holding the chosen grams, and report has 'windows'
+    (one {'days', 'status', 'objective', 'seconds'} per solve) and 'seconds'.
+    """
+    start_time = time.perf_counter()
+    horizon = horizon_days(days_of_week)
+    window_days = max(window_days, step_days)
+    n_windows = max(1, -(-(len(horizon) - window_days) // step_days) + 1)
+    time_limit = getattr(solver_name, 'timeLimit', None)
+    plan, windows, status, proven = {}, [], 'Optimal', True
+    start = 0
+    while start < len(horizon):
+        end = min(start + window_days, len(horizon))
+        keep_until = len(horizon) if end == len(horizon) else start + step_days
+        window_solver = solver_name
+        if time_limit:
+            remaining = time_limit - (time.perf_counter() - start_time)
+            window_solver = _solver_variant(solver_name, time_limit=max(1, remaining / (n_windows - len(windows))))
+        window_start_plan = {d: p for d, p in (warm_start_plan or {}).items() if d in horizon[start:end]}
+        window_start_plan.update(windows[-1]['lookahead'] if windows else {})
+        window_start = time.perf_counter()
+        prob, food_vars, days = create_and_solve_model(
+            nutrition_df, prices_series, intake_df, food_group_map,
+            foods_to_exclude, foods_to_include, daily_diversity_target,
+            days_of_week, nutrient_mode, variety_level, solver_name=window_solver,
+            warm_start_plan=window_start_plan or None, window=(start, end), history=plan, **model_options
+        )
+        window_status = LpStatus[prob.status]
+        has_plan = window_status == 'Optimal' and prob.objective is not None and value(prob.objective) is not None
+        window_plan = extract_plan(food_vars, days) if has_plan else {}
+        windows.append({'days': (horizon[start], horizon[end - 1]), 'status': window_status,
+                        'objective': value(prob.objective) if has_plan else None,
+                        'seconds': time.perf_counter() - window_start,
+                        'lookahead': {d: window_plan[d] for d in horizon[keep_until:end] if d in window_plan}})
+        logger.info("Rolling horizon: days %s-%s %s in %.1f s", horizon[start], horizon[end - 1],
+                    window_status, windows[-1]['seconds'])
+        if not has_plan:
+            status = window_status if window_status != 'Optimal' else 'Not Solved'
+            break
+        proven = proven and prob.sol_status == LpSolutionOptimal
+        for d in horizon[start:keep_until]:
+            plan[d] = window_plan[d]
+        start = keep_until
+
+    foods = sorted({f for day_plan in plan.values() for f in day_plan})
+    result = LpProblem("Rolling_Horizon_Plan", LpMinimize)
+    food_vars = LpVariable.dicts("FoodGrams", [(f, d) for f in foods for d in horizon], lowBound=0, cat='Continuous')
+    for (f, d), var in food_vars.items():
+        var.varValue = plan.get(d, {}).get(f, 0.0)
+    result += lpSum(prices_series.get(f, DEFAULT_PRICE_PER_GRAM) * var for (f, d), var in food_vars.items()), "Total_Horizon_Cost"
+    result.status = {name: code for code, name in LpStatus.items()}[status]
+    result.sol_status = LpSolutionOptimal if proven and status == 'Optimal' else LpSolutionIntegerFeasible
+    for window in windows:
+        del window['lookahead']
+    report = {'windows': windows, 'seconds': time.perf_counter() - start_time}
+    return result, food_vars, horizon, report
+
+
+# =============================================================================
+# --- COLUMN GENERATION OVER FOODS ---
+# =============================================================================
+
+
+def _food_pricing_rows(matrices, nutrient_mode):
+    """
+    The rows a food's grams enter with catalog-wide coefficients: calorie shares, macro
+    shares and (in daily mode) nutrient bounds. Returns (prefixes, coeffs) where each
+    row of a day d is named prefix + d and coeffs is (n_foods, n_rows).
+    """
+    prefixes, columns = [], []
+    for group, percentage in FOOD_GROUP_CALORIE_DIST.items():
+        in_group = np.zeros(len(matrices.foods))
+        in_group[matrices.group_index.get(group, [])] = 1.0
+        prefixes.append(f"Calorie_Dist_{group}_")
+        columns.append(matrices.calories * in_group - percentage * matrices.calories)
+    for macro, coeffs in matrices.macro_coeffs.items():
+        prefixes += [f"Macro_Min_{macro}_", f"Macro_Max_{macro}_"]
+        columns += [coeffs - MACRO_CALORIE_DIST[macro]['min'] * matrices.calories,
+                    coeffs - MACRO_CALORIE_DIST[macro]['max'] * matrices.calories]
+    if nutrient_mode == 'daily':
+        for j, nutrient in enumerate(matrices.nutrients):
+            for bound, prefix in ((matrices.lower_bounds[j], 'Daily_Min_'), (matrices.upper_bounds[j], 'Daily_Max_')):
+                if not np.isnan(bound):
+                    prefixes.append(f"{prefix}{nutrient}_")
+                    columns.append(matrices.nutrient_matrix[:, j])
+    return prefixes, np.column_stack(columns)
+
+
+def _initial_food_set(matrices, food_group_map, foods_to_include, variety_level, n_days, per_group):
+    """
+    Starting candidates: per food group the per_group foods cheapest per calorie (or
+    enough to meet the group's daily variety under the repetition cap), the best value
+    sources of each nutrient with a lower bound, the staples and the forced foods.
+    """
+    min_daily_group_variety, weekly_max_occurrences, _, _ = _get_variety_settings(variety_level)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_per_calorie = np.where(matrices.calories > 0, matrices.prices / matrices.calories, np.inf)
+        value_per_price = matrices.nutrient_matrix / matrices.prices[:, None]
+    chosen = {f for f in list(foods_to_include) + STAPLE_FOODS if f in set(matrices.foods)}
+    for group, idx in matrices.group_index.items():
+        needed = -(-min_daily_group_variety.get(group, 0) * n_days // weekly_max_occurrences) + 1
+        for i in idx[np.argsort(price_per_calorie[idx], kind='stable')][:max(per_group, needed)]:
+            chosen.add(matrices.foods[i])
+    for j in np.flatnonzero(~np.isnan(matrices.lower_bounds)):
+        for i in np.argsort(-value_per_price[:, j], kind='stable')[:COLUMN_GENERATION_FOODS_PER_NUTRIENT]:
+            chosen.add(matrices.foods[i])
+    return chosen
+
+
+def solve_column_generation(nutrition_df, prices_series, intake_df, food_group_map,
+                            foods_to_exclude, foods_to_include, daily_diversity_target,
+                            days_of_week, nutrient_mode, variety_level, *, solver_name=None,
+                            warm_start_plan=None, **model_options):
+    """
+    Plans from a large catalog while only ever modelling the foods that matter.
+
+    Starts from a small candidate set (_initial_food_set) and repeats: solve the LP
+    relaxation of the model restricted to the candidates, then price every other
+    catalog food for every day with the duals of the calorie-share, macro-share and
+    nutrient rows (price per gram minus the dual value of its nutrients, see
+    _food_pricing_rows) and add the COLUMN_GENERATION_FOODS_PER_ROUND most negative
+    ones. When no food prices out (or after COLUMN_GENERATION_MAX_ROUNDS, or
+    COLUMN_GENERATION_PRICING_SHARE of the time limit), the MILP is solved over the
+    candidates with the rest of the time. A restricted relaxation that is infeasible
+    doubles the foods per group instead.
+
+    Model size follows the candidate set, not the catalog. The pricing ignores the
+    variety rows (the selection binaries are not priced), so the plan is the optimum
+    over the candidates, not a proven catalog-wide optimum.
+
+    Returns (prob, food_vars, days, report) like solve_rolling_horizon: food_vars only
+    covers the candidates, and report has 'rounds' (one {'foods', 'status', 'objective',
+    'added', 'seconds'} per relaxation), 'foods', 'catalog_foods' and 'seconds'.
+    """
+    start_time = time.perf_counter()
+    excluded = set(foods_to_exclude)
+    catalog = [f for f in nutrition_df.index if f not in excluded]
+    n_days = len(horizon_days(days_of_week))
+    matrices = build_model_matrices(nutrition_df, prices_series, intake_df, food_group_map, catalog)
+    prefixes, coeffs = _food_pricing_rows(matrices, nutrient_mode)
+    position = {f: i for i, f in enumerate(catalog)}
+    per_group = COLUMN_GENERATION_FOODS_PER_GROUP
+    candidates = _initial_food_set(matrices, food_group_map, foods_to_include, variety_level, n_days, per_group)
+    candidates |= {f for day_plan in (warm_start_plan or {}).values() for f in day_plan if f in position}
+
+    time_limit = getattr(solver_name, 'timeLimit', None)
+    relaxation = _solver_variant(solver_name, time_limit=time_limit)
+    relaxation.mip = False
+    relaxation.msg = False
+    build_options = {k: v for k, v in model_options.items() if k in ('builder', 'balance_formulation', 'presolve')}
+    rounds = []
+    for _ in range(COLUMN_GENERATION_MAX_ROUNDS):
+        if time_limit and time.perf_counter() - start_time > COLUMN_GENERATION_PRICING_SHARE * time_limit:
+            break
+        round_start = time.perf_counter()
+        prob, _, _, days = _build_model(
+            nutrition_df.loc[sorted(candidates, key=position.get)], prices_series, intake_df, food_group_map,
+            [], foods_to_include, daily_diversity_target, days_of_week, nutrient_mode, variety_level, **build_options
+        )
+        with tracing.span('pricing'):
+            prob.solve(relaxation)
+        status = LpStatus[prob.status]
+        added = []
+        if status == 'Infeasible':
+            per_group *= 2
+            grown = _initial_food_set(matrices, food_group_map, foods_to_include, variety_level, n_days, per_group)
+            added = sorted(grown - candidates)
+        elif status == 'Optimal':
+            duals = np.array([[getattr(prob.constraints.get(prefix + d), 'pi', None) or 0.0 for d in days]
+                              for prefix in prefixes])
+            reduced_costs = (matrices.prices[:, None] - coeffs @ duals).min(axis=1)
+            reduced_costs[[position[f] for f in candidates]] = np.inf
+            tolerance = COLUMN_GENERATION_REDUCED_COST_TOLERANCE * max(1.0, float(np.abs(matrices.prices).max()))
+            best = np.argsort(reduced_costs, kind='stable')[:COLUMN_GENERATION_FOODS_PER_ROUND]
+            added = [catalog[i] for i in best if reduced_costs[i] < -tolerance]
+        rounds.append({'foods': len(candidates), 'status': status, 'added': len(added),
+                       'objective': value(prob.objective) if status == 'Optimal' else None,
+                       'seconds': time.perf_counter() - round_start})
+        logger.info("Column generation: %d foods, relaxation %s, %d foods added", len(candidates), status, len(added))
+        if not added:
+            break
+        candidates.update(added)
+
+    milp_solver = solver_name
+    if time_limit:
+        milp_solver = _solver_variant(solver_name, time_limit=max(1, time_limit - (time.perf_counter() - start_time)))
+    with tracing.span('build_model'):
+        prob, food_vars, food_is_selected, days = _build_model(
+            nutrition_df.loc[sorted(candidates, key=position.get)], prices_series, intake_df, food_group_map,
+            [], foods_to_include, daily_diversity_target, days_of_week, nutrient_mode, variety_level, **model_options
+        )
+    if warm_start_plan:
+        with tracing.span('warm_start'):
+            if _repair_warm_start(prob, food_vars, food_is_selected, days,
+                                  warm_start_plan, foods_to_include, milp_solver):
+                milp_solver = _solver_variant(milp_solver, warmStart=True)
+    milp_start = time.perf_counter()
+    with tracing.span('solve'):
+        prob.solve(milp_solver)
+    tracing.record_solver_stats(prob, time.perf_counter() - milp_start)
+    report = {'rounds': rounds, 'foods': len(candidates), 'catalog_foods': len(catalog),
+              'seconds': time.perf_counter() - start_time}
+    return prob, food_vars, days, report
+
+
+# =============================================================================
+# --- PERSISTENT MODEL ---
+# =============================================================================
+
+
+class WeeklyPlanModel:
+    """
+    The weekly model for one catalog and variety level, built once and updated in place.
+
+    Prices (objective and day-order rows), nutrient bounds (right-hand sides), exclusions
+    (variable bounds fixed to zero) and forced inclusions (one row per food) can change
+    between solves without rebuilding the constraint structure. Anything else, such as
+    adding foods or changing the variety level or diversity target, needs a new model.
+
+    The full catalog is kept in the model, so presolve_catalog is not applied.
+    """
+
+    def __init__(self, nutrition_df, prices_series, intake_df, food_group_map,
+                 daily_diversity_target, nutrient_mode, variety_level, *,
+                 balance_formulation='bigm', symmetry_breaking=False):
+        self.nutrition_df = nutrition_df
+        self.nutrient_mode = nutrient_mode
+        self.variety_level = variety_level
+        self.daily_diversity_target = daily_diversity_target
+        self.balance_formulation = balance_formulation
+        self.symmetry_breaking = symmetry_breaking
+        with tracing.span('build_model'):
+            self.prob, self.food_vars, self.food_is_selected, self.days = _build_model(
+                nutrition_df, prices_series, intake_df, food_group_map, [], [],
+                daily_diversity_target, len(DAYS_OF_WEEK), nutrient_mode, variety_level,
+                balance_formulation=balance_formulation, symmetry_breaking=symmetry_breaking, presolve=False
+            )
+        self.foods = nutrition_df.index.tolist()
+        self.excluded = set()
+        self.included = set()
+        self.prices_series = prices_series
+        self.intake_df = intake_df
+
+    def set_prices(self, prices_series):
+        """Replaces the objective (and the day-order rows, which are priced)."""
+        prices = prices_series.reindex(self.foods).fillna(DEFAULT_PRICE_PER_GRAM).to_numpy(dtype=float)
+        objective = _affine([self.food_vars[(f, d)] for f in self.foods for d in self.days], np.repeat(prices, len(self.days)))
+        objective.name = "Total_Weekly_Cost"
+        self.prob.setObjective(objective)
+        if self.symmetry_breaking:
+            for d_prev, d_next in zip(self.days, self.days[1:]):
+                del self.prob.constraints[f"Symmetry_DayCost_{d_prev}_{d_next}"]
+            _add_day_order_rows(self.prob, self.food_vars, self.foods, prices_series, self.days)
+        self.prices_series = prices_series
+
+    def set_nutrient_bounds(self, intake_df):
+        """Moves the Daily_Min/Daily_Max right-hand sides; rows appear or disappear as bounds do."""
+        if self.nutrient_mode != 'daily':
+            self.intake_df = intake_df
+            return
+        for nutrient in intake_df.index.union(self.intake_df.index):
+            if nutrient not in self.nutrition_df.columns:
+                continue
+            bounds = intake_df.loc[nutrient] if nutrient in intake_df.index else None
+            coeffs = self.nutrition_df.loc[self.foods, nutrient].to_numpy(dtype=float)
+            for column, prefix, sense in (('lower_bound', 'Daily_Min_', LpConstraintGE), ('upper_bound', 'Daily_Max_', LpConstraintLE)):
+                bound = np.nan if bounds is None else pd.to_numeric(bounds[column], errors='coerce')
+                for d in self.days:
+                    name = f"{prefix}{nutrient}_{d}"
+                    if pd.isna(bound):
+                        self.prob.constraints.pop(name, None)
+                    elif name in self.prob.constraints:
+                        self.prob.constraints[name].changeRHS(float(bound))
+                    else:
+                        expr = _affine([self.food_vars[(f, d)] for f in self.foods], coeffs)
+                        self.prob.addConstraint(LpConstraint(expr, sense, name, float(bound)))
+        self.intake_df = intake_df
+
+    def exclude(self, food):
+        """Fixes a food's grams and selection to zero on every day."""
+        for d in self.days:
+            self.food_vars[(food, d)].upBound = 0
+            self.food_is_selected[(food, d)].upBound = 0
+        self.excluded.add(food)
+
+    def unexclude(self, food):
+        for d in self.days:
+            self.food_vars[(food, d)].upBound = None
+            self.food_is_selected[(food, d)].upBound = 1
+        self.excluded.discard(food)
+
+    def include(self, food):
+        """Forces a food into the week (the same Force_Include row the builders add)."""
+        days_selected = [self.food_is_selected[(food, d)] for d in self.days]
+        self.prob.addConstraint(LpConstraint(_affine(days_selected, np.ones(len(self.days))), LpConstraintGE,
+                                             f"Force_Include_{food}_Weekly", 1))
+        self.included.add(food)
+
+    def uninclude(self, food):
+        del self.prob.constraints[f"Force_Include_{food}_Weekly"]
+        self.included.discard(food)
+
+    @tracing.traced('update_model')
+    def update(self, prices_series=None, intake_df=None, foods_to_exclude=None, foods_to_include=None):
+        """Applies whichever inputs are given, touching only what differs from the current state."""
+        if prices_series is not None and not prices_series.equals(self.prices_series):
+            self.set_prices(prices_series)
+        if intake_df is not None and not intake_df.equals(self.intake_df):
+            self.set_nutrient_bounds(intake_df)
+        if foods_to_exclude is not None:
+            wanted = set(foods_to_exclude) & set(self.foods)
+            for food in self.excluded - wanted:
+                self.unexclude(food)
+            for food in wanted - self.excluded:
+                self.exclude(food)
+        if foods_to_include is not None:
+            wanted = set(foods_to_include) & set(self.foods)
+            for food in self.included - wanted:
+                self.uninclude(food)
+            for food in wanted - self.included:
+                self.include(food)
+
+    def solve(self, solver_name=None, warm_start_plan=None, deadline=None):
+        """Solves the model as it stands; returns (prob, food_vars, days) like create_and_solve_model (see there for deadline)."""
+        for var in self.prob.variables():
+            var.varValue = None # drop the previous solve's values so they are not reused as a start
+        if warm_start_plan:
+            with tracing.span('warm_start'):
+                if _repair_warm_start(self.prob, self.food_vars, self.food_is_selected, self.days,
+                                      warm_start_plan, sorted(self.included), solver_name, deadline):
+                    solver_name = _solver_variant(solver_name, warmStart=True)
+        solver_name = _reporting_plans(_within_deadline(solver_name, deadline), self.food_vars, self.days)
+        solver_name, log_path, own_log = _with_cbc_log(solver_name, tracing.current_trace() is not None)
+        start = time.perf_counter()
+        try:
+            with tracing.span('solve'):
+                self.prob.solve(solver_name)
+            tracing.record_solver_stats(self.prob, time.perf_counter() - start, log_path)
+        finally:
+            if own_log:
+                os.remove(log_path)
+        return self.prob, self.food_vars, self.days
+
+
+@tracing.traced('preview')
+def preview_plan(nutrition_df, prices_series, intake_df, food_group_map,
+                 foods_to_exclude, foods_to_include, daily_diversity_target,
+                 days_of_week, nutrient_mode, variety_level, *, solver_name=None):
+    """
+    Quick feasibility and cost check for the inputs of create_and_solve_model.
+
+    Solves the LP relaxation of the weekly model (compact balance formulation, which
+    gives the tighter bound) instead of the MILP. Because every plan the MILP can find
+    is also a relaxation solution:
+    - 'Infeasible' means no plan exists and the full solve can be skipped;
+    - lower_bound is a guaranteed floor on the weekly cost of the optimal plan.
+    'Optimal' only means the relaxation is feasible; the MILP can still be infeasible.
+
+    Returns {'status', 'lower_bound', 'reason', 'seconds'}.
+    """
+    start = time.perf_counter()
+    for group in MUTUALLY_EXCLUSIVE_GROUPS:
+        forced = [f for f in group if f in foods_to_include and f not in foods_to_exclude]
+        if len(forced) > 1:
+            return {'status': 'Infeasible', 'lower_bound': None,
+                    'reason': f"Only one of {', '.join(forced)} can be part of the plan.",
+                    'seconds': time.perf_counter() - start}
+
+    prob, _, _, _ = _build_model(
+        nutrition_df, prices_series, intake_df, food_group_map,
+        foods_to_exclude, foods_to_include, daily_diversity_target,
+        days_of_week, nutrient_mode, variety_level, balance_formulation='compact'
+    )
+    solver = _solver_variant(solver_name, time_limit=PREVIEW_TIME_LIMIT)
+    solver.mip = False
+    solver.msg = False
+    prob.solve(solver)
+
+    status = LpStatus[prob.status]
+    lower_bound = prob.objective.value() if status == 'Optimal' else None
+    reason = "The nutrient targets and food rules cannot all be met with the allowed foods." if status == 'Infeasible' else None
+    return {'status': status, 'lower_bound': lower_bound, 'reason': reason, 'seconds': time.perf_counter() - start}
+
+
+def diagnose_infeasibility(nutrition_df, prices_series, intake_df, food_group_map,
+                           foods_to_exclude, foods_to_include, daily_diversity_target,
+                           days_of_week, nutrient_mode, variety_level, *, solver_name=None,
+                           time_limit=ELASTIC_TIME_LIMIT, **model_options):
+    """
+    Runs one time-limited elastic solve and returns (status, relaxations).
+
+    status is the LpStatus of the elastic model; relaxations is read_relaxations'
+    list (empty if the inputs turn out to be feasible). A plan found before the time
+    limit may relax more than strictly necessary, so the amounts are upper bounds.
+    The compact balance formulation is used unless model_options says otherwise.
+    """
+    model_options.setdefault('balance_formulation', 'compact') # finds small relaxations much sooner
+    solver = _solver_variant(solver_name, time_limit=time_limit)
+    prob, _, _ = create_and_solve_model(
+        nutrition_df, prices_series, intake_df, food_group_map,
+        foods_to_exclude, foods_to_include, daily_diversity_target,
+        days_of_week, nutrient_mode, variety_level, solver_name=solver, elastic=True, **model_options
+    )
+    status = LpStatus[prob.status]
+    return status, read_relaxations(prob) if status == 'Optimal' else []
+
+
+# =============================================================================
+# --- HOUSEHOLD PLANNING ---
+# =============================================================================
+
+
+def _build_household_model(members, nutrition_df, prices_series, food_group_map,
+                           foods_to_exclude, foods_to_include, days_of_week, nutrient_mode,
+                           variety_level, package_sizes=None):
+    """
+    Builds (but does not solve) one model that plans every household member at once.
+
+    The household eats from one menu: the per-day food selection binaries, and every
+    rule that only looks at them (diversity, group variety, item counts, repetition caps,
+    forced inclusions, mutually exclusive foods), exist once. Each member has their own
+    grams and their own intake, calorie-share, macro and balanced-energy rows (compact
+    formulation), so the binary structure, and with it most of the search, does not
+    grow with the household. The balanced-energy rows work on the shared selection too:
+    from variety level 2 on, every member eats every food selected for a day from a
+    group the rule covers (at least the lower share of their own group average, see
+    _add_compact_balance_rows). Any other selected food may be 0 g for a member.
+
+    The members' grams add up into one purchase per food (Purchase_<food>). For foods
+    in package_sizes (grams per package) whole packages (Packages_<food>) are bought
+    and priced, so members sharing a food share its packages; other foods are priced per gram.
+
+    Returns (prob, member_food_vars, days) with member_food_vars {member name: {(food, day): var}}.
+    prob.purchases maps each food to its (grams variable, packages variable or None).
+    """
+    (min_daily_group_variety, weekly_max_occurrences,
+     balance_energy_rule_active, apply_repetition_cap_to_staples) = _get_variety_settings(variety_level)
+    package_sizes = package_sizes if package_sizes is not None else pd.Series(dtype=float)
+
+    days = horizon_days(days_of_week)
+    foods = [f for f in nutrition_df.index.tolist() if f not in foods_to_exclude]
+    n_foods = len(foods)
+    ones = np.ones(n_foods)
+    prob = LpProblem("Household_Diet_Optimization", LpMinimize)
+
+    def add(expr, sense, name, rhs=0.0):
+        prob.addConstraint(LpConstraint(expr, sense, name, rhs))
+
+    # --- Shared menu: selection binaries and the rules on them ---
+    food_is_selected = LpVariable.dicts("FoodSelected", [(f, d) for f in foods for d in days], cat='Binary')
+    shared = build_model_matrices(nutrition_df, prices_series, members[0]['intake_df'], food_group_map, foods)
+    daily_diversity_target = max(member['daily_diversity_target'] for member in members)
+    balance_groups = []
+    if balance_energy_rule_active:
+        balance_groups = [(group, min_items, shared.group_index[group])
+                          for group, min_items in min_daily_group_variety.items()
+                          if min_items > 1 and len(shared.group_index.get(group, []))]
+    day_s = {d: [food_is_selected[(f, d)] for f in foods] for d in days}
+    items_is_k = {}
+    for d in days:
+        s = day_s[d]
+        add(_affine(s, ones), LpConstraintGE, f"DailyDiversity_{d}", daily_diversity_target)
+        for group, min_items in min_daily_group_variety.items():
+            idx = shared.group_index.get(group, [])
+            if len(idx):
+                add(_affine([s[i] for i in idx], np.ones(len(idx))), LpConstraintGE, f"Min_Variety_{group}_{d}", min_items)
+        for group, min_items, idx in balance_groups:
+            ks = range(min_items, MAX_ITEMS_PER_GROUP_FOR_BALANCE + 1)
+            items_is_k[(group, d)] = LpVariable.dicts(f"NumItemsInGroupIsK_{group}_{d}", ks, cat='Binary')
+            z = [items_is_k[(group, d)][k] for k in ks]
+            add(_affine(z, np.ones(len(z))), LpConstraintEQ, f"ExactlyOneKIsChosen_{group}_{d}", 1)
+            add(_affine(z + [s[i] for i in idx], np.concatenate([np.array(ks, dtype=float), -np.ones(len(idx))])),
+                LpConstraintEQ, f"LinkNumItemsToK_{group}_{d}")
+
+    foods_for_repetition_cap = foods if apply_repetition_cap_to_staples else [f for f in foods if f not in STAPLE_FOODS]
+    _add_horizon_rows(prob, food_is_selected, [f for f in foods_to_include if f in foods], foods_for_repetition_cap,
+                      weekly_max_occurrences, days)
+    weekly_food_is_used = LpVariable.dicts("WeeklyFoodUsed", foods, cat='Binary')
+    for f in foods:
+        for d in days:
+            add(LpAffineExpression([(weekly_food_is_used[f], 1), (food_is_selected[(f, d)], -1)]), LpConstraintGE, f"Link_Weekly_Daily_{f}_{d}")
+    for group in MUTUALLY_EXCLUSIVE_GROUPS:
+        foods_in_group = [f for f in group if f in foods]
+        if foods_in_group:
+            add(_affine([weekly_food_is_used[f] for f in foods_in_group], np.ones(len(foods_in_group))), LpConstraintLE, f"Exclusive_Group_{'_'.join(foods_in_group)}", 1)
+
+    # --- Per member: grams and the intake rows on them ---
+    member_food_vars = {}
+    for m, member in enumerate(members, start=1):
+        matrices = build_model_matrices(nutrition_df, prices_series, member['intake_df'], food_group_map, foods)
+        calories = matrices.calories
+        food_vars = LpVariable.dicts(f"FoodGrams_M{m}", [(f, d) for f in foods for d in days], lowBound=0, cat='Continuous')
+        member_food_vars[member['name']] = food_vars
+        group_dist_coeffs = {}
+        for group, percentage in FOOD_GROUP_CALORIE_DIST.items():
+            idx = matrices.group_index.get(group, [])
+            if len(idx):
+                in_group = np.zeros(n_foods)
+                in_group[idx] = 1.0
+                group_dist_coeffs[group] = calories * in_group - percentage * calories
+        for d in days:
+            x, s, label = [food_vars[(f, d)] for f in foods], day_s[d], f"{d}_M{m}"
+            for group, coeffs in group_dist_coeffs.items():
+                add(_affine(x, coeffs), LpConstraintEQ, f"Calorie_Dist_{group}_{label}")
+            for macro, coeffs in matrices.macro_coeffs.items():
+                add(_affine(x, coeffs - MACRO_CALORIE_DIST[macro]['min'] * calories), LpConstraintGE, f"Macro_Min_{macro}_{label}")
+                add(_affine(x, coeffs - MACRO_CALORIE_DIST[macro]['max'] * calories), LpConstraintLE, f"Macro_Max_{macro}_{label}")
+            for f, x_f, s_f in zip(foods, x, s):
+                add(LpAffineExpression([(x_f, 1), (s_f, -BIG_M_GRAMS)]), LpConstraintLE, f"Link_{f}_{label}")
+            for group, _, idx in balance_groups:
+                _add_compact_balance_rows(add, [x[i] for i in idx], [s[i] for i in idx], calories[idx],
+                                          items_is_k[(group, d)], [foods[i] for i in idx], group, label)
+            if nutrient_mode == 'daily':
+                for j, nutrient in enumerate(matrices.nutrients):
+                    coeffs = matrices.nutrient_matrix[:, j]
+                    lower_bound, upper_bound = matrices.lower_bounds[j], matrices.upper_bounds[j]
+                    if not np.isnan(lower_bound): add(_affine(x, coeffs), LpConstraintGE, f"Daily_Min_{nutrient}_{label}", float(lower_bound))
+                    if not np.isnan(upper_bound): add(_affine(x, coeffs), LpConstraintLE, f"Daily_Max_{nutrient}_{label}", float(upper_bound))
+
+    # --- Shared shopping: one purchase per food, in whole packages where sizes are known ---
+    purchases, cost_terms = {}, []
+    for f, price in zip(foods, shared.prices.tolist()):
+        grams = LpVariable(f"Purchase_{f}", lowBound=0)
+        eaten = [food_vars[(f, d)] for food_vars in member_food_vars.values() for d in days]
+        add(_affine(eaten + [grams], np.concatenate([np.ones(len(eaten)), [-1.0]])), LpConstraintLE, f"Buy_{f}")
+        size = float(package_sizes.get(f, 0) or 0)
+        if size > 0:
+            packages = LpVariable(f"Packages_{f}", lowBound=0, cat='Integer')
+            add(LpAffineExpression([(grams, 1), (packages, -size)]), LpConstraintLE, f"Package_{f}")
+            cost_terms.append((packages, price * size))
+        else:
+            packages = None
+            cost_terms.append((grams, price))
+        purchases[f] = (grams, packages)
+    prob.setObjective(LpAffineExpression(cost_terms, name="Total_Household_Cost"))
+    prob.purchases = purchases
+    return prob, member_food_vars, days
+
+
+def create_and_solve_household_model(members, nutrition_df, prices_series, food_group_map,
+                                     foods_to_exclude, foods_to_include, days_of_week, nutrient_mode,
+                                     variety_level, *, package_sizes=None, solver_name=None):
+    """
+    Plans a shared menu for several people in one solve (see _build_household_model).
+
+    members is a list of {'name', 'intake_df', 'daily_diversity_target'} dicts, one per
+    person, with the intake table each would pass to create_and_solve_model. The daily
+    diversity target of the shared menu is the largest member's. From variety level 2
+    on, everyone eats every food of the balanced groups on the day's menu; members
+    cannot skip one another's fruit or vegetables.
+    Returns (prob, member_food_vars, days); extract_household_plan and
+    read_shopping_list turn the solved model into plans and a shopping list.
+    """
+    names = [member['name'] for member in members]
+    if not members or len(set(names)) != len(names):
+        raise ValueError("A household needs at least one member and unique member names.")
+    prob, member_food_vars, days = _build_household_model(
+        members, nutrition_df, prices_series, food_group_map, foods_to_exclude, foods_to_include,
+        days_of_week, nutrient_mode, variety_level, package_sizes
+    )
     prob.solve(solver_name)
-    return prob, food_vars, days
\ No newline at end of file
+    return prob, member_food_vars, days
+
+
+def extract_household_plan(member_food_vars, days, min_grams=0.01):
+    """Reads a solved household model into {member name: {day: {food: grams}}}."""
+    return {name: extract_plan(food_vars, days, min_grams) for name, food_vars in member_food_vars.items()}
+
+
+def read_shopping_list(prob, min_grams=0.01):
+    """Returns {food: {'grams', 'packages'}} bought by a solved household model ('packages' is None per gram)."""
+    shopping_list = {}
+    for food, (grams, packages) in prob.purchases.items():
+        bought = value(grams) or 0.0
+        if bought > min_grams:
+            shopping_list[food] = {'grams': bought, 'packages': int(round(value(packages))) if packages is not None else None}
+    return shopping_list
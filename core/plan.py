@@ -0,0 +1,127 @@
+# core/plan.py
+"""
+Array-backed food plans.
+
+A Plan holds the grams of every food on every day as one foods x days array, with
+the foods as a pandas Index. It reads like the {day: {food: grams}} dicts plans used
+to be (plan[day], plan.items(), len(plan)), so code that walks a plan day by day keeps
+working, while totals, costs and nutrient sums are single array operations.
+"""
+import json
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+
+def round_grams(grams):
+    """
+    Kitchen amounts in whole grams, the rule of ui_utils.smart_round_grams over an array:
+    at least 10 g, up to the next 5 g below 20 g and to the nearest 5 g from there on.
+    Zero stays zero.
+    """
+    grams = np.asarray(grams, dtype=float)
+    steps = np.where(grams < 20, np.ceil(grams / 5.0), np.round(grams / 5.0)) * 5
+    return np.where(grams > 0, np.maximum(steps, 10), 0).astype(np.int64)
+
+
+class Plan(Mapping):
+    """
+    A plan: grams[i, j] is the grams of foods[i] on days[j].
+
+    plan[day] is the {food: grams} dict of the foods eaten that day (zero entries are
+    left out). Plans pickle as their arrays, and to_json / from_json give a compact
+    JSON text for caches.
+    """
+
+    def __init__(self, grams, foods, days):
+        self.foods = foods if isinstance(foods, pd.Index) else pd.Index(foods)
+        self.days = tuple(days)
+        self.grams = np.asarray(grams).reshape(len(self.foods), len(self.days))
+        self._day_position = {d: j for j, d in enumerate(self.days)}
+
+    @classmethod
+    def from_dict(cls, plan, foods=None):
+        """
+        Builds a Plan from {day: {food: grams}} (a Plan is returned as it is). foods, e.g.
+        a catalog's index, fixes the food order; by default it is the order foods first appear.
+        """
+        if isinstance(plan, Plan) and foods is None:
+            return plan
+        plan = plan or {}
+        if foods is None:
+            foods = list(dict.fromkeys(f for day_plan in plan.values() for f in day_plan))
+        foods = foods if isinstance(foods, pd.Index) else pd.Index(foods)
+        days = list(plan)
+        grams = np.zeros((len(foods), len(days)))
+        for j, day_plan in enumerate(plan.values()):
+            if not day_plan:
+                continue
+            positions = foods.get_indexer(list(day_plan))
+            kept = positions >= 0 # foods outside a given index are dropped
+            grams[positions[kept], j] = np.fromiter(day_plan.values(), dtype=float, count=len(day_plan))[kept]
+        return cls(grams, foods, days)
+
+    @classmethod
+    def from_json(cls, text):
+        """Reads to_json output (or a plain {day: {food: grams}} JSON object)."""
+        data = json.loads(text)
+        if set(data) == {'foods', 'days', 'grams'}:
+            return cls(np.array(data['grams'], dtype=float), data['foods'], data['days'])
+        return cls.from_dict(data)
+
+    def to_json(self):
+        return json.dumps({'foods': self.foods.tolist(), 'days': list(self.days), 'grams': self.grams.tolist()})
+
+    def to_dict(self):
+        return {d: self[d] for d in self.days}
+
+    def __getitem__(self, day):
+        column = self.grams[:, self._day_position[day]]
+        eaten = np.flatnonzero(column)
+        return dict(zip(self.foods[eaten].tolist(), column[eaten].tolist()))
+
+    def __iter__(self):
+        return iter(self.days)
+
+    def __len__(self):
+        return len(self.days)
+
+    def __repr__(self):
+        return f"Plan({len(self.foods)} foods x {len(self.days)} days)"
+
+    def to_frame(self):
+        """Foods x days DataFrame of the grams."""
+        return pd.DataFrame(self.grams, index=self.foods, columns=list(self.days))
+
+    def reindex(self, foods):
+        """The same plan over another food index (e.g. the catalog's), to stack plans that share it."""
+        foods = foods if isinstance(foods, pd.Index) else pd.Index(foods)
+        grams = np.zeros((len(foods), len(self.days)), dtype=self.grams.dtype)
+        positions = foods.get_indexer(self.foods)
+        kept = positions >= 0
+        grams[positions[kept]] = self.grams[kept]
+        return Plan(grams, foods, self.days)
+
+    def shopping_list(self, rounded=False):
+        """Total grams of every food in the plan over all days (rounded as totals with rounded)."""
+        totals = self.grams.sum(axis=1)
+        eaten = totals > 0
+        return pd.Series(round_grams(totals[eaten]) if rounded else totals[eaten], index=self.foods[eaten], name='grams')
+
+    def day_costs(self, prices_series):
+        """Cost of each day's foods; foods without a price cost nothing."""
+        prices = prices_series.reindex(self.foods).fillna(0).to_numpy(dtype=float)
+        return pd.Series(prices @ self.grams, index=list(self.days), name='cost')
+
+    def cost(self, prices_series):
+        return float(self.day_costs(prices_series).sum())
+
+    def nutrient_totals(self, nutrition_df):
+        """Days x nutrients DataFrame of each day's intake (nutrition_df holds values per gram)."""
+        per_gram = nutrition_df.reindex(self.foods).fillna(0)
+        return pd.DataFrame(self.grams.T @ per_gram.to_numpy(dtype=float), index=list(self.days), columns=per_gram.columns)
+
+    def rounded(self):
+        """The plan in kitchen amounts (see round_grams)."""
+        return Plan(round_grams(self.grams), self.foods, self.days)
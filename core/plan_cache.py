@@ -0,0 +1,307 @@
+# core/plan_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from pulp import LpSolutionOptimal, LpStatus, value
+
+from core import optimizer
+from core.plan import Plan
+
+# Define the default cache location relative to this file, like data_loader.DATA_DIR.
+CACHE_DIR = os.environ.get('DIET_PLANNER_CACHE_DIR', os.path.join(os.path.dirname(__file__), '..', 'cache'))
+CACHE_FILE_NAME = 'plan_cache.sqlite3'
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+CACHEABLE_STATUSES = ('Optimal', 'Infeasible')
+KEY_DECIMALS = 9 # inputs are rounded before hashing so float noise does not split entries
+UNPROVEN_TTL_SECONDS = 3600 # plans not proven optimal (e.g. time-limited incumbents) are served this long at most
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    key TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    objective REAL,
+    plan TEXT NOT NULL,
+    proven INTEGER NOT NULL DEFAULT 1,
+    diagnosis TEXT,
+    size_bytes INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plans_last_access ON plans (last_access);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0), ('evictions', 0);
+"""
+_ADDED_COLUMNS = { # columns newer than the first schema, added to older cache files when opened
+    'proven': "INTEGER NOT NULL DEFAULT 0", # their 'Optimal' plans may be time-limited incumbents
+    'diagnosis': "TEXT",
+}
+
+
+def make_cache_key(nutrition_df, prices_series, intake_df, food_group_map,
+                   foods_to_exclude, foods_to_include, daily_diversity_target,
+                   nutrient_mode, variety_level, *, days_of_week=len(optimizer.DAYS_OF_WEEK), **model_options):
+    """
+    Returns a SHA-256 hex digest of the canonical optimization inputs.
+
+    Excluded foods are dropped before hashing (excluding a food is the same as not
+    having it), foods and nutrients are sorted, and numbers are rounded, so equal
+    problems hash equally regardless of row order or how the lists were built.
+    model_options are options that change the result (e.g. balance_formulation).
+    """
+    foods = sorted(f for f in nutrition_df.index if f not in set(foods_to_exclude))
+    columns = sorted(nutrition_df.columns)
+    nutrition = np.round(nutrition_df.loc[foods, columns].to_numpy(dtype=float), KEY_DECIMALS)
+    prices = np.round(prices_series.reindex(foods).fillna(optimizer.DEFAULT_PRICE_PER_GRAM).to_numpy(dtype=float), KEY_DECIMALS)
+    nutrients = sorted(intake_df.index)
+    bounds = np.round(intake_df.loc[nutrients, ['lower_bound', 'upper_bound']].to_numpy(dtype=float), KEY_DECIMALS)
+
+    canonical = {
+        'foods': foods,
+        'columns': columns,
+        'groups': [food_group_map.get(f) for f in foods],
+        'nutrients': nutrients,
+        'include': sorted(set(f for f in foods_to_include if f in foods)),
+        'daily_diversity_target': int(daily_diversity_target),
+        'nutrient_mode': nutrient_mode,
+        'variety_level': int(variety_level),
+        'options': {k: model_options[k] for k in sorted(model_options)},
+    }
+    if int(days_of_week) != len(optimizer.DAYS_OF_WEEK):
+        canonical['days_of_week'] = int(days_of_week) # only when set, so one-week keys stay valid
+    digest = hashlib.sha256(json.dumps(canonical, sort_keys=True, default=str).encode('utf-8'))
+    for array in (nutrition, prices, bounds):
+        # NaN bounds mean "unbounded"; give them (and -0.0) one fixed byte pattern.
+        digest.update(np.nan_to_num(array + 0.0, nan=np.inf).tobytes())
+    return digest.hexdigest()
+
+
+def key_options(model_options):
+    """The create_and_solve_model options that can change its result, for make_cache_key."""
+    options = {'balance_formulation': model_options.get('balance_formulation', 'bigm')}
+    for option in ('rolling', 'column_generation'):
+        if model_options.get(option):
+            options[option] = True
+    return options
+
+
+class PlanCache:
+    """
+    On-disk store of solved plans keyed by make_cache_key, with LRU eviction.
+
+    Backed by SQLite in WAL mode, so several Streamlit sessions (threads or processes)
+    can read and write the same file safely. Hit, miss and eviction counters are
+    persisted with the entries.
+
+    Entries are 'proven' (the solver proved the plan optimal, or the inputs infeasible)
+    or not (the best plan a time-limited solve had found). Unproven entries expire after
+    unproven_ttl seconds and give way to any proven or cheaper plan stored for their key.
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 unproven_ttl=UNPROVEN_TTL_SECONDS):
+        self.path = path or os.path.join(CACHE_DIR, CACHE_FILE_NAME)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.unproven_ttl = unproven_ttl
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._open()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(plans)")}
+            for column, definition in _ADDED_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE plans ADD COLUMN {column} {definition}")
+        finally:
+            conn.close()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _connect(self):
+        return _Transaction(self._open())
+
+    def get(self, key, proven_only=False):
+        """
+        Returns {'status', 'objective', 'plan' (a Plan), 'proven', 'diagnosis'} for a cached
+        key (and counts a hit), else None (a miss). diagnosis is what put_diagnosis stored,
+        or None. Expired unproven entries are dropped and miss; with proven_only, so do
+        unproven ones (see unproven_plan to still start from their plan).
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = self._current_row(conn, key, now)
+            if row is None or (proven_only and not row[3]):
+                conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'misses'")
+                return None
+            conn.execute("UPDATE plans SET last_access = ? WHERE key = ?", (now, key))
+            conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'hits'")
+        status, objective, plan, proven, _, diagnosis = row
+        return {'status': status, 'objective': objective, 'plan': Plan.from_json(plan), 'proven': bool(proven),
+                'diagnosis': json.loads(diagnosis) if diagnosis else None}
+
+    def unproven_plan(self, key):
+        """
+        The plan of the key's unexpired unproven entry, or None: a starting point for
+        solving it again after get(key, proven_only=True) missed. Counts neither a hit
+        nor a miss, since the plan is not served.
+        """
+        with self._connect() as conn:
+            row = self._current_row(conn, key, time.time())
+        if row is None or row[3]:
+            return None
+        return Plan.from_json(row[2]) or None
+
+    def _current_row(self, conn, key, now):
+        """The key's row (status, objective, plan, proven, created, diagnosis); drops it if it expired."""
+        row = conn.execute("SELECT status, objective, plan, proven, created, diagnosis FROM plans WHERE key = ?",
+                           (key,)).fetchone()
+        if row is not None and not row[3] and now - row[4] > self.unproven_ttl:
+            conn.execute("DELETE FROM plans WHERE key = ?", (key,))
+            return None
+        return row
+
+    def put(self, key, status, objective, plan, proven=True):
+        """
+        Stores a solved plan (a Plan or {day: {food: grams}}) and evicts least-recently-used
+        entries beyond the size limits. proven=False marks a plan not proven optimal; it
+        does not replace a proven entry, nor an unproven one that is at least as cheap.
+        Returns whether the plan was stored.
+        """
+        payload = Plan.from_dict(plan).to_json()
+        now = time.time()
+        with self._connect() as conn:
+            if not proven:
+                row = conn.execute("SELECT objective, proven, created FROM plans WHERE key = ?", (key,)).fetchone()
+                if row is not None and (row[1] or (now - row[2] <= self.unproven_ttl and row[0] is not None
+                                                   and (objective is None or row[0] <= objective))):
+                    return False
+            conn.execute(
+                "INSERT OR REPLACE INTO plans (key, status, objective, plan, proven, size_bytes, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, status, objective, payload, int(bool(proven)), len(payload), now, now)
+            )
+            self._evict(conn)
+        return True
+
+    def put_diagnosis(self, key, diagnosis):
+        """
+        Attaches a JSON-serializable diagnosis (e.g. why an 'Infeasible' entry has no plan,
+        see optimizer.diagnose_infeasibility) to a cached entry. Returns False if the key
+        is not cached; storing a new plan for the key drops its diagnosis.
+        """
+        payload = json.dumps(diagnosis)
+        with self._connect() as conn:
+            updated = conn.execute("UPDATE plans SET diagnosis = ?, size_bytes = ? + LENGTH(plan) WHERE key = ?",
+                                   (payload, len(payload), key)).rowcount
+            self._evict(conn)
+        return updated > 0
+
+    def _evict(self, conn):
+        entries, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM plans").fetchone()
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size_bytes FROM plans ORDER BY last_access ASC").fetchall():
+            if entries <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM plans WHERE key = ?", (key,))
+            entries, total_bytes, evicted = entries - 1, total_bytes - size, evicted + 1
+        if evicted:
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = 'evictions'", (evicted,))
+
+    def stats(self):
+        """Returns hit/miss/eviction counters plus the current entry count and size."""
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM plans").fetchone()
+        lookups = counters.get('hits', 0) + counters.get('misses', 0)
+        return {**counters, 'entries': entries, 'bytes': total_bytes,
+                'hit_rate': counters.get('hits', 0) / lookups if lookups else 0.0}
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM plans")
+            conn.execute("UPDATE counters SET value = 0")
+
+
+class _Transaction:
+    """Context manager running one IMMEDIATE transaction on a connection, then closing it."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.conn.close()
+        return False
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Returns the process-wide cache at CACHE_DIR, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PlanCache()
+        return _default_cache
+
+
+def solve_with_cache(nutrition_df, prices_series, intake_df, food_group_map,
+                     foods_to_exclude, foods_to_include, daily_diversity_target,
+                     days_of_week, nutrient_mode, variety_level, *, cache=None, model=None, **solve_kwargs):
+    """
+    Cache-aware front of optimizer.create_and_solve_model.
+
+    With model (an optimizer.WeeklyPlanModel built for the same catalog, diversity target
+    and variety level; one-week plans only), a cache miss updates and re-solves that model instead of building
+    a new one; only solver_name and warm_start_plan are then taken from solve_kwargs.
+
+    Returns (status, plan, objective, cache_hit): status is the LpStatus string and plan
+    the Plan. Only 'Optimal' and 'Infeasible' outcomes are stored, and only proven ones
+    are served: an unproven cached plan warm-starts the new solve instead.
+    """
+    cache = cache or get_default_cache()
+    options = key_options({'balance_formulation': model.balance_formulation} if model else solve_kwargs)
+    key = make_cache_key(nutrition_df, prices_series, intake_df, food_group_map,
+                         foods_to_exclude, foods_to_include, daily_diversity_target,
+                         nutrient_mode, variety_level, days_of_week=days_of_week, **options)
+    cached = cache.get(key, proven_only=True)
+    if cached is not None:
+        return cached['status'], cached['plan'] or None, cached['objective'], True
+    if not solve_kwargs.get('warm_start_plan'):
+        solve_kwargs['warm_start_plan'] = cache.unproven_plan(key)
+
+    if model is not None:
+        model.update(prices_series=prices_series, intake_df=intake_df,
+                     foods_to_exclude=foods_to_exclude, foods_to_include=foods_to_include)
+        prob, food_vars, days = model.solve(solver_name=solve_kwargs.get('solver_name'),
+                                            warm_start_plan=solve_kwargs.get('warm_start_plan'))
+    else:
+        prob, food_vars, days = optimizer.create_and_solve_model(
+            nutrition_df, prices_series, intake_df, food_group_map,
+            foods_to_exclude, foods_to_include, daily_diversity_target,
+            days_of_week, nutrient_mode, variety_level, **solve_kwargs
+        )
+    status = LpStatus[prob.status]
+    plan = optimizer.extract_plan(food_vars, days) if status in ('Optimal', 'Not Solved') else None
+    objective = value(prob.objective) if plan is not None else None
+    if status in CACHEABLE_STATUSES:
+        cache.put(key, status, objective, plan or {},
+                  proven=status == 'Infeasible' or prob.sol_status == LpSolutionOptimal)
+    return status, plan, objective, False
@@ -0,0 +1,164 @@
+# core/portfolio.py
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import time
+
+from pulp import LpStatus, LpSolutionOptimal, value
+
+from core import highs_backend, optimizer, solver_process
+
+logger = logging.getLogger(__name__)
+
+# Wins are appended here so that, over time, the most successful configurations are tried first.
+PORTFOLIO_LOG_FILE = os.environ.get(
+    'DIET_PLANNER_PORTFOLIO_LOG', os.path.join(os.path.dirname(__file__), '..', 'cache', 'portfolio_wins.jsonl')
+)
+RESULT_GRACE_SECONDS = 10 # extra wait past the deadline for solvers to write their incumbent
+
+# Each configuration names a PuLP solver, its keyword options and the model options to build with.
+CBC_CONFIGS = [
+    {'name': 'cbc-default', 'solver': 'PULP_CBC_CMD', 'solver_options': {}, 'model_options': {}},
+    {'name': 'cbc-compact-symmetry', 'solver': 'PULP_CBC_CMD', 'solver_options': {},
+     'model_options': {'balance_formulation': 'compact', 'symmetry_breaking': True}},
+    {'name': 'cbc-compact-seed', 'solver': 'PULP_CBC_CMD', 'solver_options': {'options': ['randomCbcSeed 7']},
+     'model_options': {'balance_formulation': 'compact', 'symmetry_breaking': True}},
+    {'name': 'cbc-compact-nocuts', 'solver': 'PULP_CBC_CMD', 'solver_options': {'cuts': False},
+     'model_options': {'balance_formulation': 'compact'}},
+]
+
+
+def default_portfolio():
+    """CBC variants plus every other available PuLP backend on the compact, symmetry-broken model."""
+    configs = [dict(config) for config in CBC_CONFIGS]
+    for solver in highs_backend.list_solvers(onlyAvailable=True):
+        if solver != 'PULP_CBC_CMD':
+            configs.append({'name': solver.lower(), 'solver': solver, 'solver_options': {},
+                            'model_options': {'balance_formulation': 'compact', 'symmetry_breaking': True}})
+    return rank_by_past_wins(configs)
+
+
+def read_win_counts(log_file=None):
+    """Returns {config name: number of wins} from the portfolio log."""
+    counts = {}
+    try:
+        with open(log_file or PORTFOLIO_LOG_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    name = json.loads(line)['winner']
+                except (ValueError, KeyError):
+                    continue
+                counts[name] = counts.get(name, 0) + 1
+    except FileNotFoundError:
+        pass
+    return counts
+
+
+def rank_by_past_wins(configs, log_file=None):
+    """Orders configurations by past wins (most first), keeping the given order for ties."""
+    counts = read_win_counts(log_file)
+    return sorted(configs, key=lambda config: -counts.get(config['name'], 0))
+
+
+def _log_win(record, log_file):
+    logger.info("Solver portfolio won by %s (%s, %.1f s)", record['winner'], record['reason'], record['seconds'])
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        logger.warning("Could not write the portfolio log: %s", e)
+
+
+def _run_config(config, model_args, model_kwargs, time_limit, threads, results):
+    """Worker process: builds and solves one configuration and reports the outcome."""
+    solver_process.own_process_group() # so cancelling also stops the solver subprocess
+    start = time.perf_counter()
+    try:
+        solver_options = dict(config['solver_options'])
+        if threads > 1:
+            solver_options.setdefault('threads', threads)
+        solver = highs_backend.get_solver(config['solver'], timeLimit=time_limit, msg=False, **solver_options)
+        prob, food_vars, days = optimizer.create_and_solve_model(
+            *model_args, **model_kwargs, **config['model_options'], solver_name=solver
+        )
+        status = LpStatus[prob.status]
+        has_solution = prob.objective is not None and value(prob.objective) is not None and status == 'Optimal'
+        results.put({
+            'name': config['name'], 'status': status,
+            'proven_optimal': has_solution and prob.sol_status == LpSolutionOptimal,
+            'objective': value(prob.objective) if has_solution else None,
+            'plan': optimizer.extract_plan(food_vars, days) if has_solution else None,
+            'seconds': time.perf_counter() - start,
+        })
+    except Exception as e:
+        results.put({'name': config['name'], 'status': 'Error', 'error': str(e), 'proven_optimal': False,
+                     'objective': None, 'plan': None, 'seconds': time.perf_counter() - start})
+
+
+def solve_portfolio(nutrition_df, prices_series, intake_df, food_group_map,
+                    foods_to_exclude, foods_to_include, daily_diversity_target,
+                    days_of_week, nutrient_mode, variety_level, *, configs=None,
+                    time_limit=180, log_file=None, **solve_kwargs):
+    """
+    Races several solver configurations in parallel subprocesses.
+
+    The first proven-optimal answer wins and the other runs are cancelled; if none
+    proves optimality by the deadline, the best incumbent wins. A proven infeasibility
+    also ends the race. The winner is logged.
+    Returns (status, plan, objective, winner) like plan_cache.solve_with_cache, where
+    winner is the winning configuration's name (None if no run found a plan).
+    """
+    configs = configs or default_portfolio()
+    log_file = log_file or PORTFOLIO_LOG_FILE
+    threads = max(1, (os.cpu_count() or 1) // len(configs))
+    model_args = (nutrition_df, prices_series, intake_df, food_group_map,
+                  foods_to_exclude, foods_to_include, daily_diversity_target,
+                  days_of_week, nutrient_mode, variety_level)
+
+    start = time.perf_counter()
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_run_config, daemon=True,
+                                args=(config, model_args, solve_kwargs, time_limit, threads, results))
+        for config in configs
+    ]
+    for process in processes:
+        process.start()
+
+    finished, winner, reason = [], None, None
+    deadline = start + time_limit + RESULT_GRACE_SECONDS
+    try:
+        while len(finished) < len(processes):
+            try:
+                result = results.get(timeout=max(0.1, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            finished.append(result)
+            if result['proven_optimal']:
+                winner, reason = result, 'proven optimal'
+                break
+            if result['status'] == 'Infeasible':
+                break # proven infeasible: no other configuration can do better
+    finally:
+        for process in processes:
+            solver_process.stop(process)
+
+    if winner is None:
+        with_plan = [r for r in finished if r['plan'] is not None]
+        if with_plan:
+            winner, reason = min(with_plan, key=lambda r: r['objective']), 'best incumbent'
+    seconds = time.perf_counter() - start
+
+    if winner is None:
+        statuses = {r['status'] for r in finished}
+        status = 'Infeasible' if 'Infeasible' in statuses else 'Not Solved'
+        logger.info("Solver portfolio found no plan (%s)", ", ".join(sorted(statuses)) or "no run finished")
+        return status, None, None, None
+
+    _log_win({'winner': winner['name'], 'reason': reason, 'objective': winner['objective'],
+              'seconds': seconds, 'variety_level': variety_level, 'timestamp': time.time(),
+              'finished': {r['name']: r['status'] for r in finished}}, log_file)
+    return winner['status'], winner['plan'], winner['objective'], winner['name']
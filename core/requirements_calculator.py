@@ -1,6 +1,8 @@
 # core/requirements_calculator.py
 import pandas as pd
 
+from core import tracing
+
 def get_pa_coefficient(gender, age, activity_level):
     """
     Returns the Physical Activity (PA) coefficient based on gender, age, and activity level.
@@ -54,6 +56,7 @@ def calculate_requirements_logic(gender, age, weight_kg, height_m, activity,
     protein_req = weight_kg * 0.8
     return eer, protein_req
 
+@tracing.traced('requirements')
 def calculate_full_nutrient_requirements(base_intake_df, gender, age, weight_kg, height_m, activity,
                                          is_pregnant=False, trimester=0,
                                          is_lactating=False, postpartum_period=0):
@@ -76,6 +79,7 @@ def calculate_full_nutrient_requirements(base_intake_df, gender, age, weight_kg,
         
     return personalized_reqs
 
+@tracing.traced('apply_goal')
 def apply_dietary_goal_adjustments(req_df, goal, weight_kg, boosted_nutrients=None):
     """
     Adjusts the nutrient requirements DataFrame based on a specific dietary goal.
@@ -0,0 +1,70 @@
+# core/solver_log.py
+import re
+
+# Summary block CBC prints once the search ends, e.g. "Lower bound:   6700720.404".
+_CBC_SUMMARY_PATTERNS = {
+    'objective': r"^Objective value:\s+(\S+)",
+    'best_bound': r"^Lower bound:\s+(\S+)",
+    'gap': r"^Gap:\s+(\S+)",
+    'nodes': r"^Enumerated nodes:\s+(\d+)",
+    'seconds': r"^Time \(Wallclock seconds\):\s+(\S+)",
+}
+
+# Lines CBC prints while the search runs, e.g.
+# "Cbc0012I Integer solution of 12978542 found by RINS after 13325 iterations and 91 nodes (18.29 seconds)"
+# "Cbc0010I After 100 nodes, 56 on tree, 12978542 best solution, best possible 9239612.9 (18.85 seconds)"
+_CBC_INCUMBENT_PATTERNS = (r"Integer solution of (\S+) found", r"After \d+ nodes, .*?, (\S+) best solution")
+_CBC_BOUND_PATTERNS = (r"^Continuous objective value is (\S+)", r"At root node, .* to (\S+)",
+                       r"best possible (\S+?)[ ,)]")
+_CBC_NO_VALUE = 1e50 # what CBC prints as the incumbent before it has one
+
+
+def parse_cbc_log(text):
+    """
+    Extracts the end-of-search summary from a CBC log.
+
+    Returns a dict with 'result' (e.g. "Optimal solution found", "Stopped on time limit"),
+    'objective', 'best_bound', 'gap' (relative, as CBC reports it), 'nodes' and 'seconds'.
+    Values that are not in the log are None; a proven optimum has a gap of 0.
+    """
+    summary = {'result': None, 'objective': None, 'best_bound': None, 'gap': None, 'nodes': None, 'seconds': None}
+    result_match = re.search(r"^Result - (.+)$", text, re.MULTILINE)
+    if result_match:
+        summary['result'] = result_match.group(1).strip()
+    for key, pattern in _CBC_SUMMARY_PATTERNS.items():
+        match = re.search(pattern, text, re.MULTILINE)
+        if match:
+            summary[key] = int(match.group(1)) if key == 'nodes' else float(match.group(1))
+
+    if summary['result'] == "Optimal solution found" and summary['objective'] is not None:
+        summary['best_bound'] = summary['objective'] if summary['best_bound'] is None else summary['best_bound']
+        summary['gap'] = 0.0 if summary['gap'] is None else summary['gap']
+    return summary
+
+
+def parse_cbc_progress(text):
+    """
+    Extracts the search state from a CBC log that may still be being written.
+
+    Returns a dict with 'objective' (the cheapest plan found so far) and 'best_bound'
+    (the strongest lower bound proved so far; the plan models minimize), each None until CBC has logged one. CBC only
+    writes its log in blocks, so these trail the live search by a few lines.
+    """
+    progress = {'objective': None, 'best_bound': None}
+    incumbents = [float(v) for pattern in _CBC_INCUMBENT_PATTERNS for v in re.findall(pattern, text, re.MULTILINE)]
+    incumbents = [v for v in incumbents if abs(v) < _CBC_NO_VALUE]
+    bounds = [float(v) for pattern in _CBC_BOUND_PATTERNS for v in re.findall(pattern, text, re.MULTILINE)]
+    if incumbents:
+        progress['objective'] = min(incumbents)
+    if bounds:
+        progress['best_bound'] = max(bounds)
+    return progress
+
+
+def read_cbc_log(path):
+    """Parses a CBC log file written through the solver's logPath option."""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return parse_cbc_log(f.read())
+    except FileNotFoundError:
+        return parse_cbc_log("")
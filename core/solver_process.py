@@ -0,0 +1,39 @@
+# core/solver_process.py
+"""
+Stopping solves that run in child processes (core/portfolio.py, core/anytime.py).
+
+PuLP's command-line solvers run as subprocesses of the process that solves the model,
+so signalling that process alone would leave the solver running. Each solve process
+therefore calls own_process_group() first, and signal_group / stop reach the solver
+along with it. Where process groups do not exist (Windows), only SIGTERM is passed on,
+as Process.terminate().
+"""
+import os
+import signal
+
+
+def own_process_group():
+    """Called at the start of a solve process: makes it lead a process group of its own."""
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+
+
+def signal_group(process, signum):
+    """Sends signum to the process's group (the solve process and its solver)."""
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signum)
+        elif signum == signal.SIGTERM:
+            process.terminate()
+    except ProcessLookupError:
+        pass
+
+
+def stop(process):
+    """Terminates the process's group, waiting briefly before killing the process outright."""
+    if not process.is_alive():
+        return
+    signal_group(process, signal.SIGTERM)
+    process.join(timeout=5)
+    if process.is_alive():
+        process.kill()
@@ -0,0 +1,272 @@
+# core/tracing.py
+"""
+Lightweight phase tracing for plan generation.
+
+A trace is started around a unit of work (a Step 3 page run, a background plan job,
+a benchmark) with start_trace; code anywhere below it marks its phases with span(),
+and solves add their solver statistics with record_solver_stats. Without an active
+trace both are no-ops, so the instrumented core functions cost nothing elsewhere.
+
+Finished traces are appended as JSON lines to TRACE_LOG_FILE (only those marked with
+keep(), for traces started with log=False). Once the file reaches TRACE_LOG_MAX_BYTES
+it is moved to TRACE_LOG_FILE + '.1' (replacing the older one) and a new file is
+started. Query them from the command line:
+
+Usage: python -m core.tracing [--last N] [--name NAME] [--job JOB_ID] [--log FILE] [--summary]
+"""
+import argparse
+import collections
+import contextlib
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+import uuid
+
+from pulp import LpStatus
+
+from core import solver_log
+
+logger = logging.getLogger(__name__)
+
+# Appended to by every kept trace; read back by the CLI below and the app's sidebar panel.
+TRACE_LOG_FILE = os.environ.get(
+    'DIET_PLANNER_TRACE_LOG', os.path.join(os.path.dirname(__file__), '..', 'cache', 'traces.jsonl')
+)
+TRACE_LOG_MAX_BYTES = int(os.environ.get('DIET_PLANNER_TRACE_LOG_MAX_BYTES', 16 * 1024 * 1024))
+RECENT_TRACE_BYTES = 1024 * 1024 # how far back from the end of the log the app looks for a request's traces
+_READ_BLOCK_BYTES = 64 * 1024
+
+_current = contextvars.ContextVar('trace', default=None)
+_write_lock = threading.Lock()
+
+
+class Trace:
+    """One traced unit of work: its spans (in finishing order) and solver statistics."""
+
+    def __init__(self, name, **attrs):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.attrs = attrs
+        self.started = time.time()
+        self.seconds = None
+        self.spans = []
+        self.solves = []
+        self.kept = False
+        self._start = time.perf_counter()
+
+    def add_span(self, name, seconds, **attrs):
+        self.spans.append({'name': name, 'seconds': seconds, 'offset': time.perf_counter() - self._start - seconds, **attrs})
+
+    def to_dict(self):
+        return {'trace_id': self.trace_id, 'name': self.name, 'started': self.started, 'seconds': self.seconds,
+                **self.attrs, 'spans': self.spans, 'solves': self.solves}
+
+
+def current_trace():
+    """The active trace, or None."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def start_trace(name, *, log=True, log_file=None, **attrs):
+    """
+    Runs the block under a new trace and yields it. On exit the trace gets its total
+    seconds (and 'error' if the block raised) and is appended to the log if log is
+    True or keep() was called.
+    """
+    trace = Trace(name, **attrs)
+    token = _current.set(trace)
+    try:
+        yield trace
+    except Exception as e:
+        trace.attrs['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        trace.seconds = time.perf_counter() - trace._start
+        if log or trace.kept:
+            write_trace(trace.to_dict(), log_file)
+
+
+@contextlib.contextmanager
+def span(name, **attrs):
+    """Times the block as a span of the active trace (a no-op without one)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, time.perf_counter() - start, **attrs)
+
+
+def traced(name):
+    """Decorator: runs every call of the function as span(name)."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def keep(**attrs):
+    """Marks the active trace for the log and adds attributes to it; returns its id (None without one)."""
+    trace = _current.get()
+    if trace is None:
+        return None
+    trace.kept = True
+    trace.attrs.update(attrs)
+    return trace.trace_id
+
+
+def record_solver_stats(prob, seconds=None, log_path=None, **attrs):
+    """
+    Adds a solve to the active trace: model size (rows, columns, integer columns,
+    nonzeros), status, objective and, from a CBC log, nodes, best bound and final gap.
+    Returns the stats, or None without an active trace.
+    """
+    trace = _current.get()
+    if trace is None:
+        return None
+    status = LpStatus[prob.status]
+    log = solver_log.read_cbc_log(log_path) if log_path else {'best_bound': getattr(prob, 'best_bound', None)}
+    stats = {
+        'rows': len(prob.constraints), 'columns': prob.numVariables(),
+        'integer_columns': sum(1 for v in prob.variables() if v.cat == 'Integer'),
+        'nonzeros': sum(len(c) for c in prob.constraints.values()),
+        'status': status, 'objective': prob.objective.value() if status == 'Optimal' and prob.objective is not None else None,
+        'seconds': seconds, 'nodes': log.get('nodes'), 'best_bound': log.get('best_bound'), 'gap': log.get('gap'), **attrs,
+    }
+    trace.solves.append(stats)
+    return stats
+
+
+def write_trace(record, log_file=None):
+    log_file = log_file or TRACE_LOG_FILE
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        with _write_lock:
+            if os.path.exists(log_file) and os.path.getsize(log_file) >= TRACE_LOG_MAX_BYTES:
+                os.replace(log_file, log_file + '.1')
+            with open(log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, default=str) + "\n")
+    except OSError as e:
+        logger.warning("Could not write the trace log: %s", e)
+
+
+def read_traces(log_file=None, last=None, name=None, job_id=None, trace_id=None, max_bytes=None):
+    """
+    Returns logged traces (the rotated file's too), oldest first, optionally only the
+    last N matching name / job_id / trace_id. With last, the log is read backwards from
+    its end and only as far as needed, or at most max_bytes of it.
+    """
+    log_file = log_file or TRACE_LOG_FILE
+    wanted = [(field, value) for field, value in (('name', name), ('job_id', job_id), ('trace_id', trace_id))
+              if value is not None]
+    needles = [json.dumps(value).encode('utf-8') for _, value in wanted] # cheap test before parsing a line
+
+    def matching(lines):
+        for line in lines:
+            if not all(needle in line for needle in needles):
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if all(record.get(field) == value for field, value in wanted):
+                yield record
+
+    files = [log_file + '.1', log_file]
+    if last is None:
+        return [record for path in files for record in matching(_lines(path))]
+    newest_first = matching(line for path in reversed(files) for line in _lines_from_end(path, max_bytes))
+    return list(reversed(list(itertools.islice(newest_first, last))))
+
+
+def _lines(path):
+    try:
+        with open(path, 'rb') as f:
+            yield from f
+    except FileNotFoundError:
+        return
+
+
+def _lines_from_end(path, max_bytes=None):
+    """Yields the lines of a file last line first, reading it backwards in blocks (at most max_bytes of it)."""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        position = f.seek(0, os.SEEK_END)
+        stop = 0 if max_bytes is None else max(0, position - max_bytes)
+        tail = b''
+        while position > stop:
+            size = min(_READ_BLOCK_BYTES, position - stop)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + tail).split(b'\n')
+            tail = lines.pop(0) # may continue in the block before
+            yield from (line for line in reversed(lines) if line)
+        if tail and position == 0:
+            yield tail
+
+
+def print_trace(record):
+    from benchmarks.common import fmt # not at the top: benchmarks.common imports modules that import this one
+    started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record['started']))
+    extras = ", ".join(f"{k}={v}" for k, v in record.items()
+                       if k not in ('trace_id', 'name', 'started', 'seconds', 'spans', 'solves'))
+    print(f"{started}  {record['name']}  {record['trace_id']}  {fmt(record['seconds'], '.2f')} s" + (f"  ({extras})" if extras else ""))
+    for s in record['spans']:
+        print(f"    {s['name']:<28} {s['seconds']:>9.3f} s")
+    for s in record['solves']:
+        print(f"    solve: {s['rows']} rows, {s['columns']} columns ({s['integer_columns']} integer), {s['nonzeros']} nonzeros, "
+              f"{s['status']}, objective {fmt(s['objective'], ',.0f')}, nodes {fmt(s['nodes'], 'd')}, "
+              f"gap {fmt(s['gap'], '.2%')}, {fmt(s['seconds'], '.1f')} s")
+
+
+def print_summary(records):
+    """Per span name: count, mean, median and max seconds over the given traces."""
+    durations = collections.defaultdict(list)
+    for record in records:
+        for s in record['spans']:
+            durations[s['name']].append(s['seconds'])
+    print(f"{'span':<28} {'count':>6} {'mean (s)':>9} {'median (s)':>10} {'max (s)':>8}")
+    for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        print(f"{name:<28} {len(values):>6} {statistics.mean(values):>9.3f} {statistics.median(values):>10.3f} {max(values):>8.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--last', type=int, default=10, help="Show the last N matching traces.")
+    parser.add_argument('--name', help="Only traces of this name, e.g. 'Page run' or 'Plan job'.")
+    parser.add_argument('--job', help="Only traces of this background job id.")
+    parser.add_argument('--log', help="Trace log file (default: DIET_PLANNER_TRACE_LOG or cache/traces.jsonl).")
+    parser.add_argument('--summary', action='store_true', help="Aggregate span times instead of listing traces.")
+    args = parser.parse_args(argv)
+
+    records = read_traces(args.log, last=args.last, name=args.name, job_id=args.job)
+    if not records:
+        print("No traces found.")
+    elif args.summary:
+        print_summary(records)
+    else:
+        for record in records:
+            print_trace(record)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,150 @@ import streamlit as st
 import pandas as pd
 from . import ui_utils
 
+REFRESH_SECONDS = 1
+PLAN_LENGTHS = {7: "1 week", 14: "2 weeks", 28: "4 weeks"}
+
+RELAXATION_LABELS = [ # (row prefix, description, whether the rule counts items rather than amounts)
+    ('Daily_Min_', "Minimum daily {}", False),
+    ('Daily_Max_', "Maximum daily {}", False),
+    ('Calorie_Dist_', "Share of calories from {}", False),
+    ('Macro_Min_', "Minimum share of calories from {}", False),
+    ('Macro_Max_', "Maximum share of calories from {}", False),
+    ('Min_Variety_', "Different {} per day", True),
+    ('LinkNumItemsToK_', "Different {} per day", True),
+    ('Force_Include_', "Always include {}", True),
+]
+
+def _describe_relaxations(relaxations):
+    """Groups elastic relaxations by rule (worst day first) into rows for display."""
+    rows = {}
+    for r in relaxations:
+        prefix, label, counts_items = next(entry for entry in RELAXATION_LABELS if r['rule'].startswith(entry[0]))
+        subject = r['rule'][len(prefix):].removesuffix('_Weekly')
+        rule = label.format(ui_utils._format_name(subject))
+        row = rows.setdefault(rule, {'days': set(), 'share': 0.0, 'counts_items': counts_items})
+        row['days'].add(r['constraint'][len(r['rule']):])
+        row['share'] = max(row['share'], r['share'])
+    return pd.DataFrame([
+        {'Rule': rule, 'Days affected': len(row['days']),
+         'Largest change': f"{row['share']:.0f} item(s)" if row['counts_items'] else f"{row['share']:.0%}"}
+        for rule, row in sorted(rows.items(), key=lambda item: (not item[1]['counts_items'], -item[1]['share']))
+    ])
+
+def _finish_plan(status, solution, plan_preference, model_inputs, preview_key, plan_key, diagnosis=None):
+    """
+    Stores a finished plan and moves on to Step 4, or records why there is none and reruns
+    the page. diagnosis is an infeasible plan's cached diagnosis (see _run_diagnosis).
+    """
+    if status in ('Optimal', 'Not Solved') and solution:
+        st.session_state.plan_results = solution
+        st.session_state.plan_source = f"{plan_preference} Plan"
+        # The rules the plan was made for, so Step 4 can audit the rounded amounts against them.
+        st.session_state.plan_rules = {k: model_inputs[k] for k in ('nutrition_df', 'intake_df', 'food_group_map')}
+        st.session_state.scroll_to_top = True
+        ui_utils.go_to_page("Step 4: View Plan & Generate Prompts")
+    else:
+        st.session_state.plan_results = None
+        st.session_state.plan_error = {'key': preview_key, 'message': "Could not find an optimal solution. The constraints might be too strict. Try a lower variety level or adjust your food selections.",
+                                       'plan_key': plan_key if status == 'Infeasible' else None}
+        if diagnosis:
+            st.session_state.plan_diagnosis = {'key': preview_key, **diagnosis}
+    st.rerun()
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def _show_job_progress(running, plan_preference, plan_cache, jobs, model_inputs, preview_key):
+    """Live view of a background plan job: best plan so far, its cost, the bound and accept/cancel buttons."""
+    manager = jobs.get_default_manager()
+    progress = manager.status(running['job_id'])
+    if progress is None: # the job expired from the manager, e.g. after a long absence
+        st.session_state.plan_job = None
+        st.rerun()
+
+    st.markdown(f"#### 🧠 Optimizing for {plan_preference.upper()}...")
+    if progress['queue_position'] is not None:
+        load = manager.metrics()
+        st.info(f"⏳ Waiting for a free solver: position {progress['queue_position']} of {load['queue_depth']} in the queue "
+                f"(typical wait ≈ {load['mean_wait']:.0f} s).")
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Elapsed", f"{progress['elapsed']:.0f} s / {progress['time_limit']} s" if progress['state'] != 'Queued' else "queued")
+    m2.metric("Best plan cost", f"≈ {int(round(progress['objective'], -4)):,.0f} IRR" if progress['objective'] is not None else "searching...")
+    m3.metric("Cost floor", f"≈ {int(round(progress['best_bound'], -4)):,.0f} IRR" if progress['best_bound'] is not None else "—")
+    m4.metric("Max. possible saving", f"{progress['gap']:.1%}" if progress['gap'] is not None else "—")
+    st.progress(min(progress['elapsed'] / progress['time_limit'], 1.0))
+    st.caption(running.setdefault('fact', ui_utils.get_random_food_fact()))
+
+    if progress['plan'] and not progress['done']: # only streamed by HiGHS; with CBC the plan comes at the end
+        with st.expander("Best plan so far (grams per day)"):
+            plan_df = progress['plan'].to_frame().round(0)
+            plan_df.index = [ui_utils._format_name(f) for f in plan_df.index]
+            st.dataframe(plan_df, use_container_width=True)
+
+    b1, b2 = st.columns(2)
+    if b1.button("✅ Use this plan now", disabled=progress['objective'] is None or progress['done'], use_container_width=True,
+                 help="Stop searching and keep the best plan found so far."):
+        manager.accept(running['job_id'])
+        progress = manager.status(running['job_id'])
+    if b2.button("✖️ Cancel", disabled=progress['done'], use_container_width=True):
+        manager.cancel(running['job_id'])
+        st.session_state.plan_job = None
+        st.rerun()
+    if not progress['done']:
+        return
+
+    st.session_state.plan_job = None
+    if progress['state'] in plan_cache.CACHEABLE_STATUSES:
+        # Plans cut short by the time limit or "Use this plan now" are kept as unproven: they
+        # expire, and the next Generate re-solves from them instead of serving them as final.
+        plan_cache.get_default_cache().put(running['plan_key'], progress['state'], progress['objective'], progress['plan'] or {},
+                                           proven=progress['state'] == 'Infeasible' or progress['proven_optimal'])
+    if progress['state'] in ('Error', 'Cancelled'):
+        if progress['state'] == 'Error':
+            st.session_state.plan_error = {'key': preview_key, 'message': f"An optimization error occurred: {progress['error']}"}
+        st.rerun()
+    _finish_plan(progress['state'], progress['plan'], plan_preference, model_inputs, preview_key, running['plan_key'])
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def _show_frontier(run, level_labels):
+    """Cost and variety of every level's plan, filled in as the background run finishes each level."""
+    levels = run.progress()
+    if run.error:
+        st.error(f"The comparison failed: {run.error}")
+    elif not run.done():
+        st.caption(f"⏳ Planning every variety level in the background ({len(levels)} of 5 done)...")
+        queued = [w for w in run.waiting() if w['queue_position'] is not None]
+        if queued:
+            st.info("⏳ Waiting for a free solver: " + ", ".join(
+                f"{level_labels[w['level']]} is at position {w['queue_position']}" for w in queued
+            ) + f" of {run.manager.metrics()['queue_depth']} in the queue.")
+    if not levels:
+        return
+    frontier_df = pd.DataFrame([{
+        'Level': f"{r['level']} ({level_labels[r['level']]})",
+        'Plan cost (IRR)': f"≈ {int(round(r['objective'], -4)):,.0f}" if r['objective'] is not None else r['status'],
+        'Different foods': r['unique_foods'] if r['unique_foods'] is not None else "—",
+    } for r in levels])
+    st.dataframe(frontier_df, hide_index=True, use_container_width=True)
+    chart_df = pd.DataFrame([{'Different foods': r['unique_foods'], 'Cost (IRR)': r['objective']} for r in levels if r['objective'] is not None])
+    if len(chart_df) > 1:
+        st.scatter_chart(chart_df, x='Different foods', y='Cost (IRR)')
+    if run.done():
+        choices = [r['level'] for r in levels if r['plan'] and r['level'] != st.session_state.variety_cost_level]
+        cols = st.columns(max(len(choices), 1))
+        for col, level in zip(cols, choices):
+            if col.button(f"Switch to {level_labels[level]}", key=f"frontier_switch_{level}", use_container_width=True):
+                st.session_state.variety_cost_level = level
+                st.rerun(scope='app')
+
+def _run_diagnosis(optimizer, model_inputs, solver, preview_key, cache=None, plan_key=None):
+    """Runs the elastic diagnosis (up to 30 s) and keeps it, also with the infeasible plan_key entry of cache if given."""
+    status, relaxations = optimizer.diagnose_infeasibility(**model_inputs, solver_name=solver, symmetry_breaking=True)
+    st.session_state.plan_diagnosis = {'key': preview_key, 'status': status, 'relaxations': relaxations}
+    if cache is not None and plan_key:
+        cache.put_diagnosis(plan_key, {'status': status, 'relaxations': relaxations})
+
 def display_customize_plan_details_page(
     NUTRITION_DATA, PRICES, FOOD_GROUPS_MAP, COFFEE_DATA, 
-    requirements_calculator, optimizer, LpStatus, listSolvers, getSolver
+    requirements_calculator, optimizer, LpStatus, listSolvers, getSolver, plan_cache, jobs, frontier, tracing
 ):
     """Renders the UI for Step 3: Customizing Plan Details and Generating Plan."""
     st.header("Step 3: Customize Plan Details", divider='rainbow')
@@ -30,16 +171,17 @@ def display_customize_plan_details_page(
         st.error(f"Could not apply dietary goal: {e}")
         reqs_with_goal = st.session_state.nutrient_reqs
 
-    nutrition_df_for_optimizer = NUTRITION_DATA.copy()
-    prices_for_optimizer = PRICES.copy()
-    food_groups_for_optimizer = FOOD_GROUPS_MAP.copy()
-    
-    if st.session_state.custom_foods:
-        custom_nut_df = pd.DataFrame([f['nutrients'] for f in st.session_state.custom_foods], index=[f['name'] for f in st.session_state.custom_foods])
-        nutrition_df_for_optimizer = pd.concat([nutrition_df_for_optimizer, custom_nut_df])
-        for food in st.session_state.custom_foods:
-            prices_for_optimizer[food['name']] = food['price_per_gram']
-            food_groups_for_optimizer[food['name']] = food['group']
+    with tracing.span('copy_inputs'):
+        nutrition_df_for_optimizer = NUTRITION_DATA.copy()
+        prices_for_optimizer = PRICES.copy()
+        food_groups_for_optimizer = FOOD_GROUPS_MAP.copy()
+
+        if st.session_state.custom_foods:
+            custom_nut_df = pd.DataFrame([f['nutrients'] for f in st.session_state.custom_foods], index=[f['name'] for f in st.session_state.custom_foods])
+            nutrition_df_for_optimizer = pd.concat([nutrition_df_for_optimizer, custom_nut_df])
+            for food in st.session_state.custom_foods:
+                prices_for_optimizer[food['name']] = food['price_per_gram']
+                food_groups_for_optimizer[food['name']] = food['group']
     all_foods_for_optimizer = sorted(nutrition_df_for_optimizer.index.tolist())
 
     drinks_coffee_key = f"drinks_coffee_{st.session_state.variety_cost_level}"
@@ -59,7 +201,7 @@ def display_customize_plan_details_page(
         with st.expander("How does this work?"):
             st.caption(
                 "Use these lists to guide the optimizer. This is useful for including favorite foods or excluding allergens and dislikes.\n\n"
-                "- **Always Include:** The optimizer will be forced to use at least some amount of every food on this list in the weekly plan.\n\n"
+                "- **Always Include:** The optimizer will be forced to use at least some amount of every food on this list in every week of the plan.\n\n"
                 "- **Always Exclude:** The optimizer will be forbidden from using any food on this list."
             )
         
@@ -93,7 +235,63 @@ def display_customize_plan_details_page(
 
     food_selection_ui(key_prefix=st.session_state.variety_cost_level)
 
+    intake_reqs_for_optimizer = reqs_with_goal.copy()
+    if COFFEE_DATA is not None and st.session_state.get(drinks_coffee_key) == "Yes":
+        coffee_nutrients = COFFEE_DATA.loc[st.session_state[coffee_type_key]]
+        nutrient_map = {'calories': 'calorie', 'potassium_mg': 'potassium', 'niacin_mg': 'niacin'}
+        for coffee_col, intake_col in nutrient_map.items():
+            if intake_col in intake_reqs_for_optimizer.index and coffee_col in coffee_nutrients.index:
+                total_from_coffee = coffee_nutrients[coffee_col] * st.session_state[cups_per_day_key]
+                intake_reqs_for_optimizer.loc[intake_col, 'lower_bound'] -= total_from_coffee
+        intake_reqs_for_optimizer['lower_bound'] = intake_reqs_for_optimizer['lower_bound'].clip(lower=0)
+
+    effective_prices = prices_for_optimizer.copy()
+    if st.session_state.custom_prices:
+        for food, price in st.session_state.custom_prices.items():
+            if food in effective_prices.index: effective_prices.loc[food] = price
+
+    effective_exclude_list = optimizer.apply_goal_exclusions(
+        st.session_state.exclude_list, st.session_state.dietary_goal_selected
+    )
+    plan_days = st.radio("Plan length", options=list(PLAN_LENGTHS), format_func=PLAN_LENGTHS.get, key='plan_days', horizontal=True,
+                         help="Longer plans keep the repetition limits over every 7 days in a row and are solved a few weeks at a time.")
+    # Long plans are solved a few weeks at a time; very large catalogs from a priced-in subset of foods.
+    if plan_days > optimizer.ROLLING_WINDOW_DAYS:
+        scale_options = {'rolling': True}
+    elif len(nutrition_df_for_optimizer) > optimizer.COLUMN_GENERATION_MIN_FOODS:
+        scale_options = {'column_generation': True}
+    else:
+        scale_options = {}
+    model_inputs = dict(
+        nutrition_df=nutrition_df_for_optimizer, prices_series=effective_prices, intake_df=intake_reqs_for_optimizer, food_group_map=food_groups_for_optimizer,
+        foods_to_exclude=effective_exclude_list,
+        foods_to_include=st.session_state.include_list,
+        daily_diversity_target=st.session_state.user_data['num_meals'] + st.session_state.user_data['num_snacks'],
+        days_of_week=plan_days, nutrient_mode='daily',
+        variety_level=st.session_state.variety_cost_level
+    )
+
+    # --- Live preview: the LP relaxation answers in a fraction of a second, so it runs on every edit ---
+    preview_key = plan_cache.make_cache_key(**model_inputs)
+    if st.session_state.get('plan_preview_key') != preview_key:
+        try:
+            st.session_state.plan_preview = optimizer.preview_plan(
+                **model_inputs, solver_name=getSolver(listSolvers(onlyAvailable=True)[0])
+            )
+        except Exception as e:
+            st.session_state.plan_preview = {'status': 'Error', 'lower_bound': None, 'reason': str(e), 'seconds': 0}
+        st.session_state.plan_preview_key = preview_key
+    preview = st.session_state.plan_preview
+    preview_infeasible = preview['status'] == 'Infeasible'
+
     st.markdown("---")
+    if preview_infeasible:
+        st.error(f"**No plan is possible with these settings.** {preview['reason']} Try a lower variety level or adjust your food selections.")
+        if st.button("🔍 Find out which rules block the plan (up to 30 seconds)"):
+            with st.spinner("Looking for the smallest changes that make a plan possible..."):
+                _run_diagnosis(optimizer, model_inputs, getSolver(listSolvers(onlyAvailable=True)[0]), preview_key)
+    elif preview['lower_bound'] is not None:
+        st.info(f"**Preview:** a plan looks possible. Estimated cost for {PLAN_LENGTHS[plan_days]}: at least ≈ {int(round(preview['lower_bound'], -4)):,.0f} IRR.")
     
     col1, col2 = st.columns(2)
     with col1:
@@ -101,59 +299,75 @@ def display_customize_plan_details_page(
         
     with col2:
         generate_button_label = f"Generate {plan_preference} Plan"
-        if st.button(generate_button_label, type="primary", use_container_width=True):
-            # --- UPDATED: Display multiple facts in a styled box inside the spinner ---
-            facts = [ui_utils.get_random_food_fact() for _ in range(34)]
-            fact_markdown = "#### 🧠 Did You Know?\n" + "\n".join([f"- *{fact}*" for fact in facts])
-            
-            with st.spinner(f"🧠 Optimizing for {plan_preference.upper()}... This may take up to 3 minutes."):
-                st.info(fact_markdown)
-                try:
-                    intake_reqs_for_optimizer = reqs_with_goal.copy()
-
-                    if COFFEE_DATA is not None and st.session_state.get(drinks_coffee_key) == "Yes":
-                        coffee_nutrients = COFFEE_DATA.loc[st.session_state[coffee_type_key]]
-                        nutrient_map = {'calories': 'calorie', 'potassium_mg': 'potassium', 'niacin_mg': 'niacin'}
-                        for coffee_col, intake_col in nutrient_map.items():
-                            if intake_col in intake_reqs_for_optimizer.index and coffee_col in coffee_nutrients.index:
-                                total_from_coffee = coffee_nutrients[coffee_col] * st.session_state[cups_per_day_key]
-                                intake_reqs_for_optimizer.loc[intake_col, 'lower_bound'] -= total_from_coffee
-                        intake_reqs_for_optimizer['lower_bound'] = intake_reqs_for_optimizer['lower_bound'].clip(lower=0)
-                    
-                    effective_prices = prices_for_optimizer.copy()
-                    if st.session_state.custom_prices:
-                        for food, price in st.session_state.custom_prices.items():
-                            if food in effective_prices.index: effective_prices.loc[food] = price
-                    
-                    effective_exclude_list = st.session_state.exclude_list.copy()
-                    if st.session_state.dietary_goal_selected == "Heart Health (Low Cholesterol)":
-                        other_oils = ['canolla_oil', 'corn_oil', 'sunseed_oil']
-                        for oil in other_oils:
-                            if oil not in effective_exclude_list:
-                                effective_exclude_list.append(oil)
-
-                    prob, gram_vars, days = optimizer.create_and_solve_model(
-                        nutrition_df=nutrition_df_for_optimizer, prices_series=effective_prices, intake_df=intake_reqs_for_optimizer, food_group_map=food_groups_for_optimizer,
-                        foods_to_exclude=effective_exclude_list, 
-                        foods_to_include=st.session_state.include_list,
-                        daily_diversity_target=st.session_state.user_data['num_meals'] + st.session_state.user_data['num_snacks'],
-                        days_of_week=7, nutrient_mode='daily', 
-                        variety_level=st.session_state.variety_cost_level,
-                        solver_name=getSolver(listSolvers(onlyAvailable=True)[0], timeLimit=180)
+        if st.button(generate_button_label, type="primary", use_container_width=True, disabled=preview_infeasible):
+            try:
+                plan_key = plan_cache.make_cache_key(
+                    **model_inputs, **plan_cache.key_options(dict(balance_formulation='compact', **scale_options))
+                )
+                st.session_state.plan_error = None
+                with tracing.span('cache_lookup'):
+                    cached = plan_cache.get_default_cache().get(plan_key, proven_only=True)
+                cache_hit = cached is not None
+                trace_id = tracing.keep(cache_hit=cache_hit, variety_level=st.session_state.variety_cost_level, days=plan_days)
+                st.session_state.last_trace = {'trace_id': trace_id, 'job_id': None}
+                if cache_hit:
+                    _finish_plan(cached['status'], cached['plan'] or None, plan_preference, model_inputs, preview_key, plan_key,
+                                 cached['diagnosis'])
+                else:
+                    # An unproven cached plan is not served as final, but the new solve starts from it.
+                    job_id = jobs.get_default_manager().submit(
+                        **model_inputs, time_limit=180, solver_name=listSolvers(onlyAvailable=True)[0],
+                        warm_start_plan=plan_cache.get_default_cache().unproven_plan(plan_key) or st.session_state.plan_results,
+                        balance_formulation='compact', symmetry_breaking=True, **scale_options
                     )
+                    st.session_state.plan_job = {'key': preview_key, 'plan_key': plan_key, 'job_id': job_id}
+                    tracing.keep(job_id=job_id)
+                    st.session_state.last_trace['job_id'] = job_id
+            except jobs.SchedulerBusy as e:
+                st.warning(str(e))
+            except Exception as e:
+                st.error(f"An optimization error occurred: {e}")
+
+    running = st.session_state.get('plan_job')
+    if running and running['key'] != preview_key:
+        # The inputs changed under a running job; its plan would no longer match them.
+        jobs.get_default_manager().cancel(running['job_id'])
+        st.session_state.plan_job = running = None
+    if running:
+        _show_job_progress(running, plan_preference, plan_cache, jobs, model_inputs, preview_key)
+
+    diagnosis = st.session_state.get('plan_diagnosis')
+    plan_error = st.session_state.get('plan_error')
+    if plan_error and plan_error['key'] == preview_key and not running:
+        st.error(plan_error['message'])
+        if plan_error.get('plan_key') and not (diagnosis and diagnosis['key'] == preview_key):
+            if st.button("🔍 Find out which rules block the plan (up to 30 seconds)", key='diagnose_plan'):
+                with st.spinner("Looking for the smallest changes that make a plan possible..."):
+                    _run_diagnosis(optimizer, model_inputs, getSolver(listSolvers(onlyAvailable=True)[0]), preview_key,
+                                   plan_cache.get_default_cache(), plan_error['plan_key'])
+                diagnosis = st.session_state.plan_diagnosis
+
+    if diagnosis and diagnosis['key'] == preview_key:
+        if diagnosis['relaxations']:
+            st.warning("A plan becomes possible if these rules are relaxed (largest change on any day). "
+                       "Consider removing foods from your include list, excluding fewer foods, choosing a lower variety level or adjusting your goal.")
+            st.dataframe(_describe_relaxations(diagnosis['relaxations']), hide_index=True, use_container_width=True)
+        elif diagnosis['status'] == 'Optimal':
+            st.info("No rule needed relaxing; the plan may only need more solving time.")
+        else:
+            st.warning("The diagnosis could not finish in time. Try a lower variety level or adjust your food selections.")
 
-                    status = LpStatus[prob.status]
-                    if status in ('Optimal', 'Not Solved'):
-                        solution = {d: {f_key: var.varValue for (f_key, d_key), var in gram_vars.items() if d_key == d and var.varValue > 0.01} for d in days}
-                        st.session_state.plan_results = solution
-                        st.session_state.plan_source = f"{plan_preference} Plan"
-                        st.success("Optimization successful! Your plan is ready in Step 4.")
-                        st.session_state.scroll_to_top = True
-                        ui_utils.go_to_page("Step 4: View Plan & Generate Prompts")
-                        st.rerun()
-                    else:
-                        st.session_state.plan_results = None
-                        st.error("Could not find an optimal solution. The constraints might be too strict. Try a lower variety level or adjust your food selections.")
-
-                except Exception as e:
-                    st.error(f"An optimization error occurred: {e}")
\ No newline at end of file
+    # --- Cost versus variety: every level planned in the background and cached, so switching is instant ---
+    frontier_inputs = {k: v for k, v in model_inputs.items() if k != 'variety_level'}
+    frontier_key = plan_cache.make_cache_key(**frontier_inputs, variety_level=0)
+    with st.expander("📈 Compare cost and variety across all levels"):
+        frontier_run = st.session_state.get('plan_frontier')
+        if frontier_run and frontier_run['key'] == frontier_key:
+            _show_frontier(frontier_run['run'], level_labels)
+        elif st.button("Plan every variety level", disabled=preview_infeasible,
+                       help="Runs in the background. Afterwards, generating a plan at any level is instant."):
+            st.session_state.plan_frontier = {'key': frontier_key, 'run': frontier.FrontierRun(
+                **frontier_inputs, time_limit=180, solver_name=listSolvers(onlyAvailable=True)[0],
+                balance_formulation='compact', symmetry_breaking=True, **scale_options
+            )}
+            st.rerun()
@@ -1,4 +1,5 @@
 import streamlit as st
+import pandas as pd
 from . import ui_utils
 
 def display_select_plan_goals_page():
@@ -58,6 +59,15 @@ def display_select_plan_goals_page():
     }
     st.info(f"**Selected Preference: Level {variety_level} ({level_labels[variety_level]})**")
 
+    frontier_run = st.session_state.get('plan_frontier')
+    if frontier_run and frontier_run['run'].done() and frontier_run['run'].frontier:
+        with st.expander("Cost of each level with your last Step 3 settings"):
+            st.dataframe(pd.DataFrame([{
+                'Level': f"{r['level']} ({level_labels[r['level']]})",
+                'Plan cost (IRR)': f"≈ {int(round(r['objective'], -4)):,.0f}" if r['objective'] is not None else r['status'],
+                'Different foods': r['unique_foods'] if r['unique_foods'] is not None else "—",
+            } for r in frontier_run['run'].frontier]), hide_index=True, use_container_width=True)
+
 
     st.markdown("---")
     
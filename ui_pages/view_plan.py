@@ -3,7 +3,20 @@ import pandas as pd
 from . import ui_utils
 from streamlit.components.v1 import html
 
-def display_plan_and_prompt_page(PRICES, ai_planner):
+def _describe_check(rule):
+    for prefix, label in (('Daily_Min_', "Minimum {}"), ('Daily_Max_', "Maximum {}"),
+                          ('Macro_Min_', "Minimum share of calories from {}"), ('Macro_Max_', "Maximum share of calories from {}"),
+                          ('Calorie_Dist_', "Share of calories from {}")):
+        if rule.startswith(prefix):
+            return label.format(ui_utils._format_name(rule[len(prefix):]))
+    return rule
+
+def _describe_length(days):
+    if days % 7:
+        return f"{days}-Day"
+    return "Weekly" if days == 7 else f"{days // 7}-Week"
+
+def display_plan_and_prompt_page(PRICES, ai_planner, audit):
     """Renders the UI for Step 4: Viewing the plan and generating AI prompts."""
     
     if st.session_state.get('scroll_to_top', False):
@@ -22,43 +35,49 @@ def display_plan_and_prompt_page(PRICES, ai_planner):
     st.header("Plan Summary", divider='gray')
     col1, col2 = st.columns(2)
 
-    shopping_list = {}
-    for day_foods in st.session_state.plan_results.values():
-        for food, grams in day_foods.items():
-            shopping_list[food] = shopping_list.get(food, 0) + grams
+    plan = st.session_state.plan_results
+    rounded_plan = plan.rounded()
+    shopping_list = plan.shopping_list(rounded=True)
 
-    prices_for_summary = PRICES.copy()
+    prices_for_summary = PRICES.reindex(plan.foods)
     if st.session_state.custom_prices:
-        for food, price in st.session_state.custom_prices.items():
-            if food in prices_for_summary.index:
-                prices_for_summary.loc[food] = price
+        prices_for_summary.update(pd.Series(st.session_state.custom_prices, dtype=float))
 
-    total_cost = sum(prices_for_summary.get(food, 0) * grams for food, grams in shopping_list.items())
+    total_cost = plan.cost(prices_for_summary)
     rounded_cost = int(round(total_cost, -4))
-    col1.metric("Estimated Weekly Cost", f"≈ {rounded_cost:,.0f} IRR")
+    plan_length = _describe_length(len(plan.days))
+    col1.metric(f"Estimated {plan_length} Cost", f"≈ {rounded_cost:,.0f} IRR")
+    if len(plan.days) != 7:
+        col1.caption(f"≈ {int(round(total_cost * 7 / len(plan.days), -4)):,.0f} IRR per week")
 
     unique_foods = len(shopping_list)
     col2.metric("Unique Foods in Plan", f"{unique_foods} items")
+
+    if st.session_state.get('plan_rules'):
+        # Rounding to kitchen amounts can push a day just past a target the solver met exactly.
+        violations = audit.PlanAuditor(**st.session_state.plan_rules).audit(rounded_plan)
+        if violations:
+            with st.expander(f"⚠️ {len(violations)} nutrition target(s) missed after rounding to kitchen amounts"):
+                st.dataframe(pd.DataFrame([
+                    {'Day': ui_utils._format_name(v['day']), 'Target': _describe_check(v['rule']),
+                     'Planned': v['value'], 'Limit': v['bound']} for v in violations
+                ]).round(3), use_container_width=True, hide_index=True)
+        else:
+            st.caption("✅ With the rounded amounts, every day still meets your nutrient, macro and food-group targets.")
     
     st.divider()
 
-    st.subheader("📋 Your Weekly Plan & Shopping List")
-    with st.expander("View Weekly Shopping List", expanded=True):
-        shop_df = pd.DataFrame.from_dict(shopping_list, orient='index', columns=['Total Grams'])
-        shop_df['Food Item'] = shop_df.index.map(ui_utils._format_name)
-        # --- UPDATED: Using the new smart_round_grams function ---
-        shop_df['Total Grams'] = shop_df['Total Grams'].apply(lambda x: f"{ui_utils.smart_round_grams(x)} g")
-        shop_df = shop_df[['Food Item', 'Total Grams']]
+    st.subheader(f"📋 Your {plan_length} Plan & Shopping List")
+    with st.expander(f"View {plan_length} Shopping List", expanded=True):
+        shop_df = pd.DataFrame({'Food Item': shopping_list.index.map(ui_utils._format_name),
+                                'Total Grams': [f"{g} g" for g in shopping_list]})
         st.dataframe(shop_df, use_container_width=True, hide_index=True)
         
-    for day, foods in st.session_state.plan_results.items():
+    for day, foods in rounded_plan.items():
         with st.expander(f"View Plan for {ui_utils._format_name(day)}"):
             if foods:
-                day_df = pd.DataFrame.from_dict(foods, orient='index', columns=['Grams'])
-                day_df['Food Item'] = day_df.index.map(ui_utils._format_name)
-                # --- UPDATED: Using the new smart_round_grams function ---
-                day_df['Grams'] = day_df['Grams'].apply(lambda x: f"{ui_utils.smart_round_grams(x)} g")
-                day_df = day_df[['Food Item', 'Grams']]
+                day_df = pd.DataFrame({'Food Item': [ui_utils._format_name(f) for f in foods],
+                                       'Grams': [f"{g} g" for g in foods.values()]})
                 st.dataframe(day_df, use_container_width=True, hide_index=True)
             else: 
                 st.write("No food items for this day.")
@@ -99,9 +118,7 @@ def display_plan_and_prompt_page(PRICES, ai_planner):
     }
     
     all_prompts = []
-    for day_key, day_solution in st.session_state.plan_results.items():
-        # --- UPDATED: Using the new smart_round_grams function for the prompt ---
-        rounded_solution = {food: ui_utils.smart_round_grams(grams) for food, grams in day_solution.items()}
+    for day_key, rounded_solution in rounded_plan.items():
         prompt = ai_planner.create_prompt_for_user(
             rounded_solution, day_key, st.session_state.user_data['num_meals'], 
             st.session_state.user_data['num_snacks'], prompt_prefs